@@ -0,0 +1,122 @@
+"""Module layer for the administration endpoints."""
+
+from enum import Enum
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+from app.api.authentication import verify_user
+from app.models.authentication import UserResponse
+from app.models.query_trace import QueryTrace, QueryTraceStatus
+from app.persistence.db.query_tracer import QueryTracer, to_otlp
+from app.persistence.repositories.reference_data import (
+    ReferenceDataRepository,
+)
+from app.services.authentication import is_allowed_user
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    responses={404: {"description": "Not found, please contact the admin"}},
+)
+
+tracer = QueryTracer()
+
+
+class TraceFormat(str, Enum):
+    JSON = "json"
+    OTLP = "otlp"
+
+
+async def verify_admin(
+    current_user: Annotated[UserResponse, Depends(verify_user)],
+) -> UserResponse:
+    if not is_allowed_user(current_user.user.email):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"User '{current_user.user.email}' is not an admin user",
+        )
+    return current_user
+
+
+@router.get("/query-traces", dependencies=[Depends(verify_admin)])
+async def list_query_traces(
+    limit: Annotated[int, Query(ge=1, le=10000)] = 100,
+    table: Annotated[
+        str | None, Query(description="Table or `rpc/<function>`")
+    ] = None,
+    min_duration_ms: Annotated[float, Query(ge=0)] = 0,
+    trace_format: Annotated[TraceFormat, Query(alias="format")] = (
+        TraceFormat.JSON
+    ),
+) -> list[QueryTrace] | dict:
+    """
+    Lists the last queries executed against PostgREST (Admin Only).
+
+    Every trace has the table, the select with its embeds, the filters,
+    the range, the duration, the rows and the size of the response. The
+    tracer is disabled by default, see `PUT /admin/query-traces/enabled`.
+
+    **Args:**
+    - limit (int): Maximum number of traces, the most recent first.
+    - table (str, optional): Only the queries of the table or function.
+    - min_duration_ms (float): Only the queries slower than it.
+    - format (str): `json` or `otlp` to export the traces as OTLP/JSON.
+
+    **Returns:**
+    - list[QueryTrace] | dict: The traces or the OTLP export.
+    """
+    traces = tracer.traces(limit, table, min_duration_ms)
+    if trace_format == TraceFormat.OTLP:
+        return to_otlp(traces)
+    return traces
+
+
+@router.get("/query-traces/status", dependencies=[Depends(verify_admin)])
+async def get_query_trace_status() -> QueryTraceStatus:
+    """Returns if the tracer is enabled and the traces kept (Admin Only)."""
+    return tracer.status()
+
+
+@router.put("/query-traces/enabled", dependencies=[Depends(verify_admin)])
+async def set_query_trace_enabled(enabled: bool) -> QueryTraceStatus:  # noqa: FBT001
+    """
+    Enables or disables the tracer in this worker (Admin Only).
+
+    The workers do not share the traces, the change only applies to the
+    worker that serves the request.
+    """
+    if enabled:
+        tracer.enable()
+    else:
+        tracer.disable()
+    return tracer.status()
+
+
+@router.delete(
+    "/query-traces",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(verify_admin)],
+)
+async def clear_query_traces() -> Response:
+    """Removes the traces kept in this worker (Admin Only)."""
+    tracer.clear()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.delete(
+    "/reference-data/cache",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(verify_admin)],
+)
+async def invalidate_reference_data() -> Response:
+    """
+    Reloads the branches, cities and departments on the next read (Admin
+    Only).
+
+    The workers do not share the cache, the change only applies to the
+    worker that serves the request, the others reload the data when their
+    `reference_data_ttl` expires.
+    """
+    ReferenceDataRepository().invalidate()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,77 @@
+"""Module layer for the sales analytics endpoints."""
+
+from datetime import date
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.api.authentication import verify_user
+from app.models.analytics import SalesAnalyticsResponse, SalesGroupBy
+from app.services.analytics import AnalyticsService
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"],
+    responses={404: {"description": "Not found, please contact the admin"}},
+)
+
+service = AnalyticsService()
+
+
+@router.get("/sales", dependencies=[Depends(verify_user)])
+async def get_sales(
+    group_by: SalesGroupBy = SalesGroupBy.DAY,
+    start_date: Annotated[
+        date | None, Query(description="First purchase date, included")
+    ] = None,
+    end_date: Annotated[
+        date | None, Query(description="Last purchase date, included")
+    ] = None,
+    id_branch: Annotated[
+        UUID | None, Query(description="Branch of the purchase")
+    ] = None,
+    id_product: UUID | None = None,
+    skip: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 1000,
+) -> SalesAnalyticsResponse:
+    """
+    Aggregates the sales by branch, product or day.
+
+    Every group has the number of purchases, lines and units, the net
+    total, the VAT, the total with VAT and the average purchase. The
+    results are cached per window of dates and filters. User
+    authentication and authorization are required.
+
+    **Args:**
+    - group_by (str): `branch`, `product` or `day`. Defaults to `day`.
+    - start_date (date, optional): First purchase date of the window.
+    - end_date (date, optional): Last purchase date of the window.
+    - id_branch (UUID, optional): Only the sales made in the branch.
+    - id_product (UUID, optional): Only the sales of the product.
+    - skip (int): Groups to skip, ordered by key. Defaults to 0.
+    - limit (int): Maximum number of groups, up to 1000. Defaults to 1000.
+
+    **Returns:**
+    - SalesAnalyticsResponse: A page of the groups, the number of groups
+      and the totals of the whole window.
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date must be before end_date",
+        )
+    try:
+        return await service.get_sales(
+            group_by,
+            start_date,
+            end_date,
+            str(id_branch) if id_branch else None,
+            str(id_product) if id_product else None,
+            skip,
+            limit,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+        ) from e
@@ -5,10 +5,9 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, Header, HTTPException, status
 from fastapi.responses import JSONResponse
 from gotrue import User
-from supabase import Client
+from gotrue.errors import AuthApiError
 
 from app.models.authentication import BaseUser, CreateUser, UserResponse
-from app.persistence.db.connection import get_admin_supabase, get_supabase
 from app.services.authentication import (
     AuthenticationService,
     is_allowed_user,
@@ -27,12 +26,14 @@ router = APIRouter(
 # Instance the service class using the singleton pattern
 service = AuthenticationService()
 
+# Error codes returned by Supabase when the email is already registered
+EMAIL_EXISTS_ERROR_CODES = ("email_exists", "user_already_exists")
+
 
 # Create a new user
 @router.post("/create-user")
 async def create_user(
     user: CreateUser,
-    supabase: Annotated[Client, Depends(get_admin_supabase)],
     current_user: Annotated[UserResponse, Depends(verify_user)],
 ) -> JSONResponse:
     """
@@ -69,30 +70,13 @@ async def create_user(
                 current_user.user.email
             }' is not allowed to create new users, please contact the admin",
         )
-    # Validate if the user exist previously
-    # List all the existing users
-    user_list: list[User] = supabase.auth.admin.list_users()
-    # Extract only the emails from the current users
-    email_list: list[str] = [user.email for user in user_list]
-    if user.email in email_list:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"It looks like '{
-                user.email
-            }' is already registered. Try logging in?",
-        )
     try:
-        response = supabase.auth.admin.create_user(
-            {
-                "email": user.email,
-                "password": user.password,
-                "email_confirm": True,  # Auto confirm the email
-                "role": user.role,
-            },
-        )
+        # The email is unique in Supabase, a registered email is rejected
+        # on creation without listing the existing users
+        created_user = await service.create_user(user)
         user_data: dict = {
-            "id": response.user.id,
-            "email": response.user.email,
+            "id": created_user.id,
+            "email": created_user.email,
         }
         return JSONResponse(
             status_code=status.HTTP_201_CREATED,
@@ -101,6 +85,20 @@ async def create_user(
                 "user": user_data,
             },
         )
+    except AuthApiError as e:
+        if e.code in EMAIL_EXISTS_ERROR_CODES or (
+            "already been registered" in e.message
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"It looks like '{
+                    user.email
+                }' is already registered. Try logging in?",
+            ) from e
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"User creation failed - {e!s}",
+        ) from e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -110,10 +108,7 @@ async def create_user(
 
 # Login exiting users
 @router.post("/login")
-async def login(
-    user: BaseUser,
-    supabase: Annotated[Client, Depends(get_supabase)],
-) -> JSONResponse:
+async def login(user: BaseUser) -> JSONResponse:
     """
     Authenticate a user and return an access token.
 
@@ -131,12 +126,7 @@ async def login(
         401 Unauthorized: If the credentials are invalid or login fails.
     """
     try:
-        response = supabase.auth.sign_in_with_password(
-            {
-                "email": user.email,
-                "password": user.password,
-            },
-        )
+        response = await service.login(user)
         return JSONResponse(
             status_code=200,
             content={
@@ -156,9 +146,8 @@ async def login(
 
 
 @router.delete("/delete-user")
-def delete_user(
+async def delete_user(
     user_id: UUID,
-    admin_supabase: Annotated[Client, Depends(get_admin_supabase)],
     current_user: Annotated[UserResponse, Depends(verify_user)],
 ) -> JSONResponse:
     """
@@ -188,7 +177,7 @@ def delete_user(
         )
 
     try:
-        admin_supabase.auth.admin.delete_user(user_id)
+        await service.delete_user(str(user_id))
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
@@ -205,17 +194,21 @@ def delete_user(
 @router.get("/users", status_code=status.HTTP_200_OK)
 async def list_all_users(
     current_user: Annotated[User, Depends(verify_user)],
+    page: int = 1,
+    per_page: int = 50,
 ) -> list[User]:
     """
-    List all users from Supabase.
+    List the users from Supabase.
 
-    This endpoint allows an admin user to retrieve a list of all users
+    This endpoint allows an admin user to retrieve a page of the users
     registered in the Supabase authentication system.
 
     - `current_user`: Currently authenticated user (injected via dependency).
+    - `page`: Page to retrieve, starting at 1. Defaults to 1.
+    - `per_page`: Number of users per page. Defaults to 50.
 
     **Returns:**
-        200 OK with a list of all users if the request is successful.
+        200 OK with the users of the page if the request is successful.
 
     **Raises:**
         401 Unauthorized: If the current user does not have admin permissions.
@@ -231,7 +224,7 @@ async def list_all_users(
                     current_user.user.email
                 }' not allowed to create list users, please contact the admin",
             )
-        return await service.list_all_users()
+        return await service.list_all_users(page, per_page)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1,6 +1,15 @@
+from collections.abc import AsyncIterator
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    status,
+)
+from fastapi.responses import StreamingResponse
 
 from app.api.authentication import verify_user
 from app.models.customer import (
@@ -10,6 +19,8 @@ from app.models.customer import (
     PurchaseByCustomerDocumentResponse,
 )
 from app.services.customer import CustomerService
+from app.utils.customer import encode_customer_cursor
+from app.utils.etag import conditional_response
 
 router = APIRouter(
     prefix="/customer",
@@ -131,48 +142,100 @@ async def toggle_customer(document: str, activate: bool) -> Customer:
 
 @router.get("/customers", dependencies=[Depends(verify_user)])
 async def list_clients(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     search: Annotated[
         str | None, Query(description="Filter by phone number")
     ] = None,
+    after: Annotated[
+        str | None,
+        Query(description="Cursor of the next page (X-Next-Cursor header)"),
+    ] = None,
 ) -> list[Customer]:
     """
     Lists all customers with pagination and optional search filtering.
 
     This endpoint retrieves a paginated list of customers, allowing filtering
     by a search term across multiple fields (e.g., customer_document,
-    first name, last name, email, phone_number, and home_address). Supports
-    pagination through `skip` and `limit` query parameters. User
-    authentication and authorization are required.
+    first name, last name, email, phone_number, and home_address). The
+    customers are ordered by the date of their last purchase, most recent
+    first. Supports pagination through the `after` cursor or the `skip`
+    and `limit` query parameters. User authentication and authorization
+    are required.
 
     **Args:**
-    - search (str, optional): Search term to filter customers. Matches
-      partially across customer_document, customer_first_name,
-      customer_last_name, email, phone_number, and home_address.
+    - search (str, optional): Search term to filter customers. Every word
+      must match partially customer_document, customer_first_name,
+      customer_last_name, email, phone_number or home_address, without
+      accents nor case. The results are ranked, best matches first.
       Defaults to None.
     - skip (int, optional): Number of records to skip for pagination.
-      Defaults to 0.
+      Defaults to 0. Ignored when `after` is provided.
     - limit (int, optional): Maximum number of records to return per page.
       Defaults to 100.
+    - after (str, optional): Opaque cursor returned in the `X-Next-Cursor`
+      header of the previous page. Deep pages cost the same as the first.
     - current_user: The authenticated user, injected via dependency.
 
     **Returns:**
     - List[CustomerResponse]: A paginated list of customer objects. If a search
       term is provided, the list is filtered to include only matching records.
+      When there may be more records, the `X-Next-Cursor` header contains the
+      cursor of the next page, except for searches that use `skip`.
+      The `ETag` header is the hash of the page, send it in `If-None-Match`
+      to get a `304 Not Modified` when the page did not change.
 
     **Raises:**
     - HTTPException 404: If no customers are found matching the search term
       or pagination criteria.
     """
     try:
-        return await service.list_all_customers(skip, limit, search)
+        customers = await service.list_all_customers(
+            skip, limit, search, after
+        )
+        headers = {}
+        # The searches are ranked, their pages use `skip`
+        if customers and len(customers) == limit and not search:
+            headers["X-Next-Cursor"] = encode_customer_cursor(customers[-1])
+        return conditional_response(request, customers, headers=headers)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
         ) from e
 
 
+@router.get("/export", dependencies=[Depends(verify_user)])
+async def export_customers() -> StreamingResponse:
+    """
+    Exports every customer as NDJSON, one customer per line.
+
+    The customers are read in chunks ordered by document and each chunk is
+    sent as soon as it is read, so the memory does not grow with the size
+    of the customer base. Each line has the same fields of the customer
+    list, including the branch and the last purchase. User authentication
+    and authorization are required.
+
+    **Returns:**
+    - StreamingResponse: The customers with `application/x-ndjson` media
+      type.
+    """
+
+    async def stream_customers() -> AsyncIterator[str]:
+        async for customers in service.export_customers():
+            yield "".join(
+                f"{customer.model_dump_json()}\n" for customer in customers
+            )
+
+    return StreamingResponse(
+        stream_customers(),
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": 'attachment; filename="customers.ndjson"'
+        },
+    )
+
+
 @router.patch(
     "/update-customer/{customer_document}",
     dependencies=[Depends(verify_user)],
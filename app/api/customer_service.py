@@ -2,7 +2,7 @@
 from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, Path
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Path
 
 from app.api.authentication import verify_user
 
@@ -12,6 +12,7 @@ from app.models.customer_service import (
     ManageCustomerServicePayload
 )
 from app.services.customer_service import CustomerServiceService
+from app.utils.etag import conditional_response
 
 router = APIRouter(
     prefix="/customer-service",
@@ -32,6 +33,7 @@ def get_customer_service() -> CustomerServiceService:
     dependencies=[Depends(verify_user)]
 )
 async def list_customer_services_endpoint(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     service: CustomerServiceService = Depends(get_customer_service)
@@ -39,12 +41,13 @@ async def list_customer_services_endpoint(
     """
     Retrieve all customer services for table view.
     - `skip` and `limit` are used for pagination.
+    - The `ETag` header is the hash of the list, send it in `If-None-Match` to get a `304 Not Modified` when it did not change.
     """
     try:
         services = await service.list_all_customer_services_for_table(skip=skip, limit=limit)
         if services is None: 
-            return []
-        return services
+            services = []
+        return conditional_response(request, services)
     except Exception as e:
         print("Error list all:", e)
         raise HTTPException(
@@ -1,7 +1,7 @@
 # This file contains all the endpoints related with products
-from typing import Optional
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, status
 from fastapi.exceptions import HTTPException
 
 from app.api.authentication import verify_user
@@ -11,6 +11,12 @@ from app.models.product import (
     ProductUpdate,
 )
 from app.services.product import ProductService
+from app.utils.etag import (
+    build_etag,
+    conditional_response,
+    etag_matches,
+    not_modified,
+)
 from app.utils.global_validators import (
     validate_empty_str,
     validate_list,
@@ -99,7 +105,7 @@ async def create_product(product: CreateProduct) -> Product:
     status_code=status.HTTP_200_OK,
     dependencies=[Depends(verify_user)],
 )
-async def get_product_by_id(id_product: str) -> Product:
+async def get_product_by_id(request: Request, id_product: str) -> Product:
     """
     Retrieves a product by id.
 
@@ -110,13 +116,19 @@ async def get_product_by_id(id_product: str) -> Product:
     - id_product (str): The UUID of the product to retrieve.
 
     **Returns:**
-    - Product: The product data, if found.
+    - Product: The product data, if found. The `ETag` header identifies the
+      version of the catalog, send it in `If-None-Match` to get a
+      `304 Not Modified` when the product did not change.
 
     **Raises:**
     - HTTPException:
         - `404 Not Found` if no product is found with the given ID.
     """
     try:
+        # A known version of the catalog is answered without the product
+        etag = build_etag(await service.catalog_version(), id_product)
+        if etag_matches(request, etag):
+            return not_modified(etag)
         product = await service.get_product_by_id(
             id_product,
         )
@@ -125,7 +137,8 @@ async def get_product_by_id(id_product: str) -> Product:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Product with id '{id_product}' not found",
             )
-        return product
+        etag = build_etag(await service.catalog_version(), id_product)
+        return conditional_response(request, product, etag)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -138,7 +151,9 @@ async def get_product_by_id(id_product: str) -> Product:
     status_code=status.HTTP_200_OK,
     dependencies=[Depends(verify_user)],
 )
-async def list_products(skip: int = 0, limit: int = 100) -> list[Product]:
+async def list_products(
+    request: Request, skip: int = 0, limit: int = 100
+) -> list[Product]:
     """
     Lists all products with pagination.
 
@@ -152,13 +167,55 @@ async def list_products(skip: int = 0, limit: int = 100) -> list[Product]:
     - current_user: The authenticated user, injected via dependency.
 
     **Returns:**
-    - List[Product]: A list of product objects.
+    - List[Product]: A list of product objects. The `ETag` header identifies
+      the version of the catalog, send it in `If-None-Match` to get a
+      `304 Not Modified` when the products did not change.
     """
     try:
-        return await service.list_all_products(
+        # A known version of the catalog is answered without the products
+        etag = build_etag(await service.catalog_version(), skip, limit)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        products = await service.list_all_products(
             skip,
             limit,
         )
+        # The catalog could be reloaded while listing the products
+        etag = build_etag(await service.catalog_version(), skip, limit)
+        return conditional_response(request, products, etag)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
+
+
+@router.get(
+    "/autocomplete",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(verify_user)],
+)
+async def autocomplete_products(
+    q: Annotated[str, Query(description="Beginning of the product name")],
+    limit: Annotated[int, Query(ge=1, le=50)] = 10,
+) -> list[Product]:
+    """
+    Suggests active products by the beginning of the words of their name.
+
+    Every word of `q` must start a word of the product name, the accents
+    and the case are ignored. The products whose name starts with `q` go
+    first. The suggestions include the price and the stock per branch.
+    User authentication and authorization are required.
+
+    **Args**:
+    - q (str): The text typed by the user, for example `crem hid`.
+    - limit (int, optional): Maximum number of suggestions. Defaults to 10.
+
+    **Returns:**
+    - List[Product]: The suggested products.
+    """
+    try:
+        return await service.autocomplete_products(q, limit)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1,11 +1,19 @@
 """Module layer for puchases endpoints and to manage the tables."""
 
-from fastapi import APIRouter, Depends, status
+import csv
+import io
+from collections.abc import AsyncIterator
+from datetime import date
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query, status
 from fastapi.exceptions import HTTPException
+from fastapi.responses import StreamingResponse
 
 from app.models.purchase import PurchaseResponse, SaleCreate
 from app.services.authentication import verify_user
 from app.services.purchase import PurchaseService
+from app.utils.purchase import PURCHASE_EXPORT_COLUMNS
 
 # Create the router
 purchase_router = APIRouter(
@@ -30,3 +38,60 @@ async def make_purchase(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
         ) from e
+
+
+@purchase_router.get("/export", dependencies=[Depends(verify_user)])
+async def export_purchases(
+    start_date: Annotated[
+        date | None, Query(description="First purchase date, included")
+    ] = None,
+    end_date: Annotated[
+        date | None, Query(description="Last purchase date, included")
+    ] = None,
+    id_branch: Annotated[
+        str | None, Query(description="Branch of the purchase")
+    ] = None,
+) -> StreamingResponse:
+    """
+    Exports the purchases as CSV, one row per purchase line.
+
+    Each row has the purchase, the product line, the payment and the
+    delivery. The purchases are read in chunks ordered by date and each
+    chunk is written as soon as it is read. User authentication and
+    authorization are required.
+
+    **Args:**
+    - start_date (date, optional): First purchase date of the export.
+    - end_date (date, optional): Last purchase date of the export.
+    - id_branch (str, optional): Only the purchases made in the branch.
+
+    **Returns:**
+    - StreamingResponse: The purchases with `text/csv` media type.
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date must be before end_date",
+        )
+    service = PurchaseService()
+
+    async def stream_purchases() -> AsyncIterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(PURCHASE_EXPORT_COLUMNS)
+        yield buffer.getvalue()
+        async for rows in service.export_purchases(
+            start_date, end_date, id_branch
+        ):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+
+    return StreamingResponse(
+        stream_purchases(),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": 'attachment; filename="purchases.csv"'
+        },
+    )
@@ -0,0 +1,41 @@
+"""
+Command to rebuild the purchases summary of the customers.
+
+Usage:
+    python -m app.commands.rebuild_customer_summary [--document DOCUMENT]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.persistence.repositories.customer_summary import (
+    CustomerSummaryRepository,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild(customer_document: str | None = None) -> int:
+    return await CustomerSummaryRepository().rebuild(customer_document)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Recompute the customer_summary from the purchases."
+    )
+    parser.add_argument(
+        "--document",
+        help="Only rebuild the summary of this customer document.",
+    )
+    args = parser.parse_args()
+    # Only the result of the command, not the requests of the clients
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.INFO)
+    count = asyncio.run(rebuild(args.document))
+    logger.info("Customer summaries rebuilt: %d", count)
+    return count
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,60 @@ class Settings(BaseSettings):
     email_username: str
     email_password: str
     email_to: str
+    # SMTP server, it can point to a local SMTP server for testing
+    email_host: str = "smtp.gmail.com"
+    email_port: int = 587
+    email_use_tls: bool = True
+    email_timeout: float = 10
+    email_max_retries: int = 3
+    # Local verification of the access tokens, when the secret is not set
+    # the tokens are verified with the JWKS of the project or remotely
+    supabase_jwt_secret: str | None = None
+    jwt_audience: str = "authenticated"
+    # Seconds a verified token is cached. A logout is rejected at once by
+    # the worker that served it, the other workers accept the token until
+    # it leaves their cache, or until it expires when verified locally
+    auth_cache_ttl: int = 60
+    # Lease to run the scheduler in only one worker: supabase, file or none
+    scheduler_lease_backend: str = "supabase"
+    scheduler_lease_ttl: int = 60
+    scheduler_lease_file: str = "/tmp/andhara-scheduler.lock"
+    # Seconds to keep the branches, cities and departments in memory
+    reference_data_ttl: int = 600
+    # Seconds to keep the product catalog in memory, the writes of this
+    # process invalidate it, the TTL bounds the writes of other workers
+    product_catalog_ttl: int = 60
+    # Compression of the responses, the bodies smaller than the minimum
+    # size are sent as they are. The level is used by gzip (1-9) and the
+    # quality by brotli (0-11)
+    compression_minimum_size: int = 1024
+    compression_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_cache_size: int = 256
+    # Seconds to keep the sales analytics of the windows that include today,
+    # and of the windows that ended before today. At most
+    # `analytics_cache_size` results are kept per worker
+    analytics_cache_ttl: int = 300
+    analytics_closed_cache_ttl: int = 3600
+    analytics_cache_size: int = 256
+    # Seconds between the refreshes of the customer search index in memory,
+    # which read the customers changed since the last one, and between the
+    # rebuilds that read every customer
+    customer_search_ttl: int = 300
+    customer_search_rebuild_ttl: int = 86400
+    # Print a JSON line with the database calls and timings of each request
+    request_timing_log: bool = True
+    # Bearer token required by /metrics, it is disabled when it is not set
+    metrics_token: str | None = None
+    # Tracer of the queries to PostgREST, it can be enabled at runtime by
+    # an admin, the last `query_trace_size` queries are kept per worker
+    query_trace_enabled: bool = False
+    query_trace_size: int = 1000
+    # Backend of the clients: supabase, or local for the in-memory stand-in
+    # of the database used by the tests and benchmarks. The local database
+    # is loaded from the JSON file `{table: [rows]}` of the seed when set
+    supabase_backend: str = "supabase"
+    local_database_seed: str | None = None
 
     class Config:
         env_file = ".env"
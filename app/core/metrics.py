@@ -0,0 +1,218 @@
+"""
+Module with the metrics of the process in the Prometheus text format.
+
+The metrics are updated without locks: the requests are served by the
+event loop and the updates are single operations on lists and dicts, so
+a collection never waits for a request and a request never waits for a
+collection. An update made from the thread pool may rarely be lost.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+
+from app.core.scheduler_status import SchedulerState
+
+# Seconds, from the cached responses to the slow PostgREST round-trips
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], **extra) -> str:  # noqa: ANN003
+    pairs = [*zip(names, values, strict=True), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = (
+            f"# HELP {self.name} {self.documentation}\n"
+            f"# TYPE {self.name} {self.kind}\n"
+        )
+        return header + "".join(f"{sample}\n" for sample in self.samples())
+
+
+class Counter(Metric):
+    """Counter updated by the code, or read from `function` when collected."""
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        function: Callable[[], dict[tuple[str, ...], float]] | None = None,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        if self.function is not None:
+            self._values = self.function()
+        for labels, value in list(self._values.items()):
+            yield (
+                f"{self.name}{_labels(self.labelnames, labels)} "
+                f"{_number(value)}"
+            )
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = (*sorted(buckets), float("inf"))
+        # Per label values the count of every bucket, not cumulative, the
+        # sum and the count of the observations
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._values.get(labels)
+        if counts is None:
+            counts = self._values.setdefault(
+                labels, [0] * (len(self.buckets) + 2)
+            )
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def samples(self) -> Iterable[str]:
+        for labels, counts in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts, strict=False):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket"
+                    f"{_labels(self.labelnames, labels, le=_number(bound))} "
+                    f"{cumulative}"
+                )
+            label_text = _labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_number(counts[-2])}"
+            yield f"{self.name}_count{label_text} {counts[-1]}"
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+registry = MetricsRegistry()
+
+http_requests_in_flight = registry.register(
+    Gauge(
+        "http_requests_in_flight",
+        "Requests being served by this worker.",
+    )
+)
+http_request_duration_seconds = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time to serve the requests, until the last chunk of the body.",
+        ("method", "route", "status"),
+    )
+)
+repository_method_duration_seconds = registry.register(
+    Histogram(
+        "repository_method_duration_seconds",
+        "Time of the coroutines of the repositories.",
+        ("repository", "method", "outcome"),
+    )
+)
+supabase_errors_total = registry.register(
+    Counter(
+        "supabase_errors_total",
+        "Queries to PostgREST that raised an error.",
+        ("table", "code"),
+    )
+)
+scheduler_up = registry.register(
+    Gauge(
+        "scheduler_up",
+        "1 when the last status of the email scheduler was a success.",
+        function=lambda: {(): int(SchedulerState().success)},
+    )
+)
+scheduler_job_runs_total = registry.register(
+    Counter(
+        "scheduler_job_runs_total",
+        "Runs of the email job by outcome.",
+        ("outcome",),
+        function=lambda: {
+            (outcome,): count for outcome, count in SchedulerState().runs.items()
+        },
+    )
+)
+scheduler_setup_errors_total = registry.register(
+    Counter(
+        "scheduler_setup_errors_total",
+        "Errors to add the email job or start the scheduler.",
+        function=lambda: {(): SchedulerState().setup_errors},
+    )
+)
@@ -0,0 +1,72 @@
+"""Module with the timings of the request being served."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from collections.abc import Coroutine, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RequestTimings:
+    """Database calls and time spent per phase of one request."""
+
+    started_at: float = field(default_factory=time.perf_counter)
+    # Shared by the traces of the queries of the request
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    db_calls: int = 0
+    db_errors: int = 0
+    durations: dict[str, float] = field(
+        default_factory=lambda: {"db": 0.0, "auth": 0.0, "serialization": 0.0}
+    )
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def add_db_call(self, seconds: float, *, failed: bool = False) -> None:
+        self.db_calls += 1
+        self.db_errors += failed
+        self.add("db", seconds)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+
+# The timings are set by the middleware, the copies of the context made for
+# the thread pool share the same object
+request_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def current_timings() -> RequestTimings | None:
+    """The timings of the current request, None outside of a request."""
+    return request_timings.get()
+
+
+def create_background_task(coro: Coroutine) -> asyncio.Task:
+    """
+    Starts the task outside of the current request, the tasks copy the
+    context, so its database calls would be counted in the request.
+    """
+    context = copy_context()
+    context.run(request_timings.set, None)
+    return asyncio.create_task(coro, context=context)
+
+
+@contextmanager
+def record_time(name: str) -> Iterator[None]:
+    """Adds the time spent in the block to the phase of the request."""
+    timings = request_timings.get()
+    if timings is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started_at)
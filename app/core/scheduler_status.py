@@ -6,4 +6,8 @@ class SchedulerState:
             cls._instance = super().__new__(cls)
             cls._instance.success = False
             cls._instance.message = "Not initialized"
+            # Runs of the email job by outcome
+            cls._instance.runs = {"success": 0, "failure": 0}
+            # Errors to set up the scheduler, counted apart from the runs
+            cls._instance.setup_errors = 0
         return cls._instance
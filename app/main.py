@@ -1,14 +1,18 @@
+import hmac
 import platform
 import socket
 import time
 from datetime import UTC, datetime
 
 import psutil
-from fastapi import FastAPI, status
+from fastapi import FastAPI, Request, status
+from fastapi.exceptions import HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 from app.api import (
+    admin,
+    analytics,
     authentication,
     customer,
     customer_service,
@@ -16,8 +20,14 @@ from app.api import (
     purchase,
 )
 from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE, registry
 from app.core.scheduler_status import SchedulerState
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.timing import ServerTimingMiddleware
+from app.persistence.db.query_tracer import QueryTracer
 from app.services.email_sender import ServiceEmailSender
+from app.services.scheduler_leader import SchedulerLeader, get_scheduler_lease
 
 # Init the entry point of the app
 app = FastAPI(
@@ -33,14 +43,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing"],
 )
 
+# Compress the responses with gzip or brotli
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    level=settings.compression_level,
+    brotli_quality=settings.compression_brotli_quality,
+    cache_size=settings.compression_cache_size,
+)
+
+# Count the database calls and time the requests, it is the outer
+# middleware so the total includes the compression
+app.add_middleware(
+    ServerTimingMiddleware,
+    allowed_origin=settings.allowed_cors,
+    log=settings.request_timing_log,
+)
+
+# Latency of the requests and the repositories for /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include routes
 app.include_router(authentication.router, prefix="/v1")
 app.include_router(product.router, prefix="/v1")
 app.include_router(customer.router, prefix="/v1")
 app.include_router(purchase.purchase_router, prefix="/v1")
 app.include_router(customer_service.router, prefix="/v1")
+app.include_router(analytics.router, prefix="/v1")
+app.include_router(admin.router, prefix="/v1")
+
+# Trace the queries from the start, otherwise an admin enables it
+if settings.query_trace_enabled:
+    QueryTracer().enable()
 
 
 # Instance the scheduler state
@@ -53,25 +90,100 @@ def update_shcheduler_status(success: bool, message: str) -> None:
     scheduler_status.message = message
 
 
+# Function to count the runs of the email job and update the status
+def record_email_job(success: bool, message: str) -> None:
+    scheduler_status.runs["success" if success else "failure"] += 1
+    update_shcheduler_status(success, message)
+
+
+# Function to count the errors to set up the email scheduler, they are not
+# runs of the job
+def record_scheduler_error(message: str) -> None:
+    scheduler_status.setup_errors += 1
+    update_shcheduler_status(False, message)  # noqa: FBT003
+
+
+def update_standby_status(message: str) -> None:
+    update_shcheduler_status(True, message)  # noqa: FBT003
+
+
+def start_email_scheduler(email_service: ServiceEmailSender) -> None:
+    shcheduler_success, msg = email_service(immediate=False)
+    if not shcheduler_success:
+        # The leader releases the lease so another worker can start it
+        email_service.stop()
+        raise RuntimeError(msg)
+    update_shcheduler_status(True, "Leader, scheduler running")  # noqa: FBT003
+
+
+def stop_email_scheduler(email_service: ServiceEmailSender) -> None:
+    email_service.stop()
+    update_shcheduler_status(True, "Scheduler stopped, lease lost")  # noqa: FBT003
+
+
 @app.on_event("startup")
 async def startup_event() -> None:
     try:
-        # Instance the scheduler for sending the email
-        email_service = ServiceEmailSender(callback=update_shcheduler_status)
-        shcheduler_success, msg = email_service(immediate=False)
-        # Show the message when the scheduler fails
-        if not shcheduler_success:
-            raise ValueError(msg)
+        # Instance the scheduler for sending the email, only the worker
+        # that owns the lease starts it
+        email_service = ServiceEmailSender(
+            callback=record_email_job,
+            error_callback=record_scheduler_error,
+        )
+        app.state.scheduler_leader = SchedulerLeader(
+            lease=get_scheduler_lease(),
+            on_elected=lambda: start_email_scheduler(email_service),
+            on_demoted=lambda: stop_email_scheduler(email_service),
+            on_standby=update_standby_status,
+        )
+        await app.state.scheduler_leader.start()
 
     except Exception as e:
         update_shcheduler_status(False, str(e))  # noqa: FBT003
         raise ValueError(e) from e
 
 
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    # Release the lease so another worker takes the scheduler
+    scheduler_leader = getattr(app.state, "scheduler_leader", None)
+    if scheduler_leader:
+        await scheduler_leader.stop()
+
+
 # calculate the up time
 start_time = time.time()
 
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request) -> Response:
+    """
+    Get the metrics of this worker in the Prometheus text format.
+
+    The metrics are disabled until `METRICS_TOKEN` is set, the scraper
+    sends it as a bearer token.
+
+    Returns:
+        Response: The metrics as plain text.
+
+    """
+    if not settings.metrics_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Metrics are disabled, set METRICS_TOKEN to enable them",
+        )
+    if not hmac.compare_digest(
+        request.headers.get("authorization", ""),
+        f"Bearer {settings.metrics_token}",
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/", status_code=status.HTTP_200_OK, tags=["System"])
 def get_system_info() -> JSONResponse:
     """
@@ -0,0 +1,255 @@
+"""Middleware to compress the responses with gzip or brotli."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+from threading import Lock
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, only gzip is offered without it
+    brotli = None
+
+# Only the text responses are compressed, the rest is usually compressed
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/",
+)
+
+
+def select_encoding(accept_encoding: str) -> str | None:
+    """
+    Selects the encoding of the response from the `Accept-Encoding` header.
+
+    Args:
+        accept_encoding (str): The header sent by the client.
+
+    Returns:
+        str | None: `br`, `gzip` or None when the client accepts neither.
+
+    """
+    qualities = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip()] = quality
+
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for name in supported:
+        quality = qualities.get(name, qualities.get("*", 0.0))
+        # Brotli goes first, so it wins the ties
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class CompressedCache:
+    """LRU cache of compressed bodies, keyed by the encoding and the hash."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._items: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+
+    def get(self, key: tuple[str, str]) -> bytes | None:
+        with self._lock:
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+            return body
+
+    def set(self, key: tuple[str, str], body: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._items[key] = body
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+class StreamCompressor:
+    """Compresses a streamed body, every chunk is flushed to the client."""
+
+    def __init__(self, encoding: str, level: int, brotli_quality: int) -> None:
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        self.encoding = encoding
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compresses the responses bigger than `minimum_size` with the encoding
+    accepted by the client.
+
+    The complete bodies are compressed once and kept in a cache, so the
+    polled responses do not pay the compression on every request. The
+    streamed bodies are compressed chunk by chunk.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        level: int = 6,
+        brotli_quality: int = 4,
+        cache_size: int = 256,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.cache = CompressedCache(cache_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = select_encoding(
+            Headers(scope=scope).get("accept-encoding", "")
+        )
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        # The hash of the body is the key, an ETag may be reused by a
+        # handler for a different body
+        key = (encoding, hashlib.sha256(body).hexdigest())
+        compressed = self.cache.get(key)
+        if compressed is None:
+            if encoding == "br":
+                compressed = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                compressed = gzip.compress(
+                    body, compresslevel=self.level, mtime=0
+                )
+            self.cache.set(key, compressed)
+        return compressed
+
+
+class CompressionResponder:
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        encoding: str | None,
+        send: Send,
+    ) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Message | None = None
+        self.passthrough = False
+        self.compressor: StreamCompressor | None = None
+
+    def _is_compressible(self, headers: MutableHeaders) -> bool:
+        content_type = headers.get("content-type", "")
+        return (
+            self.start_message["status"] not in (204, 304)
+            and "content-encoding" not in headers
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+        )
+
+    def _set_encoding_headers(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        self._weaken_etag(headers)
+
+    def _weaken_etag(self, headers: MutableHeaders) -> None:
+        # The compressed body is another representation, the ETag is weak
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+    def _set_not_modified_headers(self, headers: MutableHeaders) -> None:
+        # A 304 has the headers of the 200 it replaces, the compression
+        # depends on Accept-Encoding even when this client did not get it
+        headers.add_vary_header("Accept-Encoding")
+        if self.encoding is not None:
+            self._weaken_etag(headers)
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            if message["status"] == 304:  # noqa: PLR2004
+                self._set_not_modified_headers(
+                    MutableHeaders(raw=message["headers"])
+                )
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is not None:
+            data = self.compressor.compress(body)
+            if not more_body:
+                data += self.compressor.finish()
+            await self._send(
+                {"type": "http.response.body", "body": data, "more_body": more_body}
+            )
+            return
+
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        if (
+            self.encoding is None
+            or not self._is_compressible(headers)
+            or (not more_body and len(body) < self.middleware.minimum_size)
+        ):
+            self.passthrough = True
+            await self._send(self.start_message)
+            await self._send(message)
+            return
+
+        if not more_body:
+            # Complete body, compressed once and cached
+            compressed = self.middleware.compress(self.encoding, body)
+            self._set_encoding_headers(headers)
+            headers["Content-Length"] = str(len(compressed))
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streamed body, the first chunk is sent without waiting the rest
+        self.compressor = StreamCompressor(
+            self.encoding, self.middleware.level, self.middleware.brotli_quality
+        )
+        self._set_encoding_headers(headers)
+        del headers["Content-Length"]
+        await self._send(self.start_message)
+        await self._send(
+            {
+                "type": "http.response.body",
+                "body": self.compressor.compress(body),
+                "more_body": True,
+            }
+        )
@@ -0,0 +1,61 @@
+"""Middleware to collect the Prometheus metrics of the requests."""
+
+from __future__ import annotations
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import (
+    http_request_duration_seconds,
+    http_requests_in_flight,
+)
+from app.middleware.timing import route_template
+from app.persistence.db.instrumentation import (
+    add_query_observer,
+    count_query_error,
+    instrument_query_builders,
+    instrument_repositories,
+)
+
+
+class MetricsMiddleware:
+    """
+    Measures the latency of the requests by route and status and the
+    requests in flight, and instruments the repositories and the queries.
+
+    The route is the path of the matched route with its parameters, the
+    requests that do not match a route share the `unmatched` label.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        instrument_query_builders()
+        instrument_repositories()
+        add_query_observer(count_query_error)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            http_request_duration_seconds.observe(
+                time.perf_counter() - started_at,
+                scope["method"],
+                route_template(scope) or "unmatched",
+                str(status_code),
+            )
@@ -0,0 +1,124 @@
+"""Middleware to report the database calls and timings of every request."""
+
+from __future__ import annotations
+
+import functools
+import json
+from typing import Any
+
+import fastapi.routing
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.request_timing import RequestTimings, record_time, request_timings
+from app.persistence.db.instrumentation import (
+    add_query_observer,
+    count_request_query,
+    instrument_query_builders,
+)
+
+
+def instrument_serialization() -> None:
+    """Times the validation and serialization of the response models."""
+    serialize_response = fastapi.routing.serialize_response
+    if getattr(serialize_response, "__instrumented__", False):
+        return
+
+    @functools.wraps(serialize_response)
+    async def wrapper(*args, **kwargs) -> Any:  # noqa: ANN002, ANN003, ANN401
+        with record_time("serialization"):
+            return await serialize_response(*args, **kwargs)
+
+    wrapper.__instrumented__ = True
+    fastapi.routing.serialize_response = wrapper
+
+
+def route_template(scope: Scope) -> str | None:
+    """The path of the matched route with its parameters, like `/by-id/{id}`."""
+    return getattr(scope.get("route"), "path", None)
+
+
+def server_timing(timings: RequestTimings) -> str:
+    """Builds the `Server-Timing` header, the durations are in milliseconds."""
+    metrics = [
+        f'db;dur={timings.durations["db"] * 1000:.1f};'
+        f'desc="{timings.db_calls} calls"',
+    ]
+    metrics.extend(
+        f"{name};dur={seconds * 1000:.1f}"
+        for name, seconds in timings.durations.items()
+        if name != "db"
+    )
+    metrics.append(f"total;dur={timings.elapsed() * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+class ServerTimingMiddleware:
+    """
+    Counts the database calls of every request and the time spent in the
+    database, the authentication and the serialization.
+
+    The timings are sent in the `Server-Timing` header, so they are shown
+    by the devtools of the browser, and printed as a JSON line when the
+    response ends. The header of the streamed responses only includes the
+    work done before the first chunk, the log line includes everything.
+    """
+
+    def __init__(
+        self, app: ASGIApp, allowed_origin: str = "*", log: bool = True
+    ) -> None:
+        self.app = app
+        self.allowed_origin = allowed_origin
+        self.log = log
+        instrument_query_builders()
+        instrument_serialization()
+        add_query_observer(count_request_query)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        status_code = 500
+
+        async def send_with_timings(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(timings))
+                # Without it the browsers hide the timings of other origins
+                headers["Timing-Allow-Origin"] = self.allowed_origin
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            request_timings.reset(token)
+            if self.log:
+                self.log_request(scope, status_code, timings)
+
+    def log_request(
+        self, scope: Scope, status_code: int, timings: RequestTimings
+    ) -> None:
+        print(
+            json.dumps(
+                {
+                    "event": "request_timing",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route_template(scope),
+                    "status": status_code,
+                    "db_calls": timings.db_calls,
+                    "db_errors": timings.db_errors,
+                    **{
+                        f"{name}_ms": round(seconds * 1000, 2)
+                        for name, seconds in timings.durations.items()
+                    },
+                    "total_ms": round(timings.elapsed() * 1000, 2),
+                }
+            ),
+            flush=True,
+        )
@@ -0,0 +1,43 @@
+"""Module for sales analytics model."""
+
+from __future__ import annotations
+
+from datetime import date  # noqa: TC003
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class SalesGroupBy(str, Enum):
+    BRANCH = "branch"
+    PRODUCT = "product"
+    DAY = "day"
+
+
+class SalesAggregate(BaseModel):
+    purchase_count: int
+    line_count: int
+    unit_quantity: int
+    net_total: float
+    vat_total: float
+    total: float
+    average_purchase: float
+
+
+class SalesGroup(SalesAggregate):
+    key: str | None
+    label: str | None
+
+
+class SalesAnalyticsResponse(BaseModel):
+    group_by: SalesGroupBy
+    start_date: date | None = None
+    end_date: date | None = None
+    id_branch: str | None = None
+    id_product: str | None = None
+    skip: int = 0
+    limit: int = 1000
+    # Number of groups of the window, the groups are a page of them
+    group_count: int
+    groups: list[SalesGroup]
+    totals: SalesAggregate
@@ -57,6 +57,10 @@ class Customer(BaseModel):
     customer_state: bool = True
     branch: BranchResponse | None = None
     last_purchase: PurchaseResponse | None = None
+    # Date the customer list is ordered by, kept by a trigger on purchase
+    last_purchase_date: date | None = None
+    historical_purchases: float = 0.0
+    purchase_count: int = 0
 
     class Config:
         from_attributes = True
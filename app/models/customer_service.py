@@ -42,15 +42,6 @@ class CustomerServiceDB(BaseModel):
     class Config:
         orm_mode = True
 
-class CreateCustomerServiceDB(BaseModel):
-    id_purchase: UUID4
-    service_date: date
-    next_contact_date: date
-    customer_service_status: bool = True
-
-    class Config:
-        orm_mode = True
-
 # --- Service Logic and API Response Models ---
 
 class CustomerServiceCustomerInfo(BaseModel):
@@ -92,6 +92,7 @@ class DeliveryResponse(BaseModel):
 class PurchaseResponse(BaseModel):
     id_purchase: UUID4
     customer_document: str
+    id_branch: UUID4 | None = None
     purchase_date: date
     purchase_duration: int
     next_purchase_date: date
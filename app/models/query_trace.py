@@ -0,0 +1,29 @@
+"""Module for the traces of the queries to PostgREST."""
+
+from __future__ import annotations
+
+from pydantic import BaseModel
+
+
+class QueryTrace(BaseModel):
+    trace_id: str
+    span_id: str
+    # Unix time in nanoseconds when the query started
+    start_time: int
+    duration_ms: float
+    method: str
+    table: str
+    select: str | None = None
+    filters: list[str] = []
+    order: str | None = None
+    offset: int | None = None
+    limit: int | None = None
+    row_count: int | None = None
+    response_bytes: int | None = None
+    error: str | None = None
+
+
+class QueryTraceStatus(BaseModel):
+    enabled: bool
+    size: int
+    recorded: int
@@ -1,18 +1,72 @@
 # File to connect with Supabase
 # Use Singleton patter to instance and create only one instance
-from supabase import Client, create_client
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from supabase import AsyncClient, Client, create_client
 from supabase.lib.client_options import (
+    AsyncClientOptions,
     ClientOptions,
 )
 
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    from app.persistence.db.local.database import LocalDatabase
+
+
+# In-memory stand-in of the project database, used instead of Supabase when
+# `supabase_backend` is `local`, for the tests and benchmarks offline. Its
+# clients replace private parts of the supabase clients, so the stand-in is
+# only imported when the local backend is used
+class LocalDatabaseClient:
+    _instance: LocalDatabase = None
+
+    @classmethod
+    def get_database(cls) -> LocalDatabase:
+        if cls._instance is None:
+            from app.persistence.db.local.schema import (  # noqa: PLC0415
+                create_project_database,
+            )
+
+            cls._instance = create_project_database(
+                settings.local_database_seed
+            )
+        return cls._instance
+
+
+def get_local_database() -> LocalDatabase:
+    return LocalDatabaseClient.get_database()
+
+
+def _use_local() -> bool:
+    return settings.supabase_backend == "local"
+
+
+def _local_client(database: LocalDatabase | None = None) -> Client:
+    from app.persistence.db.local.client import LocalClient  # noqa: PLC0415
+
+    return LocalClient(database or get_local_database())
+
+
+def _local_async_client(
+    database: LocalDatabase | None = None,
+) -> AsyncClient:
+    from app.persistence.db.local.client import (  # noqa: PLC0415
+        LocalAsyncClient,
+    )
+
+    return LocalAsyncClient(database or get_local_database())
+
 
 class SupabaseClient:
     _instance: Client = None
 
     @classmethod
     def get_client(cls) -> Client:
+        if cls._instance is None and _use_local():
+            cls._instance = _local_client()
         if cls._instance is None:
             cls._instance = create_client(
                 settings.supabase_url,
@@ -30,6 +84,8 @@ class AdminSupabaseClient:
 
     @classmethod
     def get_admin_client(cls) -> Client:
+        if cls._instance is None and _use_local():
+            cls._instance = _local_client()
         if cls._instance is None:
             cls._instance = create_client(
                 settings.supabase_url,
@@ -44,3 +100,100 @@ class AdminSupabaseClient:
 
 def get_admin_supabase() -> Client:
     return AdminSupabaseClient.get_admin_client()
+
+
+# Async clients used by the repositories, the queries are awaited so a slow
+# PostgREST round-trip does not block the event loop of the worker.
+# The constructor is sync, so the instance can be created outside the loop
+class AsyncSupabaseClient:
+    _instance: AsyncClient = None
+
+    @classmethod
+    def get_client(cls) -> AsyncClient:
+        if cls._instance is None and _use_local():
+            cls._instance = _local_async_client()
+        if cls._instance is None:
+            cls._instance = AsyncClient(
+                settings.supabase_url,
+                settings.supabase_key,
+                options=AsyncClientOptions(
+                    auto_refresh_token=False,
+                    persist_session=False,
+                ),
+            )
+        return cls._instance
+
+
+def get_async_supabase() -> AsyncClient:
+    return AsyncSupabaseClient.get_client()
+
+
+class AsyncAdminSupabaseClient:
+    _instance: AsyncClient = None
+
+    @classmethod
+    def get_admin_client(cls) -> AsyncClient:
+        if cls._instance is None and _use_local():
+            cls._instance = _local_async_client()
+        if cls._instance is None:
+            cls._instance = AsyncClient(
+                settings.supabase_url,
+                settings.supabase_role_key,
+                options=AsyncClientOptions(
+                    auto_refresh_token=False,
+                    persist_session=False,
+                ),
+            )
+        return cls._instance
+
+
+def get_async_admin_supabase() -> AsyncClient:
+    return AsyncAdminSupabaseClient.get_admin_client()
+
+
+# Client used only to sign in the users. The sign in keeps the session in
+# the client and its queries would run with the token of the user, so it
+# is not shared with the repositories
+class AsyncAuthSupabaseClient:
+    _instance: AsyncClient = None
+
+    @classmethod
+    def get_client(cls) -> AsyncClient:
+        if cls._instance is None and _use_local():
+            cls._instance = _local_async_client()
+        if cls._instance is None:
+            cls._instance = AsyncClient(
+                settings.supabase_url,
+                settings.supabase_key,
+                options=AsyncClientOptions(
+                    auto_refresh_token=False,
+                    persist_session=False,
+                ),
+            )
+        return cls._instance
+
+
+def get_async_auth_supabase() -> AsyncClient:
+    return AsyncAuthSupabaseClient.get_client()
+
+
+def use_local_database(database: LocalDatabase | None = None) -> LocalDatabase:
+    """
+    Points every client of this module to the local database, a new empty
+    project database when it is not given.
+
+    The repositories keep the client they got, so it is called before the
+    app and the repositories are imported, like at the start of the tests.
+    """
+    from app.persistence.db.local.schema import (  # noqa: PLC0415
+        create_project_database,
+    )
+
+    database = database or create_project_database()
+    LocalDatabaseClient._instance = database  # noqa: SLF001
+    SupabaseClient._instance = _local_client(database)  # noqa: SLF001
+    AdminSupabaseClient._instance = _local_client(database)  # noqa: SLF001
+    AsyncSupabaseClient._instance = _local_async_client(database)  # noqa: SLF001
+    AsyncAdminSupabaseClient._instance = _local_async_client(database)  # noqa: SLF001
+    AsyncAuthSupabaseClient._instance = _local_async_client(database)  # noqa: SLF001
+    return database
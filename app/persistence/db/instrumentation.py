@@ -0,0 +1,212 @@
+"""
+Module to observe the queries executed by the PostgREST query builders and
+the coroutines of the repositories.
+
+The `execute` methods of the builders are wrapped once, every query of the
+sync and async clients is reported to the registered observers with its
+duration and response.
+"""
+
+from __future__ import annotations
+
+import functools
+import importlib
+import inspect
+import logging
+import pkgutil
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from typing import Any
+
+from postgrest import (
+    AsyncMaybeSingleRequestBuilder,
+    AsyncQueryRequestBuilder,
+    AsyncSingleRequestBuilder,
+    SyncMaybeSingleRequestBuilder,
+    SyncQueryRequestBuilder,
+    SyncSingleRequestBuilder,
+)
+
+import app.persistence.repositories
+from app.core.metrics import (
+    repository_method_duration_seconds,
+    supabase_errors_total,
+)
+from app.core.request_timing import current_timings
+
+# Called with the builder, the duration in seconds, the response and the
+# error raised, if any
+QueryObserver = Callable[[Any, float, Any, BaseException | None], None]
+
+ASYNC_BUILDERS = (
+    AsyncQueryRequestBuilder,
+    AsyncSingleRequestBuilder,
+    AsyncMaybeSingleRequestBuilder,
+)
+SYNC_BUILDERS = (
+    SyncQueryRequestBuilder,
+    SyncSingleRequestBuilder,
+    SyncMaybeSingleRequestBuilder,
+)
+
+_observers: list[QueryObserver] = []
+
+logger = logging.getLogger(__name__)
+
+# The maybe single builders call the execute of the single builders, only
+# the outer call is reported
+_executing: ContextVar[bool] = ContextVar("executing_query", default=False)
+
+
+def add_query_observer(observer: QueryObserver) -> None:
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_query_observer(observer: QueryObserver) -> None:
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def _notify(
+    builder: Any,  # noqa: ANN401
+    duration: float,
+    response: Any,  # noqa: ANN401
+    error: BaseException | None,
+) -> None:
+    for observer in _observers:
+        try:
+            observer(builder, duration, response, error)
+        except Exception:
+            logger.exception("Error observing the query")
+
+
+def _wrap_async(execute: Callable) -> Callable:
+    @functools.wraps(execute)
+    async def wrapper(self, *args, **kwargs):  # noqa: ANN001, ANN002, ANN003, ANN202
+        if _executing.get():
+            return await execute(self, *args, **kwargs)
+        token = _executing.set(True)  # noqa: FBT003
+        started_at = time.perf_counter()
+        response, error = None, None
+        try:
+            response = await execute(self, *args, **kwargs)
+            return response
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _executing.reset(token)
+            _notify(self, time.perf_counter() - started_at, response, error)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def _wrap_sync(execute: Callable) -> Callable:
+    @functools.wraps(execute)
+    def wrapper(self, *args, **kwargs):  # noqa: ANN001, ANN002, ANN003, ANN202
+        if _executing.get():
+            return execute(self, *args, **kwargs)
+        token = _executing.set(True)  # noqa: FBT003
+        started_at = time.perf_counter()
+        response, error = None, None
+        try:
+            response = execute(self, *args, **kwargs)
+            return response
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _executing.reset(token)
+            _notify(self, time.perf_counter() - started_at, response, error)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def instrument_query_builders() -> None:
+    """Wraps the `execute` of the query builders, it is safe to call twice."""
+    for builders, wrap in (
+        (ASYNC_BUILDERS, _wrap_async),
+        (SYNC_BUILDERS, _wrap_sync),
+    ):
+        for builder in builders:
+            # Only the builders that define `execute`, the subclasses
+            # inherit the wrapped method
+            execute = builder.__dict__.get("execute")
+            if execute is None or getattr(execute, "__instrumented__", False):
+                continue
+            builder.execute = wrap(execute)
+
+
+def count_request_query(
+    builder: Any,  # noqa: ANN401, ARG001
+    duration: float,
+    response: Any,  # noqa: ANN401, ARG001
+    error: BaseException | None,
+) -> None:
+    """Adds the query to the timings of the current request."""
+    timings = current_timings()
+    if timings is not None:
+        timings.add_db_call(duration, failed=error is not None)
+
+
+def count_query_error(
+    builder: Any,  # noqa: ANN401
+    duration: float,  # noqa: ARG001
+    response: Any,  # noqa: ANN401, ARG001
+    error: BaseException | None,
+) -> None:
+    """Counts the failed queries by table or function and error code."""
+    # The cancelled requests are not errors of the database
+    if not isinstance(error, Exception):
+        return
+    code = getattr(error, "code", None) or type(error).__name__
+    supabase_errors_total.inc(builder.path.lstrip("/"), str(code))
+
+
+def _timed_method(repository: str, method: Callable) -> Callable:
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):  # noqa: ANN002, ANN003, ANN202
+        started_at = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await method(*args, **kwargs)
+            outcome = "success"
+            return result
+        finally:
+            repository_method_duration_seconds.observe(
+                time.perf_counter() - started_at,
+                repository,
+                method.__name__,
+                outcome,
+            )
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def instrument_repositories() -> None:
+    """
+    Times the coroutines of every `*Repository` class of the repositories
+    package, it is safe to call twice.
+    """
+    package = app.persistence.repositories
+    for module_info in pkgutil.iter_modules(package.__path__):
+        module = importlib.import_module(
+            f"{package.__name__}.{module_info.name}"
+        )
+        for name, cls in inspect.getmembers(module, inspect.isclass):
+            # Only the classes defined in the module, not the imported ones
+            if (
+                not name.endswith("Repository")
+                or cls.__module__ != module.__name__
+            ):
+                continue
+            for attribute, value in list(vars(cls).items()):
+                if inspect.iscoroutinefunction(value) and not getattr(
+                    value, "__instrumented__", False
+                ):
+                    setattr(cls, attribute, _timed_method(name, value))
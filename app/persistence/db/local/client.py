@@ -0,0 +1,198 @@
+"""
+Module with the Supabase clients of the local database.
+
+The clients are the clients of `supabase` with the HTTP session of
+PostgREST answered in memory, so the query builders, the responses and
+the errors of the repositories are the same as with the project.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING, Any
+
+import httpx
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_TIMEOUT
+from supabase import AsyncClient, Client
+from supabase.lib.client_options import AsyncClientOptions, ClientOptions
+
+if TYPE_CHECKING:
+    from app.persistence.db.local.database import LocalDatabase
+
+# The clients validate the URL and that the key looks like a JWT
+LOCAL_URL = "http://localhost"
+LOCAL_KEY = "local.database"
+
+REST_PREFIX = "/rest/v1/"
+
+
+class LocalPostgrestTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Transport of the PostgREST session that answers with the database."""
+
+    def __init__(self, database: LocalDatabase) -> None:
+        self.database = database
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        resource = path.split(REST_PREFIX, 1)[-1].strip("/")
+        content = request.read()
+        status, headers, body = self.database.handle(
+            request.method,
+            resource,
+            request.url.params.multi_items(),
+            {key.lower(): value for key, value in request.headers.items()},
+            json.loads(content) if content else None,
+        )
+        if status == 204 or request.method == "HEAD":  # noqa: PLR2004
+            return httpx.Response(status, headers=headers, request=request)
+        return httpx.Response(
+            status,
+            headers={**headers, "Content-Type": "application/json"},
+            content=json.dumps(body, default=str).encode(),
+            request=request,
+        )
+
+    async def handle_async_request(
+        self, request: httpx.Request
+    ) -> httpx.Response:
+        await request.aread()
+        return self.handle_request(request)
+
+
+class LocalAsyncPostgrestClient(AsyncPostgrestClient):
+    def __init__(
+        self,
+        base_url: str,
+        database: LocalDatabase,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        # Read by `create_session`, called by the constructor
+        self.database = database
+        super().__init__(base_url, **kwargs)
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: dict[str, str],
+        timeout: Any,  # noqa: ANN401
+        verify: bool = True,  # noqa: FBT001, FBT002, ARG002
+        proxy: str | None = None,  # noqa: ARG002
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=LocalPostgrestTransport(self.database),
+        )
+
+    def schema(self, schema: str) -> LocalAsyncPostgrestClient:
+        return LocalAsyncPostgrestClient(
+            self.base_url,
+            self.database,
+            schema=schema,
+            headers=self.headers,
+            timeout=self.timeout,
+        )
+
+
+class LocalSyncPostgrestClient(SyncPostgrestClient):
+    def __init__(
+        self,
+        base_url: str,
+        database: LocalDatabase,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        self.database = database
+        super().__init__(base_url, **kwargs)
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: dict[str, str],
+        timeout: Any,  # noqa: ANN401
+        verify: bool = True,  # noqa: FBT001, FBT002, ARG002
+        proxy: str | None = None,  # noqa: ARG002
+    ) -> httpx.Client:
+        return httpx.Client(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=LocalPostgrestTransport(self.database),
+        )
+
+    def schema(self, schema: str) -> LocalSyncPostgrestClient:
+        return LocalSyncPostgrestClient(
+            self.base_url,
+            self.database,
+            schema=schema,
+            headers=self.headers,
+            timeout=self.timeout,
+        )
+
+
+class LocalAsyncClient(AsyncClient):
+    """
+    Async Supabase client over the local database, only PostgREST (tables
+    and `rpc`) is answered, auth, storage and functions are not emulated.
+    """
+
+    def __init__(self, database: LocalDatabase) -> None:
+        self.database = database
+        super().__init__(
+            LOCAL_URL,
+            LOCAL_KEY,
+            options=AsyncClientOptions(
+                auto_refresh_token=False,
+                persist_session=False,
+            ),
+        )
+
+    def _init_postgrest_client(  # noqa: PLR0913
+        self,
+        rest_url: str,
+        headers: dict[str, str],
+        schema: str,
+        timeout: Any = DEFAULT_POSTGREST_CLIENT_TIMEOUT,  # noqa: ANN401
+        verify: bool = True,  # noqa: FBT001, FBT002, ARG002
+        proxy: str | None = None,  # noqa: ARG002
+    ) -> LocalAsyncPostgrestClient:
+        return LocalAsyncPostgrestClient(
+            rest_url,
+            self.database,
+            headers=headers,
+            schema=schema,
+            timeout=timeout,
+        )
+
+
+class LocalClient(Client):
+    """Sync Supabase client over the local database."""
+
+    def __init__(self, database: LocalDatabase) -> None:
+        self.database = database
+        super().__init__(
+            LOCAL_URL,
+            LOCAL_KEY,
+            options=ClientOptions(
+                auto_refresh_token=False,
+                persist_session=False,
+            ),
+        )
+
+    def _init_postgrest_client(  # noqa: PLR0913
+        self,
+        rest_url: str,
+        headers: dict[str, str],
+        schema: str,
+        timeout: Any = DEFAULT_POSTGREST_CLIENT_TIMEOUT,  # noqa: ANN401
+        verify: bool = True,  # noqa: FBT001, FBT002, ARG002
+        proxy: str | None = None,  # noqa: ARG002
+    ) -> LocalSyncPostgrestClient:
+        return LocalSyncPostgrestClient(
+            rest_url,
+            self.database,
+            headers=headers,
+            schema=schema,
+            timeout=timeout,
+        )
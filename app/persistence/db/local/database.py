@@ -0,0 +1,669 @@
+"""
+Module with the in-memory tables and the PostgREST requests over them.
+
+The rows are plain dicts with the JSON values PostgREST answers, the
+relationships of the embeds are the foreign keys of the schema.
+"""
+
+from __future__ import annotations
+
+import inspect
+import json
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.persistence.db.local.query import (
+    Column,
+    Condition,
+    Embed,
+    LocalPostgrestError,
+    Logic,
+    matches,
+    parse_condition,
+    parse_logic,
+    parse_order,
+    parse_select,
+    sort_rows,
+    unquote,
+)
+
+# Params of the request that are not filters
+RESERVED_PARAMS = {
+    "select",
+    "order",
+    "limit",
+    "offset",
+    "columns",
+    "on_conflict",
+}
+
+# Accept header of `single()` and `maybe_single()`
+SINGLE_OBJECT = "application/vnd.pgrst.object+json"
+
+
+@dataclass
+class TableSchema:
+    """
+    Primary key, defaults, generated columns, unique keys and foreign keys
+    of a table. The foreign keys reference the primary key of the other
+    table, `on_delete` is `cascade` or `set null`, the rest restrict.
+    """
+
+    primary_key: tuple[str, ...]
+    columns: tuple[str, ...] = ()
+    defaults: dict[str, Callable[[], Any]] = field(default_factory=dict)
+    generated: dict[str, Callable[[dict], Any]] = field(default_factory=dict)
+    unique: tuple[tuple[str, ...], ...] = ()
+    foreign_keys: dict[str, str] = field(default_factory=dict)
+    on_delete: dict[str, str] = field(default_factory=dict)
+
+
+class Table:
+    def __init__(self, name: str, schema: TableSchema) -> None:
+        self.name = name
+        self.schema = schema
+        self.rows: dict[tuple, dict] = {}
+        self.columns = set(schema.primary_key) | set(schema.columns)
+        self.columns |= set(schema.defaults) | set(schema.generated)
+        self.columns |= set(schema.foreign_keys)
+        # Indexes by column, built on the first read and kept by the writes
+        self._indexes: dict[str, dict[Any, list[dict]]] = {}
+
+    def key(self, row: dict) -> tuple:
+        return tuple(row.get(column) for column in self.schema.primary_key)
+
+    def get(self, *key: Any) -> dict | None:  # noqa: ANN401
+        return self.rows.get(key)
+
+    def put(self, key: tuple, row: dict | None) -> None:
+        """Replaces the row of the key, None removes it."""
+        previous = self.rows.pop(key, None)
+        if row is not None:
+            self.rows[key] = row
+        for column, index in self._indexes.items():
+            if previous is not None:
+                bucket = index.get(previous.get(column), [])
+                bucket[:] = [other for other in bucket if other is not previous]
+            if row is not None:
+                index.setdefault(row.get(column), []).append(row)
+
+    def index(self, column: str) -> dict[Any, list[dict]]:
+        index = self._indexes.get(column)
+        if index is None:
+            index = {}
+            for row in self.rows.values():
+                index.setdefault(row.get(column), []).append(row)
+            self._indexes[column] = index
+        return index
+
+    def find(self, column: str, value: Any) -> list[dict]:  # noqa: ANN401
+        if (column,) == self.schema.primary_key:
+            row = self.rows.get((value,))
+            return [row] if row is not None else []
+        return list(self.index(column).get(value, []))
+
+
+@dataclass
+class Relationship:
+    table: str
+    local_column: str
+    remote_column: str
+    many: bool
+
+
+class LocalDatabase:
+    """
+    Tables in memory with the PostgREST API used by the repositories.
+
+    Every request runs in a transaction, an error undoes its writes. The
+    functions called with `rpc` receive the database and the params.
+
+    The reads return at most `max_rows` rows, like the `db-max-rows` of
+    PostgREST (1000 in the Supabase projects), None removes the limit.
+    """
+
+    def __init__(
+        self,
+        schema: dict[str, TableSchema],
+        functions: dict[str, Callable[..., Any]] | None = None,
+        triggers: dict[str, list[Callable]] | None = None,
+        max_rows: int | None = 1000,
+    ) -> None:
+        self.tables = {name: Table(name, s) for name, s in schema.items()}
+        self.functions = functions or {}
+        # Called with the database, the old and the new row after a write
+        self.triggers = triggers or {}
+        self.max_rows = max_rows
+        self._lock = threading.RLock()
+        self._undo: list[Callable[[], None]] | None = None
+
+    # Data access used by the functions and the seeds
+
+    def table(self, name: str) -> Table:
+        table = self.tables.get(name)
+        if table is None:
+            msg = (
+                f"Could not find the table 'public.{name}' in the schema "
+                "cache"
+            )
+            raise LocalPostgrestError(msg, code="PGRST205", status=404)
+        return table
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Undoes the writes of the block when it raises."""
+        with self._lock:
+            if self._undo is not None:
+                yield
+                return
+            self._undo = []
+            try:
+                yield
+            except BaseException:
+                for undo in reversed(self._undo):
+                    undo()
+                raise
+            finally:
+                self._undo = None
+
+    def _write(self, table: Table, key: tuple, row: dict | None) -> None:
+        previous = table.rows.get(key)
+        table.put(key, row)
+        if self._undo is not None:
+            self._undo.append(lambda: table.put(key, previous))
+
+    def _check_foreign_keys(self, table: Table, row: dict) -> None:
+        for column, referenced in table.schema.foreign_keys.items():
+            value = row.get(column)
+            if value is not None and self.table(referenced).get(value) is None:
+                msg = (
+                    f'insert or update on table "{table.name}" violates '
+                    f'foreign key constraint "{table.name}_{column}_fkey"'
+                )
+                raise LocalPostgrestError(
+                    msg,
+                    code="23503",
+                    details=f"Key ({column})=({value}) is not present in "
+                    f'table "{referenced}".',
+                    status=409,
+                )
+
+    def _conflict(
+        self, table: Table, row: dict, columns: tuple[str, ...]
+    ) -> dict | None:
+        if columns == table.schema.primary_key:
+            return table.rows.get(table.key(row))
+        candidates = table.find(columns[0], row.get(columns[0]))
+        return next(
+            (
+                other
+                for other in candidates
+                if all(other.get(c) == row.get(c) for c in columns)
+            ),
+            None,
+        )
+
+    def _check_unique(self, table: Table, row: dict, old: dict | None) -> None:
+        for columns in (table.schema.primary_key, *table.schema.unique):
+            other = self._conflict(table, row, columns)
+            if other is not None and other is not old:
+                constraint = (
+                    f"{table.name}_pkey"
+                    if columns == table.schema.primary_key
+                    else f"{table.name}_{'_'.join(columns)}_key"
+                )
+                values = ", ".join(str(row.get(c)) for c in columns)
+                raise LocalPostgrestError(
+                    "duplicate key value violates unique constraint "
+                    f'"{constraint}"',
+                    code="23505",
+                    details=f"Key ({', '.join(columns)})=({values}) already "
+                    "exists.",
+                    status=409,
+                )
+
+    def _complete(self, table: Table, row: dict) -> dict:
+        for column, generate in table.schema.generated.items():
+            row[column] = generate(row)
+        table.columns |= row.keys()
+        return row
+
+    def insert(self, name: str, values: dict) -> dict:
+        """Inserts the row with its defaults, generated columns and triggers."""
+        table = self.table(name)
+        row = {
+            column: default()
+            for column, default in table.schema.defaults.items()
+            if column not in values
+        }
+        row.update(values)
+        self._complete(table, row)
+        self._check_unique(table, row, None)
+        self._check_foreign_keys(table, row)
+        self._write(table, table.key(row), row)
+        self._run_triggers(name, None, row)
+        return row
+
+    def update(self, name: str, old: dict, changes: dict) -> dict:
+        table = self.table(name)
+        row = self._complete(table, {**old, **changes})
+        self._check_unique(table, row, old)
+        self._check_foreign_keys(table, row)
+        old_key, key = table.key(old), table.key(row)
+        if key != old_key:
+            self._write(table, old_key, None)
+        self._write(table, key, row)
+        self._run_triggers(name, old, row)
+        return row
+
+    def delete(self, name: str, old: dict) -> None:
+        table = self.table(name)
+        key = table.key(old)
+        # The rows that reference the deleted row
+        for other in self.tables.values():
+            for column, referenced in other.schema.foreign_keys.items():
+                if referenced != name or len(table.schema.primary_key) != 1:
+                    continue
+                for child in list(other.find(column, key[0])):
+                    action = other.schema.on_delete.get(column)
+                    if action == "cascade":
+                        self.delete(other.name, child)
+                    elif action == "set null":
+                        self.update(other.name, child, {column: None})
+                    else:
+                        msg = (
+                            f'update or delete on table "{name}" violates '
+                            f'foreign key constraint on table "{other.name}"'
+                        )
+                        raise LocalPostgrestError(
+                            msg, code="23503", status=409
+                        )
+        self._write(table, key, None)
+        self._run_triggers(name, old, None)
+
+    def _run_triggers(
+        self, name: str, old: dict | None, new: dict | None
+    ) -> None:
+        for trigger in self.triggers.get(name, []):
+            trigger(self, old, new)
+
+    def load(self, data: dict[str, Iterable[dict]]) -> None:
+        """Inserts the rows of every table, in the order of the dict."""
+        with self.transaction():
+            for name, rows in data.items():
+                for row in rows:
+                    self.insert(name, row)
+
+    def load_json(self, path: str) -> None:
+        with open(path, encoding="utf-8") as file:
+            self.load(json.load(file))
+
+    def dump(self) -> dict[str, list[dict]]:
+        return {
+            name: [dict(row) for row in table.rows.values()]
+            for name, table in self.tables.items()
+        }
+
+    # Relationships and embeds
+
+    def relationship(
+        self, parent: str, target: str, hint: str | None = None
+    ) -> Relationship:
+        """
+        Finds the relationship of the embed, `target` is a table or a
+        foreign key column of the parent.
+        """
+        parent_table = self.table(parent)
+        foreign_keys = parent_table.schema.foreign_keys
+        # The embed by column, like `purchase:id_purchase(...)`
+        column = hint if hint in foreign_keys else target
+        if column in foreign_keys and (
+            column == target or foreign_keys[column] == target
+        ):
+            referenced = foreign_keys[column]
+            return Relationship(
+                referenced,
+                column,
+                self.table(referenced).schema.primary_key[0],
+                many=False,
+            )
+        if target in self.tables:
+            # Many to one, the parent references the target
+            for column, referenced in foreign_keys.items():
+                if referenced == target:
+                    return Relationship(
+                        target,
+                        column,
+                        self.table(target).schema.primary_key[0],
+                        many=False,
+                    )
+            # One to many, the target references the parent, it is one to
+            # one when the column is unique in the target
+            target_schema = self.table(target).schema
+            for column, referenced in target_schema.foreign_keys.items():
+                if referenced == parent and hint in {None, column}:
+                    unique = (column,) == target_schema.primary_key or (
+                        (column,) in target_schema.unique
+                    )
+                    return Relationship(
+                        target,
+                        parent_table.schema.primary_key[0],
+                        column,
+                        many=not unique,
+                    )
+        msg = (
+            f"Could not find a relationship between '{parent}' and "
+            f"'{target}' in the schema cache"
+        )
+        raise LocalPostgrestError(msg, code="PGRST200", status=400)
+
+    def project(
+        self,
+        name: str,
+        row: dict,
+        fields: list,
+        embedded: dict[str, dict],
+        path: str = "",
+    ) -> dict | None:
+        """
+        Builds the row of the response with its embeds, returns None when an
+        inner embed excludes the row.
+        """
+        table = self.table(name)
+        result = {}
+        for item in fields:
+            if item == "*":
+                result.update(row)
+            elif isinstance(item, Column):
+                if item.name not in row and item.name not in table.columns:
+                    msg = f"column {name}.{item.name} does not exist"
+                    raise LocalPostgrestError(msg, code="42703")
+                result[item.alias] = row.get(item.name)
+            else:
+                value = self._embed(name, row, item, embedded, path)
+                if item.inner and not value:
+                    return None
+                result[item.alias] = value
+        return result
+
+    def _embed(
+        self,
+        parent: str,
+        row: dict,
+        embed: Embed,
+        embedded: dict[str, dict],
+        path: str,
+    ) -> dict | list | None:
+        relationship = self.relationship(parent, embed.target, embed.hint)
+        embed_path = f"{path}{embed.alias}"
+        options = embedded.get(embed_path, {})
+        value = row.get(relationship.local_column)
+        candidates = (
+            self.table(relationship.table).find(
+                relationship.remote_column, value
+            )
+            if value is not None
+            else []
+        )
+        candidates = [
+            child
+            for child in candidates
+            if all(matches(child, f) for f in options.get("filters", []))
+        ]
+        if options.get("order"):
+            candidates = sort_rows(candidates, options["order"])
+        if relationship.many:
+            offset = options.get("offset", 0)
+            limit = options.get("limit")
+            candidates = candidates[
+                offset : None if limit is None else offset + limit
+            ]
+        children = []
+        for child in candidates:
+            projected = self.project(
+                relationship.table,
+                child,
+                embed.fields,
+                embedded,
+                f"{embed_path}.",
+            )
+            if projected is not None:
+                children.append(projected)
+        if relationship.many:
+            return children
+        return children[0] if children else None
+
+    # Requests
+
+    def _read_params(
+        self, params: list[tuple[str, str]]
+    ) -> tuple[list, dict[str, dict], dict[str, str]]:
+        """
+        Splits the params in the filters of the table, the options of the
+        embeds by path and the reserved params.
+        """
+        filters: list[Condition | Logic] = []
+        embedded: dict[str, dict] = {}
+        reserved: dict[str, str] = {}
+        for key, value in params:
+            path, _, name = key.rpartition(".")
+            # The negated logic trees, like `not.or` or `alias.not.or`
+            negate = path == "not" or path.endswith(".not")
+            if negate:
+                path = path.removesuffix("not").removesuffix(".")
+            if not path and name in RESERVED_PARAMS:
+                reserved[name] = value
+                continue
+            options = embedded.setdefault(path, {}) if path else None
+            if options is not None and name in {"limit", "offset"}:
+                options[name] = int(value)
+            elif options is not None and name == "order":
+                options["order"] = parse_order(value)
+            else:
+                condition = (
+                    parse_logic(name, value, negate)
+                    if name in {"or", "and"}
+                    else parse_condition(name, value)
+                )
+                if options is None:
+                    filters.append(condition)
+                else:
+                    options.setdefault("filters", []).append(condition)
+        return filters, embedded, reserved
+
+    def _filtered(self, table: Table, filters: list) -> list[dict]:
+        rows = None
+        # The equality on a text column uses its index
+        sample = next(iter(table.rows.values()), {})
+        for condition in filters:
+            if (
+                isinstance(condition, Condition)
+                and condition.operator == "eq"
+                and not condition.negate
+                and isinstance(sample.get(condition.column), str)
+            ):
+                rows = table.find(condition.column, unquote(condition.value))
+                break
+        if rows is None:
+            rows = list(table.rows.values())
+        return [row for row in rows if all(matches(row, f) for f in filters)]
+
+    def _page(
+        self,
+        name: str | None,
+        rows: list[dict],
+        reserved: dict[str, str],
+        embedded: dict[str, dict],
+        count: bool,  # noqa: FBT001
+        max_rows: int | None = None,
+    ) -> tuple[list[dict], int, int | None]:
+        """
+        Orders, projects and slices the rows. The inner embeds drop rows,
+        so the rows are projected until the page is complete. The page has
+        at most `max_rows` rows, the count is the total of the rows.
+
+        Returns:
+            tuple: The page, its offset and the total of rows when the
+            count is requested.
+
+        """
+        if reserved.get("order"):
+            rows = sort_rows(rows, parse_order(reserved["order"]))
+        offset = int(reserved.get("offset", 0))
+        limit = reserved.get("limit")
+        if max_rows is not None:
+            limit = max_rows if limit is None else min(int(limit), max_rows)
+        end = None if limit is None else offset + int(limit)
+        if name is None:
+            return rows[offset:end], offset, len(rows) if count else None
+
+        fields = parse_select(reserved.get("select"))
+        projected = []
+        for row in rows:
+            if not count and end is not None and len(projected) >= end:
+                break
+            item = self.project(name, row, fields, embedded)
+            if item is not None:
+                projected.append(item)
+        total = len(projected) if count else None
+        return projected[offset:end], offset, total
+
+    def handle(
+        self,
+        method: str,
+        resource: str,
+        params: list[tuple[str, str]],
+        headers: dict[str, str],
+        body: Any,  # noqa: ANN401
+    ) -> tuple[int, dict[str, str], Any]:
+        """
+        Answers a PostgREST request.
+
+        Returns:
+            tuple: The status, the headers and the JSON body.
+
+        """
+        prefer = headers.get("prefer", "")
+        single = SINGLE_OBJECT in headers.get("accept", "")
+        try:
+            with self.transaction():
+                filters, embedded, reserved = self._read_params(params)
+                name = None
+                if resource.startswith("rpc/"):
+                    rows = self._call(resource[4:], body or {})
+                    if not isinstance(rows, list):
+                        return 200, {}, rows
+                    rows = [
+                        row
+                        for row in rows
+                        if all(matches(row, f) for f in filters)
+                    ]
+                else:
+                    name = resource
+                    rows = self._execute(
+                        method, name, filters, body, prefer, reserved
+                    )
+                # Only the reads are limited, not the written rows
+                page, offset, total = self._page(
+                    name,
+                    rows,
+                    reserved,
+                    embedded,
+                    "count=" in prefer,
+                    self.max_rows
+                    if method in {"GET", "HEAD"} or name is None
+                    else None,
+                )
+                if single and len(page) != 1:
+                    raise LocalPostgrestError(
+                        "JSON object requested, multiple (or no) rows returned",
+                        code="PGRST116",
+                        details=f"The result contains {len(page)} rows",
+                        status=406,
+                    )
+        except LocalPostgrestError as e:
+            return e.status, {}, e.to_json()
+
+        count = "*" if total is None else total
+        response_headers = {
+            "Content-Range": f"{offset}-{offset + len(page) - 1}/{count}"
+            if page
+            else f"*/{count}"
+        }
+        if method not in {"GET", "HEAD"} and name is not None and (
+            "return=representation" not in prefer
+        ):
+            return 204, response_headers, None
+        status = 201 if method == "POST" and name is not None else 200
+        return status, response_headers, page[0] if single else page
+
+    def _execute(
+        self,
+        method: str,
+        name: str,
+        filters: list,
+        body: Any,  # noqa: ANN401
+        prefer: str,
+        reserved: dict[str, str],
+    ) -> list[dict]:
+        """Reads or writes the rows of the table, returns the rows."""
+        table = self.table(name)
+        if method in {"GET", "HEAD"}:
+            return self._filtered(table, filters)
+        if method == "POST":
+            return self._insert(table, body, prefer, reserved)
+        if method == "PATCH":
+            return [
+                self.update(name, row, body)
+                for row in self._filtered(table, filters)
+            ]
+        if method == "DELETE":
+            rows = self._filtered(table, filters)
+            for row in rows:
+                self.delete(name, row)
+            return rows
+        msg = f"Method {method} is not supported"
+        raise LocalPostgrestError(msg, status=405)
+
+    def _insert(
+        self,
+        table: Table,
+        body: Any,  # noqa: ANN401
+        prefer: str,
+        reserved: dict[str, str],
+    ) -> list[dict]:
+        rows = body if isinstance(body, list) else [body]
+        on_conflict = tuple(
+            column.strip('"')
+            for column in reserved.get("on_conflict", "").split(",")
+            if column
+        ) or table.schema.primary_key
+        inserted = []
+        for values in rows:
+            if "resolution=" in prefer:
+                existing = self._conflict(table, values, on_conflict)
+                if existing is not None:
+                    if "resolution=merge-duplicates" in prefer:
+                        inserted.append(
+                            self.update(table.name, existing, values)
+                        )
+                    continue
+            inserted.append(self.insert(table.name, values))
+        return inserted
+
+    def _call(self, name: str, params: dict) -> Any:  # noqa: ANN401
+        function = self.functions.get(name)
+        try:
+            if function is None:
+                raise TypeError
+            inspect.signature(function).bind(self, **params)
+        except TypeError as e:
+            msg = (
+                f"Could not find the function public.{name}"
+                f"({', '.join(sorted(params))}) in the schema cache"
+            )
+            raise LocalPostgrestError(msg, code="PGRST202", status=404) from e
+        return function(self, **params)
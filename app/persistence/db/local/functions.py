@@ -0,0 +1,413 @@
+"""
+Module with the functions called with `rpc`, they follow the functions of
+the migrations in `supabase/migrations`. An error raised by a function
+undoes every write of the call, like the transaction of the function.
+"""
+
+from __future__ import annotations
+
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
+
+from app.persistence.db.local.database import LocalDatabase
+from app.persistence.db.local.query import LocalPostgrestError
+
+
+def _raise(message: str, code: str) -> None:
+    raise LocalPostgrestError(message, code=code)
+
+
+def create_purchase(db: LocalDatabase, payload: dict) -> dict:
+    """Creates the purchase with its lines, payment, delivery and service."""
+    # 1. Validate the customer data
+    customer_document = payload.get("customer_document")
+    customer = db.table("customer").get(customer_document)
+    if customer is None:
+        _raise(
+            "Customer data is invalid for customer with document "
+            f"{customer_document}",
+            "P0002",
+        )
+    if not customer.get("customer_state"):
+        _raise(f"Customer inactive. Document {customer_document}", "P0001")
+
+    # 2. Validate if the branch is valid and exists
+    id_branch = payload.get("id_branch")
+    if db.table("branch").get(id_branch) is None:
+        _raise(f"Branch with id {id_branch} does not exist", "P0002")
+    if float(payload.get("remaining_balance") or 0) < 0:
+        _raise("Remaining balance cannot be negative", "P0001")
+
+    # 3. Create the purchase record
+    purchase_date = date.fromisoformat(payload["purchase_date"])
+    purchase_duration = int(payload["purchase_duration"])
+    purchase = db.insert(
+        "purchase",
+        {
+            "customer_document": customer_document,
+            "id_branch": id_branch,
+            "purchase_date": purchase_date.isoformat(),
+            "purchase_duration": purchase_duration,
+            "next_purchase_date": (
+                purchase_date + timedelta(days=purchase_duration)
+            ).isoformat(),
+        },
+    )
+
+    # 4. Validate each product, decrement its stock and add the line
+    products = []
+    for line in payload.get("products") or []:
+        quantity = int(line["unit_quantity"])
+        product = db.table("product").get(line["id_product"])
+        if product is None:
+            _raise(f"Product not found {line['id_product']}", "P0002")
+        if not product.get("product_state"):
+            _raise(f"Product is inactive {product['id_product']}", "P0001")
+        if (product.get("vat") or 0) <= 0:
+            _raise(
+                f"Invalid VAT for product {product['id_product']}, VAT must "
+                "be greater than 0",
+                "P0001",
+            )
+        stock = next(
+            (
+                row
+                for row in db.table("branch_stock").find(
+                    "id_product", product["id_product"]
+                )
+                if row.get("id_branch") == id_branch
+                and (row.get("quantity") or 0) >= quantity
+            ),
+            None,
+        )
+        if stock is None:
+            _raise(
+                f"Product with id {product['id_product']} does not have "
+                "enough stock",
+                "P0001",
+            )
+        db.update(
+            "branch_stock", stock, {"quantity": stock["quantity"] - quantity}
+        )
+        subtotal = product["sale_price"] * quantity
+        line_row = db.insert(
+            "purchase_product",
+            {
+                "id_purchase": purchase["id_purchase"],
+                "id_product": product["id_product"],
+                "unit_quantity": quantity,
+                "subtotal_without_vat": subtotal,
+                "total_price_with_vat": subtotal * (1 + product["vat"] / 100),
+            },
+        )
+        products.append(
+            {
+                key: line_row[key]
+                for key in (
+                    "id_product",
+                    "unit_quantity",
+                    "subtotal_without_vat",
+                    "total_price_with_vat",
+                )
+            }
+        )
+
+    # 5. Record the payment
+    payment = db.insert(
+        "payment",
+        {
+            "id_purchase": purchase["id_purchase"],
+            "payment_type": payload.get("payment_type"),
+            "payment_status": payload.get("payment_status"),
+            "remaining_balance": payload.get("remaining_balance"),
+        },
+    )
+
+    # 6. Record the delivery (if applicable)
+    delivery = None
+    if payload.get("delivery_type") is not None:
+        delivery = db.insert(
+            "delivery",
+            {
+                "id_purchase": purchase["id_purchase"],
+                "delivery_type": payload["delivery_type"],
+                "delivery_status": "Sin Preparar",
+                "delivery_cost": payload.get("delivery_cost"),
+                "delivery_comment": payload.get("delivery_comment"),
+            },
+        )
+
+    # 7. Create the customer service follow-up of the purchase
+    db.insert(
+        "customer_service",
+        {
+            "id_purchase": purchase["id_purchase"],
+            "service_date": purchase["purchase_date"],
+            "next_contact_date": purchase["next_purchase_date"],
+            "contact_comment": None,
+            "customer_service_status": True,
+        },
+    )
+
+    # 8. Add the purchase to the summary of the customer
+    apply_purchase_to_customer_summary(db, purchase["id_purchase"])
+
+    # 9. Build the response
+    return {
+        "id_purchase": purchase["id_purchase"],
+        "customer_document": customer_document,
+        "id_branch": purchase["id_branch"],
+        "purchase_date": purchase["purchase_date"],
+        "purchase_duration": purchase["purchase_duration"],
+        "next_purchase_date": purchase["next_purchase_date"],
+        "products": products,
+        "payment": dict(payment),
+        "delivery": dict(delivery) if delivery else None,
+    }
+
+
+def purchase_summary_json(db: LocalDatabase, p_id_purchase: str) -> dict | None:
+    """Purchase with its products and total, as it is shown to the customer."""
+    purchase = db.table("purchase").get(p_id_purchase)
+    if purchase is None:
+        return None
+    lines = db.table("purchase_product").find("id_purchase", p_id_purchase)
+    products = []
+    for line in lines:
+        product = db.table("product").get(line.get("id_product")) or {}
+        products.append(
+            {
+                "id_product": line.get("id_product"),
+                "product_name": product.get("product_name"),
+                "unit_quantity": line.get("unit_quantity"),
+                "subtotal_without_vat": line.get("subtotal_without_vat"),
+                "total_price_with_vat": line.get("total_price_with_vat"),
+            }
+        )
+    return {
+        "id_purchase": purchase["id_purchase"],
+        "purchase_date": purchase.get("purchase_date"),
+        "purchase_duration": purchase.get("purchase_duration"),
+        "next_purchase_date": purchase.get("next_purchase_date"),
+        "total_purchase": sum(
+            line.get("total_price_with_vat") or 0 for line in lines
+        ),
+        "products": products,
+    }
+
+
+def apply_purchase_to_customer_summary(
+    db: LocalDatabase, p_id_purchase: str
+) -> None:
+    """Adds a new purchase to the summary of its customer."""
+    summary = purchase_summary_json(db, p_id_purchase)
+    if summary is None:
+        return
+    purchase = db.table("purchase").get(p_id_purchase)
+    total, purchase_date = summary["total_purchase"], summary["purchase_date"]
+    current = db.table("customer_summary").get(purchase["customer_document"])
+    if current is None:
+        db.insert(
+            "customer_summary",
+            {
+                "customer_document": purchase["customer_document"],
+                "lifetime_total": total,
+                "purchase_count": 1,
+                "last_purchase_id": p_id_purchase,
+                "last_purchase_total": total,
+                "last_purchase": summary,
+            },
+        )
+        return
+
+    changes = {
+        "lifetime_total": current["lifetime_total"] + total,
+        "purchase_count": current["purchase_count"] + 1,
+        "updated_at": datetime.now(UTC).isoformat(),
+    }
+    # The last purchase is the greatest (purchase_date, id_purchase), like
+    # in rebuild_customer_summary
+    last_purchase = current.get("last_purchase")
+    if current.get("last_purchase_id") is None or (
+        purchase_date,
+        p_id_purchase,
+    ) > (last_purchase["purchase_date"], current["last_purchase_id"]):
+        changes |= {
+            "last_purchase_id": p_id_purchase,
+            "last_purchase_total": total,
+            "last_purchase": summary,
+        }
+    db.update("customer_summary", current, changes)
+
+
+def rebuild_customer_summary(
+    db: LocalDatabase, p_customer_document: str | None = None
+) -> int:
+    """Recomputes the summaries from the purchases, returns their number."""
+    purchases: dict[str, list[dict]] = {}
+    for purchase in db.table("purchase").rows.values():
+        document = purchase["customer_document"]
+        if p_customer_document in {None, document}:
+            purchases.setdefault(document, []).append(purchase)
+
+    # The customers left without purchases have no summary
+    summaries = db.table("customer_summary")
+    for row in list(summaries.rows.values()):
+        if (
+            p_customer_document in {None, row["customer_document"]}
+            and row["customer_document"] not in purchases
+        ):
+            db.delete("customer_summary", row)
+
+    lines = db.table("purchase_product")
+    for document, rows in purchases.items():
+        last = max(
+            rows, key=lambda row: (row["purchase_date"], row["id_purchase"])
+        )
+        summary = purchase_summary_json(db, last["id_purchase"])
+        values = {
+            "lifetime_total": sum(
+                line.get("total_price_with_vat") or 0
+                for row in rows
+                for line in lines.find("id_purchase", row["id_purchase"])
+            ),
+            "purchase_count": len(rows),
+            "last_purchase_id": last["id_purchase"],
+            "last_purchase_total": summary["total_purchase"],
+            "last_purchase": summary,
+        }
+        # Insert or replace the summary, like `on conflict do update`
+        current = summaries.get(document)
+        if current is None:
+            db.insert(
+                "customer_summary", {"customer_document": document, **values}
+            )
+        else:
+            db.update(
+                "customer_summary",
+                current,
+                values | {"updated_at": datetime.now(UTC).isoformat()},
+            )
+    return len(purchases)
+
+
+def sales_analytics(  # noqa: PLR0913
+    db: LocalDatabase,
+    p_group_by: str,
+    p_start_date: str | None = None,
+    p_end_date: str | None = None,
+    p_id_branch: str | None = None,
+    p_id_product: str | None = None,
+    p_skip: int = 0,
+    p_limit: int = 1000,
+) -> dict:
+    """
+    Purchase lines grouped by branch, product or day, a page of the groups
+    with the totals of all of them.
+    """
+    groups: dict[str | None, dict[str, Any]] = {}
+    totals: dict[str, Any] = {"purchases": set(), "lines": []}
+    for line in db.table("purchase_product").rows.values():
+        purchase = db.table("purchase").get(line["id_purchase"])
+        purchase_date = purchase["purchase_date"]
+        id_branch = purchase.get("id_branch")
+        if (
+            (p_start_date and purchase_date < p_start_date)
+            or (p_end_date and purchase_date > p_end_date)
+            or (p_id_branch and id_branch != p_id_branch)
+            or (p_id_product and line["id_product"] != p_id_product)
+        ):
+            continue
+        if p_group_by == "branch":
+            branch = db.table("branch").get(id_branch) or {}
+            key, label = id_branch, branch.get("branch_name")
+        elif p_group_by == "product":
+            product = db.table("product").get(line["id_product"]) or {}
+            key, label = line["id_product"], product.get("product_name")
+        else:
+            key, label = purchase_date, purchase_date
+        group = groups.setdefault(
+            key, {"label": label, "purchases": set(), "lines": []}
+        )
+        for aggregate in (group, totals):
+            aggregate["purchases"].add(line["id_purchase"])
+            aggregate["lines"].append(line)
+
+    def aggregate_json(aggregate: dict) -> dict:
+        lines = aggregate["lines"]
+        net_total = sum(line["subtotal_without_vat"] for line in lines)
+        total = sum(line["total_price_with_vat"] for line in lines)
+        return {
+            "purchase_count": len(aggregate["purchases"]),
+            "line_count": len(lines),
+            "unit_quantity": sum(line["unit_quantity"] for line in lines),
+            "net_total": net_total,
+            "vat_total": total - net_total,
+            "total": total,
+        }
+
+    # The null key of a group sorts last, like `nulls last`
+    keys = sorted(groups, key=lambda key: (key is None, key or ""))
+    return {
+        "totals": aggregate_json(totals),
+        "group_count": len(keys),
+        "groups": [
+            {
+                "group_key": key,
+                "group_label": groups[key]["label"],
+                **aggregate_json(groups[key]),
+            }
+            for key in keys[int(p_skip) : int(p_skip) + int(p_limit)]
+        ],
+    }
+
+
+def acquire_scheduler_lease(
+    db: LocalDatabase,
+    p_lease_name: str,
+    p_lease_owner: str,
+    p_ttl_seconds: int,
+) -> bool:
+    """Acquires or renews the lease, returns True when the owner holds it."""
+    now = datetime.now(UTC)
+    expires_at = (now + timedelta(seconds=p_ttl_seconds)).isoformat()
+    lease = db.table("scheduler_lease").get(p_lease_name)
+    if lease is None:
+        db.insert(
+            "scheduler_lease",
+            {
+                "lease_name": p_lease_name,
+                "lease_owner": p_lease_owner,
+                "expires_at": expires_at,
+            },
+        )
+        return True
+    if lease["lease_owner"] == p_lease_owner or (
+        datetime.fromisoformat(lease["expires_at"]) < now
+    ):
+        db.update(
+            "scheduler_lease",
+            lease,
+            {"lease_owner": p_lease_owner, "expires_at": expires_at},
+        )
+        return True
+    return False
+
+
+def release_scheduler_lease(
+    db: LocalDatabase, p_lease_name: str, p_lease_owner: str
+) -> None:
+    lease = db.table("scheduler_lease").get(p_lease_name)
+    if lease is not None and lease["lease_owner"] == p_lease_owner:
+        db.delete("scheduler_lease", lease)
+
+
+PROJECT_FUNCTIONS = {
+    "create_purchase": create_purchase,
+    "purchase_summary_json": purchase_summary_json,
+    "apply_purchase_to_customer_summary": apply_purchase_to_customer_summary,
+    "rebuild_customer_summary": rebuild_customer_summary,
+    "sales_analytics": sales_analytics,
+    "acquire_scheduler_lease": acquire_scheduler_lease,
+    "release_scheduler_lease": release_scheduler_lease,
+}
@@ -0,0 +1,299 @@
+"""
+Module with the subset of the PostgREST query language used by the
+repositories: the select with embeds, the filters, the logic trees of
+`or`/`and` and the order.
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+
+class LocalPostgrestError(Exception):
+    """Error answered by the stand-in with the body of a PostgREST error."""
+
+    def __init__(
+        self,
+        message: str,
+        code: str = "PGRST100",
+        details: str | None = None,
+        hint: str | None = None,
+        status: int = 400,
+    ) -> None:
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.details = details
+        self.hint = hint
+        self.status = status
+
+    def to_json(self) -> dict:
+        return {
+            "code": self.code,
+            "message": self.message,
+            "details": self.details,
+            "hint": self.hint,
+        }
+
+
+# `alias:item`, the casts like `column::text` are not aliases
+ALIAS = re.compile(r"^(\w+):(?!:)(.*)$", re.DOTALL)
+
+
+@dataclass
+class Column:
+    name: str
+    alias: str
+
+
+@dataclass
+class Embed:
+    alias: str
+    target: str
+    hint: str | None
+    inner: bool
+    fields: list[Column | Embed | str]
+
+
+@dataclass
+class Condition:
+    column: str
+    operator: str
+    value: str
+    negate: bool = False
+
+
+@dataclass
+class Logic:
+    operator: str  # and, or
+    items: list[Condition | Logic] = field(default_factory=list)
+    negate: bool = False
+
+
+@dataclass
+class OrderTerm:
+    column: str
+    desc: bool
+    nulls_first: bool
+
+
+def split_top_level(text: str, separator: str = ",") -> list[str]:
+    """Splits on the separators outside of parentheses and quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == separator and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    if current or parts:
+        parts.append("".join(current))
+    return [part for part in parts if part != ""]
+
+
+def _strip_whitespace(text: str) -> str:
+    quoted, cleaned = False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        if char.isspace() and not quoted:
+            continue
+        cleaned.append(char)
+    return "".join(cleaned)
+
+
+def parse_select(text: str | None) -> list[Column | Embed | str]:
+    """
+    Parses the select, the items are `*`, the columns with an optional
+    alias and cast, and the embeds like `alias:target!inner(columns)`.
+    """
+    fields: list[Column | Embed | str] = []
+    for item in split_top_level(_strip_whitespace(text or "*")):
+        if item == "*":
+            fields.append("*")
+            continue
+        alias = None
+        aliased = ALIAS.match(item)
+        if aliased:
+            alias, item = aliased.groups()
+        if item.endswith(")") and "(" in item:
+            target, inner_text = item[:-1].split("(", 1)
+            target, *hints = target.split("!")
+            inner = "inner" in hints
+            hint = next((h for h in hints if h not in {"inner", "left"}), None)
+            fields.append(
+                Embed(
+                    alias=alias or target,
+                    target=target,
+                    hint=hint,
+                    inner=inner,
+                    fields=parse_select(inner_text or "*"),
+                )
+            )
+            continue
+        name = item.split("::", 1)[0].strip('"')
+        fields.append(Column(name=name, alias=alias or name))
+    return fields
+
+
+def unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':  # noqa: PLR2004
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+
+def parse_condition(column: str, expression: str) -> Condition:
+    """Parses the value of a filter param like `not.eq.value`."""
+    negate = False
+    if expression.startswith("not."):
+        negate, expression = True, expression[4:]
+    operator, _, value = expression.partition(".")
+    if not value and operator not in {"eq", "neq", "like", "ilike"}:
+        msg = f'"failed to parse filter ({expression})"'
+        raise LocalPostgrestError(msg, code="PGRST100")
+    return Condition(column, operator, value, negate)
+
+
+def parse_logic(operator: str, text: str, negate: bool = False) -> Logic:  # noqa: FBT001, FBT002
+    """Parses the `(a.eq.1,and(b.gt.2,c.is.null))` of the logic filters."""
+    text = text.strip()
+    if not (text.startswith("(") and text.endswith(")")):
+        msg = f'"failed to parse logic tree ({text})"'
+        raise LocalPostgrestError(msg, code="PGRST100")
+    logic = Logic(operator, negate=negate)
+    for item in split_top_level(text[1:-1]):
+        item_negate = item.startswith("not.")
+        body = item[4:] if item_negate else item
+        for name in ("and", "or"):
+            if body.startswith(f"{name}("):
+                logic.items.append(
+                    parse_logic(name, body[len(name) :], item_negate)
+                )
+                break
+        else:
+            column, _, expression = item.partition(".")
+            logic.items.append(parse_condition(column, expression))
+    return logic
+
+
+def parse_order(text: str) -> list[OrderTerm]:
+    terms = []
+    for item in split_top_level(text):
+        column, *modifiers = item.split(".")
+        desc = "desc" in modifiers
+        # The default of Postgres, the nulls are the biggest values
+        nulls_first = desc
+        if "nullsfirst" in modifiers:
+            nulls_first = True
+        elif "nullslast" in modifiers:
+            nulls_first = False
+        terms.append(OrderTerm(column.strip('"'), desc, nulls_first))
+    return terms
+
+
+@functools.lru_cache(maxsize=1024)
+def _pattern(pattern: str, ignore_case: bool) -> re.Pattern:  # noqa: FBT001
+    regex = "".join(
+        ".*"
+        if char in "*%"
+        else "."
+        if char == "_"
+        else re.escape(char)
+        for char in pattern
+    )
+    flags = re.DOTALL | (re.IGNORECASE if ignore_case else 0)
+    return re.compile(regex, flags)
+
+
+def _coerce(value: Any, literal: str) -> Any:  # noqa: ANN401
+    """Converts the literal of the filter to the type of the column."""
+    if isinstance(value, bool):
+        return literal.lower() in {"true", "t", "1"}
+    if isinstance(value, int | float):
+        try:
+            return float(literal)
+        except ValueError:
+            return literal
+    return literal
+
+
+def _compare(value: Any, literal: str, operator: str) -> bool:  # noqa: ANN401, PLR0911
+    if operator == "is":
+        literal = literal.lower()
+        if literal == "null":
+            return value is None
+        if literal in {"true", "false"}:
+            return value is (literal == "true")
+        return False
+    if value is None:
+        return False
+    if operator == "in":
+        items = [unquote(item) for item in split_top_level(literal[1:-1])]
+        return str(value) in items or any(
+            _coerce(value, item) == value for item in items
+        )
+    if operator in {"like", "ilike"}:
+        return bool(
+            _pattern(unquote(literal), operator == "ilike").fullmatch(
+                str(value)
+            )
+        )
+    if operator in {"match", "imatch"}:
+        flags = re.IGNORECASE if operator == "imatch" else 0
+        return re.search(unquote(literal), str(value), flags) is not None
+
+    other = _coerce(value, unquote(literal))
+    if isinstance(value, int | float) and isinstance(other, str):
+        value = str(value)
+    elif isinstance(value, str) and not isinstance(other, str):
+        other = str(other)
+    try:
+        if operator == "eq":
+            return value == other
+        if operator == "neq":
+            return value != other
+        if operator == "gt":
+            return value > other
+        if operator == "gte":
+            return value >= other
+        if operator == "lt":
+            return value < other
+        if operator == "lte":
+            return value <= other
+    except TypeError:
+        return False
+    msg = f"The operator '{operator}' is not supported by the local database"
+    raise LocalPostgrestError(msg, code="PGRST100")
+
+
+def matches(row: dict, condition: Condition | Logic) -> bool:
+    """Checks the filter or logic tree on the row."""
+    if isinstance(condition, Logic):
+        if condition.operator == "and":
+            result = all(matches(row, item) for item in condition.items)
+        else:
+            result = any(matches(row, item) for item in condition.items)
+    else:
+        result = _compare(
+            row.get(condition.column), condition.value, condition.operator
+        )
+    return result != condition.negate
+
+
+def sort_rows(rows: list[dict], terms: list[OrderTerm]) -> list[dict]:
+    """Sorts the rows like `ORDER BY`, the last terms are sorted first."""
+    for term in reversed(terms):
+        nulls = [row for row in rows if row.get(term.column) is None]
+        values = [row for row in rows if row.get(term.column) is not None]
+        values.sort(key=lambda row: row[term.column], reverse=term.desc)
+        rows = nulls + values if term.nulls_first else values + nulls
+    return rows
@@ -0,0 +1,212 @@
+"""
+Module with the tables of the project for the local database, the keys,
+defaults and triggers follow the migrations of `supabase/migrations`.
+"""
+
+from __future__ import annotations
+
+import uuid
+from datetime import UTC, datetime
+
+from app.persistence.db.local.database import LocalDatabase, TableSchema
+from app.persistence.db.local.functions import PROJECT_FUNCTIONS
+from app.utils.text import normalize_text
+
+
+def new_uuid() -> str:
+    return str(uuid.uuid4())
+
+
+def now() -> str:
+    return datetime.now(UTC).isoformat()
+
+
+def customer_search_text(row: dict) -> str:
+    """Generated `search_text` column of the customers, without accents."""
+    return normalize_text(
+        " ".join(
+            str(row.get(column) or "")
+            for column in (
+                "customer_document",
+                "customer_first_name",
+                "customer_last_name",
+                "email",
+                "phone_number",
+                "home_address",
+            )
+        )
+    )
+
+
+PROJECT_SCHEMA: dict[str, TableSchema] = {
+    "department": TableSchema(
+        primary_key=("id_department",),
+        columns=("department_name",),
+        defaults={"id_department": new_uuid},
+    ),
+    "city": TableSchema(
+        primary_key=("id_city",),
+        columns=("city_name",),
+        defaults={"id_city": new_uuid},
+        foreign_keys={"id_department": "department"},
+    ),
+    "branch": TableSchema(
+        primary_key=("id_branch",),
+        columns=("branch_name", "manager_name", "branch_address"),
+        defaults={"id_branch": new_uuid},
+        foreign_keys={"id_city": "city"},
+    ),
+    "product": TableSchema(
+        primary_key=("id_product",),
+        columns=(
+            "id_supplier",
+            "product_name",
+            "product_description",
+            "purchase_price",
+            "product_discount",
+            "sale_price",
+            "profit_margin",
+            "product_state",
+            "vat",
+        ),
+        defaults={"id_product": new_uuid},
+    ),
+    "branch_stock": TableSchema(
+        primary_key=("id_branch_stock",),
+        columns=("quantity",),
+        defaults={"id_branch_stock": new_uuid},
+        unique=(("id_product", "id_branch"),),
+        foreign_keys={"id_product": "product", "id_branch": "branch"},
+    ),
+    "customer": TableSchema(
+        primary_key=("customer_document",),
+        columns=(
+            "document_type",
+            "customer_first_name",
+            "customer_last_name",
+            "phone_number",
+            "email",
+            "home_address",
+            "customer_state",
+        ),
+        defaults={"last_purchase_date": lambda: None},
+        # `updated_at` is set by the trigger `customer_set_updated_at`
+        generated={
+            "search_text": customer_search_text,
+            "updated_at": lambda _: now(),
+        },
+        foreign_keys={"id_branch": "branch"},
+    ),
+    "purchase": TableSchema(
+        primary_key=("id_purchase",),
+        columns=("purchase_date", "purchase_duration", "next_purchase_date"),
+        defaults={"id_purchase": new_uuid},
+        foreign_keys={"customer_document": "customer", "id_branch": "branch"},
+        on_delete={"id_branch": "set null"},
+    ),
+    "purchase_product": TableSchema(
+        primary_key=("id_purchase_product",),
+        columns=(
+            "unit_quantity",
+            "subtotal_without_vat",
+            "total_price_with_vat",
+        ),
+        defaults={"id_purchase_product": new_uuid},
+        foreign_keys={"id_purchase": "purchase", "id_product": "product"},
+    ),
+    "payment": TableSchema(
+        primary_key=("id_payment",),
+        columns=("payment_type", "payment_status", "remaining_balance"),
+        defaults={"id_payment": new_uuid},
+        foreign_keys={"id_purchase": "purchase"},
+    ),
+    "delivery": TableSchema(
+        primary_key=("id_delivery",),
+        columns=(
+            "delivery_type",
+            "delivery_status",
+            "delivery_cost",
+            "delivery_comment",
+        ),
+        defaults={"id_delivery": new_uuid},
+        foreign_keys={"id_purchase": "purchase"},
+    ),
+    "customer_service": TableSchema(
+        primary_key=("id_customer_service",),
+        columns=(
+            "service_date",
+            "next_contact_date",
+            "contact_comment",
+            "customer_service_status",
+        ),
+        defaults={"id_customer_service": new_uuid},
+        foreign_keys={"id_purchase": "purchase"},
+    ),
+    "customer_summary": TableSchema(
+        primary_key=("customer_document",),
+        columns=("last_purchase_total", "last_purchase"),
+        defaults={
+            "lifetime_total": lambda: 0,
+            "purchase_count": lambda: 0,
+            "updated_at": now,
+        },
+        foreign_keys={
+            "customer_document": "customer",
+            "last_purchase_id": "purchase",
+        },
+        on_delete={
+            "customer_document": "cascade",
+            "last_purchase_id": "set null",
+        },
+    ),
+    "scheduler_lease": TableSchema(
+        primary_key=("lease_name",),
+        columns=("lease_owner", "expires_at"),
+    ),
+}
+
+
+def _refresh_last_purchase_date(
+    db: LocalDatabase, customer_document: str | None
+) -> None:
+    customer = db.table("customer").get(customer_document)
+    if customer is None:
+        return
+    dates = [
+        purchase["purchase_date"]
+        for purchase in db.table("purchase").find(
+            "customer_document", customer_document
+        )
+        if purchase.get("purchase_date") is not None
+    ]
+    last_purchase_date = max(dates, default=None)
+    if customer.get("last_purchase_date") != last_purchase_date:
+        db.update(
+            "customer", customer, {"last_purchase_date": last_purchase_date}
+        )
+
+
+def refresh_customer_last_purchase_date(
+    db: LocalDatabase, old: dict | None, new: dict | None
+) -> None:
+    """Trigger of the purchases, see `refresh_customer_last_purchase_date`."""
+    for row in (old, new):
+        if row is not None:
+            _refresh_last_purchase_date(db, row.get("customer_document"))
+
+
+PROJECT_TRIGGERS = {"purchase": [refresh_customer_last_purchase_date]}
+
+
+def create_project_database(seed_path: str | None = None) -> LocalDatabase:
+    """
+    Creates the local database with the tables and functions of the
+    project, the rows of the JSON file `{table: [rows]}` are loaded in the
+    order of the file.
+    """
+    database = LocalDatabase(
+        PROJECT_SCHEMA, functions=PROJECT_FUNCTIONS, triggers=PROJECT_TRIGGERS
+    )
+    if seed_path:
+        database.load_json(seed_path)
+    return database
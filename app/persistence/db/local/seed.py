@@ -0,0 +1,160 @@
+"""
+Module with the generator of deterministic data for the local database,
+the sizes can be set to the volume of the project for the benchmarks.
+"""
+
+from __future__ import annotations
+
+import random
+import uuid
+from datetime import date, timedelta
+
+from app.persistence.db.local.database import LocalDatabase
+from app.persistence.db.local.functions import rebuild_customer_summary
+
+FIRST_NAMES = ["Ana", "Carlos", "Diana", "Felipe", "Laura", "Mateo", "Sofia"]
+LAST_NAMES = ["Gomez", "Rodriguez", "Martinez", "Lopez", "Garcia", "Rojas"]
+PAYMENT_TYPES = ["Efectivo", "Tarjeta", "Transferencia"]
+
+
+def seed(  # noqa: PLR0913
+    db: LocalDatabase,
+    *,
+    branches: int = 5,
+    products: int = 200,
+    customers: int = 1000,
+    purchases_per_customer: int = 3,
+    random_seed: int = 0,
+) -> None:
+    """
+    Fills the database with departments, cities, branches, products with
+    stock in every branch, customers and their purchases.
+
+    The same arguments generate the same rows, the ids are UUIDs of the
+    random generator.
+    """
+    rng = random.Random(random_seed)
+
+    def new_id() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    department = {"id_department": new_id(), "department_name": "Antioquia"}
+    city = {
+        "id_city": new_id(),
+        "city_name": "Medellin",
+        "id_department": department["id_department"],
+    }
+    branch_rows = [
+        {
+            "id_branch": new_id(),
+            "branch_name": f"Sede {number}",
+            "manager_name": rng.choice(FIRST_NAMES),
+            "branch_address": f"Calle {number} # {number + 10}-20",
+            "id_city": city["id_city"],
+        }
+        for number in range(1, branches + 1)
+    ]
+    product_rows = []
+    for number in range(1, products + 1):
+        purchase_price = rng.randrange(10, 500) * 1000
+        product_rows.append(
+            {
+                "id_product": new_id(),
+                "id_supplier": new_id(),
+                "product_name": f"Producto {number}",
+                "product_description": f"Descripcion del producto {number}",
+                "purchase_price": purchase_price,
+                "product_discount": 0.0,
+                "sale_price": purchase_price * 1.3,
+                "profit_margin": 30.0,
+                "product_state": True,
+                "vat": 19.0,
+            }
+        )
+    stock_rows = [
+        {
+            "id_product": product["id_product"],
+            "id_branch": branch["id_branch"],
+            "quantity": rng.randrange(0, 100),
+        }
+        for product in product_rows
+        for branch in branch_rows
+    ]
+    customer_rows = [
+        {
+            "customer_document": str(1000000000 + number),
+            "document_type": "CC",
+            "customer_first_name": rng.choice(FIRST_NAMES),
+            "customer_last_name": rng.choice(LAST_NAMES),
+            "phone_number": f"3{rng.randrange(10**8, 10**9)}",
+            "email": f"cliente{number}@example.com",
+            "home_address": f"Carrera {rng.randrange(1, 100)} # {number}",
+            "customer_state": True,
+            "id_branch": rng.choice(branch_rows)["id_branch"],
+        }
+        for number in range(customers)
+    ]
+
+    purchase_rows, line_rows, payment_rows, service_rows = [], [], [], []
+    start = date(2024, 1, 1)
+    for customer in customer_rows:
+        for _ in range(rng.randrange(0, purchases_per_customer * 2 + 1)):
+            purchase_date = start + timedelta(days=rng.randrange(0, 600))
+            duration = rng.choice([15, 30, 60])
+            purchase = {
+                "id_purchase": new_id(),
+                "customer_document": customer["customer_document"],
+                "id_branch": customer["id_branch"],
+                "purchase_date": purchase_date.isoformat(),
+                "purchase_duration": duration,
+                "next_purchase_date": (
+                    purchase_date + timedelta(days=duration)
+                ).isoformat(),
+            }
+            purchase_rows.append(purchase)
+            for product in rng.sample(product_rows, rng.randrange(1, 4)):
+                quantity = rng.randrange(1, 5)
+                subtotal = product["sale_price"] * quantity
+                line_rows.append(
+                    {
+                        "id_purchase": purchase["id_purchase"],
+                        "id_product": product["id_product"],
+                        "unit_quantity": quantity,
+                        "subtotal_without_vat": subtotal,
+                        "total_price_with_vat": subtotal * 1.19,
+                    }
+                )
+            payment_rows.append(
+                {
+                    "id_purchase": purchase["id_purchase"],
+                    "payment_type": rng.choice(PAYMENT_TYPES),
+                    "payment_status": "Pago Completado",
+                    "remaining_balance": 0.0,
+                }
+            )
+            service_rows.append(
+                {
+                    "id_purchase": purchase["id_purchase"],
+                    "service_date": purchase["purchase_date"],
+                    "next_contact_date": purchase["next_purchase_date"],
+                    "contact_comment": None,
+                    "customer_service_status": rng.choice([True, False]),
+                }
+            )
+
+    db.load(
+        {
+            "department": [department],
+            "city": [city],
+            "branch": branch_rows,
+            "product": product_rows,
+            "branch_stock": stock_rows,
+            "customer": customer_rows,
+            "purchase": purchase_rows,
+            "purchase_product": line_rows,
+            "payment": payment_rows,
+            "customer_service": service_rows,
+        }
+    )
+    with db.transaction():
+        rebuild_customer_summary(db)
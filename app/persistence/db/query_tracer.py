@@ -0,0 +1,246 @@
+"""
+Module with the opt-in tracer of the queries to PostgREST.
+
+The tracer records the table, the select, the filters, the range, the
+duration, the rows and the size of the response of every query executed by
+the sync and async clients, the last `size` traces are kept in memory.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any
+
+import httpx
+
+from app.core.config import settings
+from app.core.request_timing import current_timings
+from app.models.query_trace import QueryTrace, QueryTraceStatus
+from app.persistence.db.connection import (
+    get_admin_supabase,
+    get_async_admin_supabase,
+    get_async_supabase,
+    get_supabase,
+)
+from app.persistence.db.instrumentation import (
+    add_query_observer,
+    instrument_query_builders,
+    remove_query_observer,
+)
+
+# Size of the last response body, set by the hook of the HTTP session
+_response_bytes: ContextVar[int | None] = ContextVar(
+    "response_bytes", default=None
+)
+
+# Kind of the spans of the calls to other services in OTLP
+OTLP_SPAN_KIND_CLIENT = 3
+OTLP_STATUS_OK = 1
+OTLP_STATUS_ERROR = 2
+
+
+async def _measure_async_response(response: httpx.Response) -> None:
+    await response.aread()
+    _response_bytes.set(len(response.content))
+
+
+def _measure_response(response: httpx.Response) -> None:
+    response.read()
+    _response_bytes.set(len(response.content))
+
+
+def trace_session(session: httpx.Client | httpx.AsyncClient) -> None:
+    """Measures the responses of the PostgREST session of a client."""
+    if getattr(session, "_query_tracer", False):
+        return
+    session.event_hooks["response"].append(
+        _measure_async_response
+        if isinstance(session, httpx.AsyncClient)
+        else _measure_response
+    )
+    session._query_tracer = True  # noqa: SLF001
+
+
+def _row_count(response: Any) -> int | None:  # noqa: ANN401
+    if response is None:
+        return 0
+    data = getattr(response, "data", None)
+    if isinstance(data, list):
+        return len(data)
+    return None if data is None else 1
+
+
+class QueryTracer:
+    """
+    Ring buffer with the traces of the last queries.
+
+    It is disabled by default, the clients of the connection module are
+    traced when it is enabled and the PostgREST sessions created later
+    are traced from their first query on.
+    """
+
+    _instance = None
+
+    def __new__(cls) -> QueryTracer:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.enabled = False
+            cls._instance._traces = deque(maxlen=settings.query_trace_size)
+        return cls._instance
+
+    def enable(self) -> None:
+        instrument_query_builders()
+        for get_client in (
+            get_supabase,
+            get_admin_supabase,
+            get_async_supabase,
+            get_async_admin_supabase,
+        ):
+            trace_session(get_client().postgrest.session)
+        add_query_observer(self.record)
+        self.enabled = True
+
+    def disable(self) -> None:
+        remove_query_observer(self.record)
+        self.enabled = False
+
+    def clear(self) -> None:
+        self._traces.clear()
+
+    def status(self) -> QueryTraceStatus:
+        return QueryTraceStatus(
+            enabled=self.enabled,
+            size=self._traces.maxlen,
+            recorded=len(self._traces),
+        )
+
+    def record(
+        self,
+        builder: Any,  # noqa: ANN401
+        duration: float,
+        response: Any,  # noqa: ANN401
+        error: BaseException | None,
+    ) -> None:
+        response_bytes = _response_bytes.get()
+        _response_bytes.set(None)
+        # The sessions created after the enable, the first query has no size
+        trace_session(builder.session)
+
+        select, order, offset, limit, filters = None, None, None, None, []
+        for key, value in builder.params.multi_items():
+            if key == "select":
+                select = value
+            elif key == "order":
+                order = value
+            elif key == "offset":
+                offset = int(value)
+            elif key == "limit":
+                limit = int(value)
+            else:
+                filters.append(f"{key}={value}")
+
+        timings = current_timings()
+        self._traces.append(
+            QueryTrace(
+                trace_id=timings.trace_id if timings else os.urandom(16).hex(),
+                span_id=os.urandom(8).hex(),
+                start_time=time.time_ns() - int(duration * 1e9),
+                duration_ms=round(duration * 1000, 3),
+                method=builder.http_method,
+                table=builder.path.lstrip("/"),
+                select=select,
+                filters=filters,
+                order=order,
+                offset=offset,
+                limit=limit,
+                row_count=None if error else _row_count(response),
+                response_bytes=response_bytes,
+                error=str(error) if error else None,
+            )
+        )
+
+    def traces(
+        self,
+        limit: int | None = None,
+        table: str | None = None,
+        min_duration_ms: float = 0,
+    ) -> list[QueryTrace]:
+        """Returns the last traces, the most recent first."""
+        traces = []
+        for trace in reversed(self._traces.copy()):
+            if (table and trace.table != table) or (
+                trace.duration_ms < min_duration_ms
+            ):
+                continue
+            traces.append(trace)
+            if limit is not None and len(traces) >= limit:
+                break
+        return traces
+
+
+def _attribute(key: str, value: str | int) -> dict:
+    if isinstance(value, int):
+        # The integers are strings in the JSON encoding of OTLP
+        return {"key": key, "value": {"intValue": str(value)}}
+    return {"key": key, "value": {"stringValue": value}}
+
+
+def to_otlp(traces: list[QueryTrace]) -> dict:
+    """
+    Builds the OTLP/JSON export of the traces, it can be posted to the
+    `/v1/traces` endpoint of an OpenTelemetry collector.
+    """
+    spans = []
+    for trace in traces:
+        attributes = [
+            _attribute("db.system", "postgresql"),
+            _attribute("db.operation", trace.method),
+            _attribute("db.sql.table", trace.table),
+        ]
+        optional = {
+            "db.postgrest.select": trace.select,
+            "db.postgrest.filters": "&".join(trace.filters) or None,
+            "db.postgrest.order": trace.order,
+            "db.postgrest.offset": trace.offset,
+            "db.postgrest.limit": trace.limit,
+            "db.response.rows": trace.row_count,
+            "http.response.body.size": trace.response_bytes,
+        }
+        attributes.extend(
+            _attribute(key, value)
+            for key, value in optional.items()
+            if value is not None
+        )
+        spans.append(
+            {
+                "traceId": trace.trace_id,
+                "spanId": trace.span_id,
+                "name": f"{trace.method} {trace.table}",
+                "kind": OTLP_SPAN_KIND_CLIENT,
+                "startTimeUnixNano": str(trace.start_time),
+                "endTimeUnixNano": str(
+                    trace.start_time + int(trace.duration_ms * 1e6)
+                ),
+                "attributes": attributes,
+                "status": {"code": OTLP_STATUS_ERROR, "message": trace.error}
+                if trace.error
+                else {"code": OTLP_STATUS_OK},
+            }
+        )
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        _attribute("service.name", settings.app_name)
+                    ]
+                },
+                "scopeSpans": [
+                    {"scope": {"name": "andhara.query_tracer"}, "spans": spans}
+                ],
+            }
+        ]
+    }
@@ -0,0 +1,151 @@
+"""Module with the repository of the sales analytics."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from datetime import date
+from threading import Lock
+
+from supabase import AsyncClient  # noqa: TC002
+
+from app.core.config import settings
+from app.models.analytics import (
+    SalesAggregate,
+    SalesAnalyticsResponse,
+    SalesGroup,
+    SalesGroupBy,
+)
+from app.persistence.db.connection import get_async_supabase
+
+
+class WindowCache:
+    """
+    Cache of the results per window of dates and filters.
+
+    The purchases are always created with the current date, so a window
+    that ended before today changes rarely and is kept for `closed_ttl`
+    seconds. At most `max_size` results are kept, the least recently used
+    is evicted first.
+    """
+
+    def __init__(self, ttl: int, closed_ttl: int, max_size: int = 256) -> None:
+        self.ttl = ttl
+        self.closed_ttl = closed_ttl
+        self.max_size = max_size
+        self._lock = Lock()
+        self._items: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+
+    def get(self, key: tuple) -> object | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: tuple, value: object, end_date: date | None) -> None:
+        closed = end_date is not None and end_date < date.today()  # noqa: DTZ011
+        expires_at = time.monotonic() + (self.closed_ttl if closed else self.ttl)
+        with self._lock:
+            self._items[key] = (expires_at, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+class AnalyticsRepository:
+    _cache = WindowCache(
+        ttl=settings.analytics_cache_ttl,
+        closed_ttl=settings.analytics_closed_cache_ttl,
+        max_size=settings.analytics_cache_size,
+    )
+
+    def __init__(self) -> None:
+        self.supabase: AsyncClient = get_async_supabase()
+
+    def _build_aggregate(self, row: dict) -> dict:
+        purchase_count = row.get("purchase_count") or 0
+        total = float(row.get("total") or 0)
+        return {
+            "purchase_count": purchase_count,
+            "line_count": row.get("line_count") or 0,
+            "unit_quantity": row.get("unit_quantity") or 0,
+            "net_total": float(row.get("net_total") or 0),
+            "vat_total": float(row.get("vat_total") or 0),
+            "total": total,
+            "average_purchase": total / purchase_count
+            if purchase_count
+            else 0.0,
+        }
+
+    async def get_sales(  # noqa: PLR0913
+        self,
+        group_by: SalesGroupBy,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        id_branch: str | None = None,
+        id_product: str | None = None,
+        skip: int = 0,
+        limit: int = 1000,
+    ) -> SalesAnalyticsResponse:
+        """
+        Aggregates the sales with the database function `sales_analytics`.
+
+        The lines are grouped and summed in the database. The function
+        returns a single value with the totals and a page of the groups,
+        so the result is not cut at the max-rows of PostgREST.
+        """
+        key = (
+            group_by, start_date, end_date, id_branch, id_product, skip, limit
+        )
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = await self.supabase.rpc(
+            "sales_analytics",
+            {
+                "p_group_by": group_by.value,
+                "p_start_date": start_date.isoformat() if start_date else None,
+                "p_end_date": end_date.isoformat() if end_date else None,
+                "p_id_branch": id_branch,
+                "p_id_product": id_product,
+                "p_skip": skip,
+                "p_limit": limit,
+            },
+        ).execute()
+        data = response.data or {}
+
+        sales = SalesAnalyticsResponse(
+            group_by=group_by,
+            start_date=start_date,
+            end_date=end_date,
+            id_branch=id_branch,
+            id_product=id_product,
+            skip=skip,
+            limit=limit,
+            group_count=data.get("group_count") or 0,
+            # A group can have a null key (purchase without branch)
+            groups=[
+                SalesGroup(
+                    key=row["group_key"],
+                    label=row["group_label"],
+                    **self._build_aggregate(row),
+                )
+                for row in data.get("groups") or []
+            ],
+            totals=SalesAggregate(
+                **self._build_aggregate(data.get("totals") or {})
+            ),
+        )
+        self._cache.set(key, sales, end_date)
+        return sales
@@ -1,24 +1,71 @@
 # This file contains the main logic to manage the authentication with supabase
-from gotrue import User
-from supabase import Client  # noqa: TC002
+from gotrue import AuthResponse, User
+from supabase import AsyncClient  # noqa: TC002
 
-from app.persistence.db.connection import get_admin_supabase, get_supabase
+from app.models.authentication import CreateUser
+from app.persistence.db.connection import (
+    get_async_admin_supabase,
+    get_async_auth_supabase,
+    get_async_supabase,
+)
 
 
 class AuthenticationRepository:
     def __init__(self) -> None:
-        self.admin_supabase: Client = get_admin_supabase()
-        self.supabase: Client = get_supabase()
+        self.admin_supabase: AsyncClient = get_async_admin_supabase()
+        self.supabase: AsyncClient = get_async_supabase()
+        self.auth_supabase: AsyncClient = get_async_auth_supabase()
 
-    async def list_all_users(self) -> list[User]:
+    async def create_user(self, user: CreateUser) -> User:
         """
-        Retrieves all users from Supabase authentication.
+        Creates a user in Supabase authentication.
 
-        Note: Requires admin privileges and may need pagination
-        for large user bases.
+        The email is unique in the auth schema, a duplicated email is
+        rejected by Supabase with an `AuthApiError` (`email_exists`), so
+        there is no need to look up the existing users first.
+        """
+        response = await self.admin_supabase.auth.admin.create_user(
+            {
+                "email": user.email,
+                "password": user.password,
+                "email_confirm": True,  # Auto confirm the email
+                "role": user.role,
+            },
+        )
+        return response.user
+
+    async def login(self, email: str, password: str) -> AuthResponse:
+        """Signs in the user with its email and password."""
+        return await self.auth_supabase.auth.sign_in_with_password(
+            {
+                "email": email,
+                "password": password,
+            },
+        )
+
+    async def delete_user(self, user_id: str) -> None:
+        """
+        Deletes the user from Supabase authentication.
+
+        Note: Requires admin privileges.
+        """
+        await self.admin_supabase.auth.admin.delete_user(user_id)
+
+    async def list_all_users(
+        self,
+        page: int = 1,
+        per_page: int = 50,
+    ) -> list[User]:
+        """
+        Retrieves a page of users from Supabase authentication.
+
+        Note: Requires admin privileges.
         """
         try:
-            return self.admin_supabase.auth.admin.list_users()
+            return await self.admin_supabase.auth.admin.list_users(
+                page=page,
+                per_page=per_page,
+            )
         except Exception as e:
             msg = "Failed to list users"
             raise Exception(msg, e) from e
@@ -26,7 +73,7 @@ class AuthenticationRepository:
     async def logout_user(self, token: str) -> bool:
         """Logs out the currently authenticated user invalidating session."""
         try:
-            self.supabase.auth.admin.sign_out(token)
+            await self.supabase.auth.admin.sign_out(token)
             return True
         except Exception as e:
             msg = "Failed to log out user"
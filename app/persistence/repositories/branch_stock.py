@@ -8,13 +8,13 @@ from app.models.branch_stock import (
     CreateBranchStock,
 )
 from app.persistence.db.connection import (
-    get_supabase,
+    get_async_supabase,
 )
 
 
 class BranchStockRepository:
     def __init__(self) -> None:
-        self.supabase = get_supabase()
+        self.supabase = get_async_supabase()
         self.table = "branch_stock"
 
     async def create(
@@ -22,15 +22,24 @@ class BranchStockRepository:
         stock: CreateBranchStock,
     ) -> BranchStock:
         data = stock.model_dump()
-        response = self.supabase.table(self.table).insert(data).execute()
+        response = await self.supabase.table(self.table).insert(data).execute()
         return BranchStock(**response.data[0])
 
+    async def create_many(
+        self,
+        stocks: list[CreateBranchStock],
+    ) -> list[BranchStock]:
+        # Bulk insert, all the rows are created in a single statement
+        data = [stock.model_dump() for stock in stocks]
+        response = await self.supabase.table(self.table).insert(data).execute()
+        return [BranchStock(**item) for item in response.data]
+
     async def list_all_stock(
         self,
         skip: int = 0,
         limit: int = 100,
     ) -> list[BranchStock]:
-        response = (
+        response = await (
             self.supabase.table(self.table)
             .select("*")
             .range(skip, skip + limit)
@@ -44,17 +53,33 @@ class BranchStockRepository:
         self,
         id_prodcut,
     ) -> list[BranchStock]:
-        response = (
+        response = await (
             self.supabase.table(self.table)
             .select("*")
             .eq("id_product", id_prodcut)
-            .range(0, 5)
             .execute()
         )
         if response.data:
             return response.data
         return None
 
+    async def upsert_many(
+        self,
+        id_product: str,
+        stocks: list[BranchStockUpdate],
+    ) -> list[BranchStock]:
+        # Insert or update the stock of every branch in a single request
+        data = [
+            {"id_product": id_product, **stock.model_dump()}
+            for stock in stocks
+        ]
+        response = await (
+            self.supabase.table(self.table)
+            .upsert(data, on_conflict="id_product,id_branch")
+            .execute()
+        )
+        return [BranchStock(**item) for item in response.data]
+
     async def update(
         self,
         id_product: str,
@@ -65,7 +90,7 @@ class BranchStockRepository:
         if not data:
             return None
 
-        response = (
+        response = await (
             self.supabase.table(self.table)
             .update(
                 {"quantity": data["quantity"]},
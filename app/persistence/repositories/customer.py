@@ -1,27 +1,48 @@
 from __future__ import annotations
 
-from datetime import datetime
+import asyncio
+from collections.abc import AsyncIterator  # noqa: TC003
 
-from supabase import Client  # noqa: TC002
+from supabase import AsyncClient  # noqa: TC002
 
 from app.models.customer import (
+    BranchResponse,
     ClientUpdate,
     CreateClient,
     Customer,
     PurchaseByCustomerDocumentResponse,
 )
-from app.persistence.db.connection import get_supabase
+from app.persistence.db.connection import get_async_supabase
+from app.persistence.repositories.customer_search import (
+    CustomerSearchIndex,
+)
+from app.persistence.repositories.customer_summary import (
+    CustomerSummaryRepository,
+)
+from app.persistence.repositories.reference_data import (
+    ReferenceDataRepository,
+)
 
 # Import supbase quries from utils module
-from app.utils.customer import customer_queries
+from app.utils.customer import customer_queries, decode_customer_cursor
+from app.utils.text import normalize_text
 
 
 class CustomerRepository:
     def __init__(self) -> None:
-        self.supabase: Client = get_supabase()
+        self.supabase: AsyncClient = get_async_supabase()
+        self.reference_data = ReferenceDataRepository()
+        self.search_index = CustomerSearchIndex()
+        self.summary = CustomerSummaryRepository()
+
+    async def _validate_branch(self, id_branch: str) -> None:
+        if not await self.reference_data.branch_exists(id_branch):
+            msg = f"Branch with id '{id_branch}' not found"
+            raise ValueError(msg)
 
     async def create_customer(self, customer: CreateClient) -> Customer:
-        response = (
+        await self._validate_branch(customer.id_branch)
+        response = await (
             self.supabase.table("customer").insert(customer.dict()).execute()
         )
         if not response.data:
@@ -29,29 +50,48 @@ class CustomerRepository:
             raise ValueError(msg)
         # Get the customer document from the supabase response
         customer_document = response.data[0].get("customer_document")
-        return await self.get_customer_by_document(customer_document)
+        created_customer = await self.get_customer_by_document(
+            customer_document
+        )
+        self.search_index.upsert(created_customer)
+        return created_customer
 
     async def get_purchses_by_customer_document(
-        self, customer_document: str
+        self, customer_document: str, limit: int | None = None
     ) -> PurchaseByCustomerDocumentResponse:
-        # Validate if the customer exists
-        customer_response = (
+        """
+        Get the purchases of the customer, most recent first.
+
+        When `limit` is given only the last `limit` purchases are loaded.
+        The historical total is read from the summary of the customer,
+        with the existence check, concurrently with the purchases. A missing
+        summary is rebuilt, unless every purchase of the customer is loaded.
+        """
+        customer_query = (
             self.supabase.table("customer")
-            .select("customer_document")
+            .select("customer_document, customer_summary(lifetime_total)")
             .eq("customer_document", customer_document)
             .execute()
         )
-        if not customer_response.data:
-            msg = "Customer not found"
-            raise ValueError(msg)
-
         purchase_query = (
             self.supabase.table("purchase")
             .select(customer_queries.get("query_purchase_product"))
             .eq("customer_document", customer_document)
             .order("purchase_date", desc=True)
         )
-        purchase_response = purchase_query.execute()
+        if limit is not None:
+            purchase_query = purchase_query.limit(limit)
+        customer_response, purchase_response = await asyncio.gather(
+            customer_query, purchase_query.execute()
+        )
+
+        # Validate if the customer exists
+        if not customer_response.data:
+            msg = "Customer not found"
+            raise ValueError(msg)
+        summary = customer_response.data[0].get("customer_summary")
+        historical_total = summary["lifetime_total"] if summary else None
+
         purchases = purchase_response.data if purchase_response.data else []
 
         historical_purchases = 0.0
@@ -84,17 +124,81 @@ class CustomerRepository:
                 }
             )
 
+        if historical_total is None and (
+            limit is not None and len(purchases) >= limit
+        ):
+            # The summary is missing and the page may not hold every
+            # purchase, the total is read from the rebuilt summary
+            historical_total = await self._rebuild_lifetime_total(
+                customer_document
+            )
         response_data = {
-            "historical_purchases": historical_purchases,
+            "historical_purchases": historical_purchases
+            if historical_total is None
+            else historical_total,
             "purchases": processed_purchases,
         }
         return PurchaseByCustomerDocumentResponse(**response_data)
 
+    async def _rebuild_lifetime_total(self, customer_document: str) -> float:
+        """Rebuilds the missing summary of the customer, returns its total."""
+        await self.summary.rebuild(customer_document)
+        response = await (
+            self.supabase.table("customer_summary")
+            .select("lifetime_total")
+            .eq("customer_document", customer_document)
+            .execute()
+        )
+        if not response.data:
+            return 0.0
+        return response.data[0]["lifetime_total"]
+
+    def _build_customer(
+        self, customer_data: dict, branch: BranchResponse | None
+    ) -> Customer:
+        """Build the Customer model from a row with its purchases summary."""
+        summary = customer_data.get("customer_summary") or {}
+        response_data = {
+            "customer_document": customer_data["customer_document"],
+            "document_type": customer_data["document_type"],
+            "customer_first_name": customer_data["customer_first_name"],
+            "customer_last_name": customer_data["customer_last_name"],
+            "phone_number": customer_data["phone_number"],
+            "email": customer_data["email"],
+            "home_address": customer_data["home_address"],
+            "customer_state": customer_data["customer_state"],
+            "branch": branch,
+            # The summary keeps the last purchase with its products
+            "last_purchase": summary.get("last_purchase"),
+            "last_purchase_date": customer_data.get("last_purchase_date"),
+            "historical_purchases": summary.get("lifetime_total") or 0.0,
+            "purchase_count": summary.get("purchase_count") or 0,
+        }
+        return Customer(**response_data)
+
+    async def _build_customers(self, rows: list[dict]) -> list[Customer]:
+        """Build the customers of the rows with their cached branches."""
+        branches = await self.reference_data.get_branches(
+            customer_data.get("id_branch") for customer_data in rows
+        )
+        return [
+            self._build_customer(
+                customer_data,
+                branches.get(str(customer_data.get("id_branch"))),
+            )
+            for customer_data in rows
+        ]
+
+    def _select_customer_summary(self):  # noqa: ANN202
+        """Customer query with its purchases summary embedded per row."""
+        return self.supabase.table("customer").select(
+            customer_queries.get("query_customer_summary")
+        )
+
     async def get_customer_by_document(self, document: str) -> Customer:
-        # Look for the customer data
-        customer_response = (
-            self.supabase.table("customer")
-            .select(customer_queries.get("query_customer_branch"))
+        # Look for the customer data and its last purchase
+        customer_response = await (
+            self._select_customer_summary()
             .eq("customer_document", document)
             .execute()
         )
@@ -103,74 +207,16 @@ class CustomerRepository:
             msg = "Customer not found"
             raise ValueError(msg)
 
-        customer_response = customer_response.data[0]
-        # Make the purchase query
-        purchase_query = (
-            self.supabase.table("purchase")
-            .select(customer_queries.get("query_purchase_product"))
-            .eq("customer_document", document)
-            .order("purchase_date", desc=True)
-            .limit(1)
+        customer_data = customer_response.data[0]
+        branch = await self.reference_data.get_branch(
+            customer_data.get("id_branch")
         )
-        purchase_response = purchase_query.execute()
-        branch_data = customer_response.get("branch", {})
-        city_data = branch_data.get("city", {}) if branch_data else {}
-        department_data = city_data.get("department", {}) if city_data else {}
-        last_purchase = (
-            purchase_response.data[0] if purchase_response.data else None
-        )
-        # Get the last purchase and its total
-        total_purchase = 0
-        products = []
-        if last_purchase and last_purchase.get("purchase_product"):
-            for pp in last_purchase["purchase_product"]:
-                total_purchase += pp["total_price_with_vat"]
-                products.append(
-                    {
-                        "id_product": pp["id_product"],
-                        "product_name": pp["product"]["product_name"],
-                        "unit_quantity": pp["unit_quantity"],
-                        "subtotal_without_vat": pp["subtotal_without_vat"],
-                        "total_price_with_vat": pp["total_price_with_vat"],
-                    },
-                )
-
-        response_data = {
-            "customer_document": customer_response["customer_document"],
-            "document_type": customer_response["document_type"],
-            "customer_first_name": customer_response["customer_first_name"],
-            "customer_last_name": customer_response["customer_last_name"],
-            "phone_number": customer_response["phone_number"],
-            "email": customer_response["email"],
-            "home_address": customer_response["home_address"],
-            "customer_state": customer_response["customer_state"],
-            "branch": {
-                "id_branch": branch_data.get("id_branch"),
-                "branch_name": branch_data.get("branch_name"),
-                "manager_name": branch_data.get("manager_name"),
-                "branch_address": branch_data.get("branch_address"),
-                "city_name": city_data.get("city_name"),
-                "department_name": department_data.get("department_name"),
-            },
-            "last_purchase": {
-                "id_purchase": last_purchase["id_purchase"],
-                "purchase_date": last_purchase["purchase_date"],
-                "purchase_duration": last_purchase["purchase_duration"],
-                "next_purchase_date": last_purchase.get(
-                    "next_purchase_date",
-                ),
-                "total_purchase": total_purchase,
-                "products": products,
-            }
-            if last_purchase
-            else None,
-        }
-        return Customer(**response_data)
+        return self._build_customer(customer_data, branch)
 
     async def toggle_customer(
         self, customer_document: str, active: bool
     ) -> Customer:
-        toggle_response = (
+        toggle_response = await (
             self.supabase.table("customer")
             .update({"customer_state": active})
             .eq("customer_document", customer_document)
@@ -179,150 +225,111 @@ class CustomerRepository:
         if not toggle_response.data:
             msg = "Error changing the customer status"
             raise ValueError(msg)
-        return await self.get_customer_by_document(customer_document)
+        customer = await self.get_customer_by_document(customer_document)
+        self.search_index.upsert(customer)
+        return customer
 
     async def list_all_customers(
         self,
         skip: int = 0,
         limit: int = 100,
         search: str | None = None,
+        after: str | None = None,
     ) -> list[Customer]:
-        # Consulta principal para clientes y sedes
-        query = self.supabase.table("customer").select(
-            customer_queries.get("query_customer_branch")
+        # Consulta principal para clientes, sedes y su último pedido
+        # ordenados por la fecha del último pedido en la base de datos
+        query = (
+            self._select_customer_summary()
+            .order("last_purchase_date", desc=True, nullsfirst=False)
+            .order("customer_document")
         )
 
-        # Create a match case for filter using the query params
         if search and search.strip():
-            search_item = search.strip()
-            # Agregar comodines para coincidencias parciales
-            search_pattern = f"%{search_item}%"
-
-            # Lista de condiciones para la consulta
-            conditions = []
+            # Ranked search in memory, the pages of a search use `skip`
+            if not after:
+                documents = self.search_index.search(search, skip + limit)
+                if documents is not None:
+                    return await self._get_customers_by_documents(
+                        documents[skip : skip + limit]
+                    )
+            # The index is cold, every word is an ilike of the trigram
+            # indexed search column, both without accents
+            for word in normalize_text(search).split():
+                query = query.ilike("search_text", f"%{word}%")
 
-            # Si el término es numérico, buscar en columnas numéricas
-            if search_item.isnumeric():
-                conditions.extend(
-                    [
-                        f"customer_document.ilike.{search_pattern}",
-                        f"phone_number.ilike.{search_pattern}",
-                    ]
+        # Keyset pagination, continue after the last customer of the page
+        if after:
+            last_purchase_date, customer_document = decode_customer_cursor(
+                after
+            )
+            if last_purchase_date:
+                query = query.or_(
+                    f"last_purchase_date.lt.{last_purchase_date},"
+                    f"and(last_purchase_date.eq.{last_purchase_date},"
+                    f'customer_document.gt."{customer_document}"),'
+                    "last_purchase_date.is.null"
                 )
-            elif " " in search_item:
-                search_words = search_item.split()
-                for word in search_words:
-                    word_pattern = f"%{word}%"
-                    conditions.extend(
-                        [
-                            f"customer_first_name.ilike.{word_pattern}",
-                            f"customer_last_name.ilike.{word_pattern}",
-                        ]
-                    )
             else:
-                conditions.extend(
-                    [
-                        f"customer_document.ilike.{search_pattern}",
-                        f"customer_first_name.ilike.{search_pattern}",
-                        f"customer_last_name.ilike.{search_pattern}",
-                        f"email.ilike.{search_pattern}",
-                        f"phone_number.ilike.{search_pattern}",
-                        f"home_address.ilike.{search_pattern}",
-                    ]
+                query = query.is_("last_purchase_date", "null").gt(
+                    "customer_document", customer_document
                 )
+            query = query.limit(limit)
+        else:
+            query = query.range(skip, skip + limit - 1)
 
-            # Unir todas las condiciones con OR
-            or_clause = ",".join(conditions)
-            query = query.or_(or_clause)
+        customers_response = await query.execute()
+        return await self._build_customers(customers_response.data)
 
-        query = query.range(skip, skip + limit - 1)
-        customers_response = query.execute()
-
-        customers = []
-        for customer_data in customers_response.data:
-            # Consulta para el último pedido
-            purchase_query = (
-                self.supabase.table("purchase")
-                .select(customer_queries.get("query_purchase_product"))
-                .eq(
-                    "customer_document",
-                    customer_data["customer_document"],
-                )
-                .order("purchase_date", desc=True)
-                .limit(1)
-            )
-            purchase_response = purchase_query.execute()
-
-            # Procesar los datos
-            branch_data = customer_data.get("branch", {})
-            city_data = branch_data.get("city", {}) if branch_data else {}
-            department_data = (
-                city_data.get("department", {}) if city_data else {}
-            )
-            last_purchase = (
-                purchase_response.data[0] if purchase_response.data else None
+    async def _get_customers_by_documents(
+        self, documents: list[str]
+    ) -> list[Customer]:
+        """Get the customers in the same order of the documents."""
+        if not documents:
+            return []
+        customers_response = await (
+            self._select_customer_summary()
+            .in_("customer_document", documents)
+            .execute()
+        )
+        customers = {
+            customer.customer_document: customer
+            for customer in await self._build_customers(
+                customers_response.data
             )
+        }
+        return [
+            customers[document]
+            for document in documents
+            if document in customers
+        ]
 
-            # Calcular el total de la compra
-            total_purchase = 0
-            products = []
-            if last_purchase and last_purchase.get("purchase_product"):
-                for pp in last_purchase["purchase_product"]:
-                    total_purchase += pp["total_price_with_vat"]
-                    products.append(
-                        {
-                            "id_product": pp["id_product"],
-                            "product_name": pp["product"]["product_name"],
-                            "unit_quantity": pp["unit_quantity"],
-                            "subtotal_without_vat": pp["subtotal_without_vat"],
-                            "total_price_with_vat": pp["total_price_with_vat"],
-                        },
-                    )
-
-            # Estructurar la respuesta
-            response_data = {
-                "customer_document": customer_data["customer_document"],
-                "document_type": customer_data["document_type"],
-                "customer_first_name": customer_data["customer_first_name"],
-                "customer_last_name": customer_data["customer_last_name"],
-                "phone_number": customer_data["phone_number"],
-                "email": customer_data["email"],
-                "home_address": customer_data["home_address"],
-                "customer_state": customer_data["customer_state"],
-                "branch": {
-                    "id_branch": branch_data.get("id_branch"),
-                    "branch_name": branch_data.get("branch_name"),
-                    "manager_name": branch_data.get("manager_name"),
-                    "branch_address": branch_data.get("branch_address"),
-                    "city_name": city_data.get("city_name"),
-                    "department_name": department_data.get("department_name"),
-                },
-                "last_purchase": {
-                    "id_purchase": last_purchase["id_purchase"],
-                    "purchase_date": last_purchase["purchase_date"],
-                    "purchase_duration": last_purchase["purchase_duration"],
-                    "next_purchase_date": last_purchase.get(
-                        "next_purchase_date",
-                    ),
-                    "total_purchase": total_purchase,
-                    "products": products,
-                }
-                if last_purchase
-                else None,
-            }
-
-            customers.append(Customer(**response_data))
+    async def iter_customers(
+        self, chunk_size: int = 500
+    ) -> AsyncIterator[list[Customer]]:
+        """
+        Walks every customer ordered by document, one chunk per request.
 
-        # Sort the customers by last purchase date
-        return sorted(
-            customers,
-            key=lambda x: (
-                x.last_purchase.purchase_date
-                if x.last_purchase and x.last_purchase.purchase_date
-                else datetime.min.date()  # noqa: DTZ901
-            ),
-            reverse=True,
-        )
+        Each chunk carries the last purchase of its customers in the same
+        request, the next chunk continues after the last document, so the
+        cost does not grow with the position.
+        """
+        after = None
+        while True:
+            query = (
+                self._select_customer_summary()
+                .order("customer_document")
+                .limit(chunk_size)
+            )
+            if after is not None:
+                query = query.gt("customer_document", after)
+            customers_response = await query.execute()
+            rows = customers_response.data or []
+            if not rows:
+                return
+            yield await self._build_customers(rows)
+            if len(rows) < chunk_size:
+                return
+            after = rows[-1]["customer_document"]
 
     async def update_customer(
         self, customer_document: str, customer: ClientUpdate
@@ -334,7 +341,9 @@ class CustomerRepository:
             return await self.get_customer_by_document(
                 document=customer_document
             )
-        response = (
+        if update_data.get("id_branch"):
+            await self._validate_branch(update_data["id_branch"])
+        response = await (
             self.supabase.table("customer")
             .update(update_data)
             .eq("customer_document", customer_document)
@@ -343,4 +352,8 @@ class CustomerRepository:
         if not response.data:
             return None
 
-        return await self.get_customer_by_document(document=customer_document)
+        customer = await self.get_customer_by_document(
+            document=customer_document
+        )
+        self.search_index.upsert(customer)
+        return customer
@@ -0,0 +1,345 @@
+"""Module with the in-memory search index of the customers."""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import time
+from array import array
+from collections import defaultdict
+from collections.abc import Callable  # noqa: TC003
+from datetime import date, datetime, timedelta
+
+from supabase import AsyncClient  # noqa: TC002
+
+from app.core.config import settings
+from app.core.request_timing import create_background_task
+from app.models.customer import Customer
+from app.persistence.db.connection import get_async_supabase
+from app.utils.text import normalize_text, trigrams
+
+# Searchable fields and their weight in the ranking
+SEARCH_FIELDS = {
+    "customer_document": 5,
+    "customer_first_name": 4,
+    "customer_last_name": 4,
+    "phone_number": 3,
+    "email": 2,
+    "home_address": 1,
+}
+
+# Rows loaded per request when the index is built
+LOAD_CHUNK_SIZE = 1000
+
+# Candidates checked one by one instead of intersecting more postings
+MIN_CANDIDATES = 64
+
+# A refresh reads again the customers changed this long before the last
+# change it saw, a write may commit after a later one
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+logger = logging.getLogger(__name__)
+
+
+def date_key(last_purchase_date: date | str | None) -> int:
+    """Sort key of the last purchase, the most recent purchase first."""
+    # Negative date as number, the customers without purchases at the end
+    if not last_purchase_date:
+        return 0
+    return -int(str(last_purchase_date)[:10].replace("-", ""))
+
+
+def match_level(field: str, token: str) -> int:
+    """How well the token matches the field, 0 when it does not match."""
+    if token not in field:
+        return 0
+    if field == token:
+        return 4
+    if field.startswith(token):
+        return 3
+    if f" {token}" in field:
+        return 2
+    # The short tokens only match the start of the words
+    return 1 if len(token) >= 3 else 0  # noqa: PLR2004
+
+
+class TrigramIndex:
+    """
+    Trigram index of the customers, the tokens shorter than a trigram are
+    looked up in an index of the word prefixes.
+
+    The postings are arrays of ids, a changed customer gets a new id and
+    the old one is left empty until the next build.
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        self._entries: list[tuple[str, tuple[str, ...], int] | None] = []
+        self._trigrams: defaultdict[str, array] = defaultdict(
+            lambda: array("I")
+        )
+        self._prefixes: defaultdict[str, array] = defaultdict(
+            lambda: array("I")
+        )
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def upsert(self, row: dict) -> None:
+        document = str(row["customer_document"])
+        self.remove(document)
+        fields = tuple(normalize_text(row.get(name)) for name in SEARCH_FIELDS)
+        entry_id = len(self._entries)
+        self._entries.append(
+            (document, fields, date_key(row.get("last_purchase_date")))
+        )
+        self._ids[document] = entry_id
+
+        grams, prefixes = set(), set()
+        for field in fields:
+            grams |= trigrams(field)
+            for word in field.split():
+                prefixes.update((word[:1], word[:2]))
+        for gram in grams:
+            self._trigrams[gram].append(entry_id)
+        for prefix in prefixes:
+            self._prefixes[prefix].append(entry_id)
+
+    def remove(self, document: str) -> None:
+        entry_id = self._ids.pop(document, None)
+        if entry_id is not None:
+            self._entries[entry_id] = None
+
+    def set_last_purchase_date(
+        self, document: str, last_purchase_date: date | str
+    ) -> None:
+        """Moves the customer after a purchase, the words do not change."""
+        entry_id = self._ids.get(document)
+        if entry_id is None:
+            return
+        _, fields, current = self._entries[entry_id]
+        # The customer keeps the date of its most recent purchase
+        self._entries[entry_id] = (
+            document,
+            fields,
+            min(current, date_key(last_purchase_date)),
+        )
+
+    def _postings(self, token: str) -> list[array]:
+        """The postings every customer matching the token is in."""
+        if len(token) < 3:  # noqa: PLR2004
+            return [self._prefixes.get(token[:2], array("I"))]
+        return [
+            self._trigrams.get(gram, array("I")) for gram in trigrams(token)
+        ]
+
+    def search(self, term: str, limit: int) -> list[str]:
+        """
+        Returns the documents of the best `limit` customers that match every
+        word of the term.
+        """
+        tokens = normalize_text(term).split()
+        if not tokens:
+            return []
+
+        # Intersect the postings from the smallest, the candidates contain
+        # every trigram and prefix of the term. A few candidates are checked
+        # faster than the intersection with the biggest postings
+        postings = sorted(
+            (posting for token in tokens for posting in self._postings(token)),
+            key=len,
+        )
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if len(candidates) <= MIN_CANDIDATES:
+                break
+            candidates.intersection_update(posting)
+
+        weights = tuple(SEARCH_FIELDS.values())
+        matches = []
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            if entry is None:
+                continue
+            document, fields, date_key = entry
+            score = 0
+            for token in tokens:
+                token_score = 0
+                for field, weight in zip(fields, weights, strict=True):
+                    level = match_level(field, token)
+                    if level and level * weight > token_score:
+                        token_score = level * weight
+                if not token_score:
+                    break
+                score += token_score
+            else:
+                matches.append((-score, date_key, document))
+
+        # Best score first, then the same order of the customer list
+        return [document for _, _, document in heapq.nsmallest(limit, matches)]
+
+
+class CustomerSearchIndex:
+    """
+    Search index of the customers kept in memory.
+
+    The index is built in background on the first search, while it is
+    cold the search falls back to the database. The writes of this process
+    update it. Every `ttl` seconds it reads the customers changed since
+    the last refresh to include the writes of the other workers, and every
+    `rebuild_ttl` seconds it is built again to drop the empty entries.
+    """
+
+    _instance = None
+
+    def __new__(cls) -> CustomerSearchIndex:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.supabase: AsyncClient = get_async_supabase()
+            cls._instance.ttl = settings.customer_search_ttl
+            cls._instance.rebuild_ttl = settings.customer_search_rebuild_ttl
+            cls._instance._index = None
+            cls._instance._built_at = None
+            cls._instance._refreshed_at = None
+            # Last `updated_at` read from the database
+            cls._instance._changed_at = None
+            cls._instance._build_task = None
+            cls._instance._pending = []
+        return cls._instance
+
+    @property
+    def is_warm(self) -> bool:
+        return self._index is not None
+
+    def _is_stale(self, since: float | None, ttl: int) -> bool:
+        return since is None or time.monotonic() - since >= ttl
+
+    def warm_up(self) -> None:
+        """Starts the build or the refresh of the index in background."""
+        if self._build_task is not None and not self._build_task.done():
+            return
+        if self._index is None or self._is_stale(
+            self._built_at, self.rebuild_ttl
+        ):
+            self._build_task = create_background_task(self._build())
+        elif self._is_stale(self._refreshed_at, self.ttl):
+            self._build_task = create_background_task(self._refresh())
+
+    async def _load(
+        self, index: TrigramIndex, changed_since: str | None = None
+    ) -> str | None:
+        """
+        Adds the customers changed since the date to the index, every
+        customer when there is no date.
+
+        Returns:
+            str | None: The last `updated_at` of the customers read.
+
+        """
+        changed_at = self._changed_at
+        after = None
+        while True:
+            query = (
+                self.supabase.table("customer")
+                .select(
+                    ", ".join(
+                        [*SEARCH_FIELDS, "last_purchase_date", "updated_at"]
+                    )
+                )
+                .order("customer_document")
+                .limit(LOAD_CHUNK_SIZE)
+            )
+            if changed_since is not None:
+                query = query.gte("updated_at", changed_since)
+            if after is not None:
+                query = query.gt("customer_document", after)
+            response = await query.execute()
+            rows = response.data or []
+            for row in rows:
+                index.upsert(row)
+                updated_at = row.get("updated_at")
+                if updated_at and (
+                    changed_at is None
+                    or datetime.fromisoformat(updated_at)
+                    > datetime.fromisoformat(changed_at)
+                ):
+                    changed_at = updated_at
+            if len(rows) < LOAD_CHUNK_SIZE:
+                return changed_at
+            after = rows[-1]["customer_document"]
+
+    def _apply_pending(self, index: TrigramIndex) -> None:
+        """Applies the writes done while the index was loading."""
+        for change in self._pending:
+            change(index)
+        self._pending = []
+
+    async def _build(self) -> None:
+        index = TrigramIndex()
+        self._pending = []
+        try:
+            changed_at = await self._load(index)
+        except Exception:
+            logger.exception("Error building the customer search index")
+            return
+
+        self._apply_pending(index)
+        self._index = index
+        self._changed_at = changed_at
+        self._built_at = self._refreshed_at = time.monotonic()
+
+    async def _refresh(self) -> None:
+        self._pending = []
+        changed_since = (
+            (
+                datetime.fromisoformat(self._changed_at) - REFRESH_OVERLAP
+            ).isoformat()
+            if self._changed_at
+            else None
+        )
+        try:
+            changed_at = await self._load(self._index, changed_since)
+        except Exception:
+            logger.exception("Error refreshing the customer search index")
+            return
+
+        # A row read before a write of this process must not replace it
+        self._apply_pending(self._index)
+        self._changed_at = changed_at
+        self._refreshed_at = time.monotonic()
+
+    def _apply(self, change: Callable[[TrigramIndex], None]) -> None:
+        if self._build_task is not None and not self._build_task.done():
+            self._pending.append(change)
+        if self._index is not None:
+            change(self._index)
+
+    def upsert(self, customer: Customer) -> None:
+        """Adds or replaces the customer in the index."""
+        row = {
+            **customer.model_dump(include=set(SEARCH_FIELDS)),
+            "last_purchase_date": customer.last_purchase_date.isoformat()
+            if customer.last_purchase_date
+            else None,
+        }
+        self._apply(lambda index: index.upsert(row))
+
+    def set_last_purchase_date(
+        self, document: str, last_purchase_date: date
+    ) -> None:
+        """Moves the customer of a new purchase in the ranking."""
+        self._apply(
+            lambda index: index.set_last_purchase_date(
+                document, last_purchase_date
+            )
+        )
+
+    def search(self, term: str, limit: int) -> list[str] | None:
+        """
+        Returns the best `limit` documents that match the term, or None when
+        the index is cold and the database must be used.
+        """
+        self.warm_up()
+        if self._index is None:
+            return None
+        return self._index.search(term, limit)
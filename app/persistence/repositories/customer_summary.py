@@ -0,0 +1,31 @@
+"""Module with the repository of the purchases summary of the customers."""
+
+from __future__ import annotations
+
+from supabase import AsyncClient  # noqa: TC002
+
+from app.persistence.db.connection import get_async_admin_supabase
+
+
+class CustomerSummaryRepository:
+    def __init__(self) -> None:
+        self.supabase: AsyncClient = get_async_admin_supabase()
+
+    async def rebuild(self, customer_document: str | None = None) -> int:
+        """
+        Recomputes the summary from the purchases with the database
+        function `rebuild_customer_summary`.
+
+        Args:
+            customer_document (str, optional): Only the summary of the
+                customer, every summary is rebuilt when it is not given.
+
+        Returns:
+            int: The number of summaries rebuilt.
+
+        """
+        response = await self.supabase.rpc(
+            "rebuild_customer_summary",
+            {"p_customer_document": customer_document},
+        ).execute()
+        return response.data or 0
@@ -1,6 +1,5 @@
 """Module to manage the email sender."""
 
-import smtplib
 from datetime import datetime, timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -10,6 +9,7 @@ from pytz import timezone
 from app.core.config import settings
 from app.models.email_sender import Normalized
 from app.persistence.db.connection import get_supabase
+from app.persistence.smtp.connection import get_smtp
 from app.utils.email_sender import customer_service_query, get_email_body
 
 
@@ -17,11 +17,9 @@ class EmailSender:
     def __init__(self) -> None:
         # Initialize Supabase
         self.supabase = get_supabase()
-        # Email configuration
-        self.email_host = "smtp.gmail.com"
-        self.email_port = 587
+        # Email configuration, the SMTP connections are reused
+        self.smtp = get_smtp()
         self.email_username = settings.email_username
-        self.email_password = settings.email_password
         # Date configuration
         self.timezone = timezone("America/Bogota")
 
@@ -75,21 +73,23 @@ class EmailSender:
         # Pass the customer data to the function
         return get_email_body(customers)
 
-    def send_email(self, email_to: str, subject: str) -> tuple[bool, str]:
-        try:
-            msg = MIMEMultipart("alternative")
-            msg["Subject"] = subject
-            msg["From"] = self.email_username
-            msg["To"] = email_to
+    def build_message(
+        self, email_to: str, subject: str, body: str
+    ) -> MIMEMultipart:
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = subject
+        msg["From"] = self.email_username
+        msg["To"] = email_to
 
-            # Attach the HTML content to the email
-            part = MIMEText(self.get_email_body(), "html")
-            msg.attach(part)
+        # Attach the HTML content to the email
+        part = MIMEText(body, "html")
+        msg.attach(part)
+        return msg
 
-            with smtplib.SMTP(self.email_host, self.email_port) as server:
-                server.starttls()
-                server.login(self.email_username, self.email_password)
-                server.sendmail(self.email_username, email_to, msg.as_string())
+    def send_email(self, email_to: str, subject: str) -> tuple[bool, str]:
+        try:
+            msg = self.build_message(email_to, subject, self.get_email_body())
+            self.smtp.send(msg)
             return True, "Email sent successfully"
         except Exception as e:
             error_msg = f"Error sending email: {e!s}"
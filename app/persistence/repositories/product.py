@@ -9,10 +9,7 @@ from app.models.product import (
     ProductUpdate,
 )
 from app.persistence.db.connection import (
-    get_supabase,
-)
-from app.persistence.repositories.branch_stock import (
-    BranchStockRepository,
+    get_async_supabase,
 )
 
 product_field_map = {
@@ -30,8 +27,7 @@ product_field_map = {
 
 class ProductRepository:
     def __init__(self) -> None:
-        self.supabase = get_supabase()
-        self.stock_repository = BranchStockRepository()
+        self.supabase = get_async_supabase()
         self.table = "product"
 
     async def create(
@@ -43,14 +39,14 @@ class ProductRepository:
         # Add the profit margin to the data and delete the stock entry
         data["profit_margin"] = profit_margin
         del data["stock"]
-        response = self.supabase.table(self.table).insert(data).execute()
+        response = await self.supabase.table(self.table).insert(data).execute()
         return ProductBase(**response.data[0])
 
     async def get_by_id(
         self,
         id_product: str,
     ) -> Optional[Product]:
-        response = (
+        response = await (
             self.supabase.table(self.table)
             .select("*, branch_stock(*)")
             .eq(
@@ -76,7 +72,7 @@ class ProductRepository:
         skip: int = 0,
         limit: int = 100,
     ) -> list[Product]:
-        response = (
+        response = await (
             self.supabase.table(self.table)
             .select("*, branch_stock(*)")
             .range(skip, skip + limit)
@@ -100,7 +96,7 @@ class ProductRepository:
         self,
         id_product: int,
         product: ProductUpdate,
-    ) -> Optional[Product]:
+    ) -> Optional[ProductBase]:
         data = product.model_dump(
             exclude_unset=True,
             exclude_defaults=True,
@@ -108,10 +104,7 @@ class ProductRepository:
         # Remove the stock entry from the data to avoid errors in the update
         data.pop("stock", None)
 
-        if not data:
-            return None
-
-        response = (
+        response = await (
             self.supabase.table(self.table)
             .update(data)
             .eq(
@@ -120,24 +113,17 @@ class ProductRepository:
             )
             .execute()
         )
-        if response.data:
-            # get and add the stock data to the product updated
-            stock = await self.stock_repository.get_stock_by_product_id(
-                id_product,
-            )
-            return Product(
-                **{
-                    **response.data[0],
-                    "stock": stock,
-                },
-            )
-        return None
+        if not response.data:
+            return None
+        # The update returns the product row, the stock is merged by the
+        # service
+        return ProductBase(**response.data[0])
 
     async def toggle_status_product(
         self,
         id_product: str, active: bool
     ) -> bool:
-        response = (
+        response = await (
             self.supabase.table(self.table)
             .update({"product_state": active})
             .eq(
@@ -147,3 +133,18 @@ class ProductRepository:
             .execute()
         )
         return len(response.data) > 0
+
+    async def delete(
+        self,
+        id_product: str,
+    ) -> bool:
+        response = await (
+            self.supabase.table(self.table)
+            .delete()
+            .eq(
+                "id_product",
+                id_product,
+            )
+            .execute()
+        )
+        return len(response.data) > 0
@@ -0,0 +1,248 @@
+"""Module with the in-memory cache of the product catalog."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+
+from supabase import AsyncClient  # noqa: TC002
+
+from app.core.config import settings
+from app.models.branch_stock import BranchStock
+from app.models.product import Product, ProductBase
+from app.persistence.db.connection import get_async_supabase
+from app.utils.text import normalize_text
+from app.utils.trie import PrefixTrie
+
+# Rows per request of the loads, at most the max-rows of PostgREST (1000 on
+# Supabase), a longer select is cut without error
+LOAD_CHUNK_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class ProductCatalogRepository:
+    """
+    Products and their stock kept in memory.
+
+    The products and the stock are cached separately, the stock changes
+    with every sale while the prices change a few times a day. Every reload
+    or invalidation increases `version`, so it identifies the content of
+    the catalog served by this process.
+    """
+
+    _instance = None
+
+    def __new__(cls) -> ProductCatalogRepository:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.supabase: AsyncClient = get_async_supabase()
+            cls._instance.ttl = settings.product_catalog_ttl
+            cls._instance.version = 0
+            cls._instance._products = {}
+            cls._instance._names = PrefixTrie()
+            cls._instance._normalized_names = {}
+            cls._instance._products_loaded_at = None
+            cls._instance._products_lock = asyncio.Lock()
+            cls._instance._stock = {}
+            cls._instance._stock_loaded_at = None
+            cls._instance._stock_lock = asyncio.Lock()
+        return cls._instance
+
+    def invalidate(self) -> None:
+        """Reloads the products and the stock on the next read."""
+        self._products_loaded_at = None
+        self._stock_loaded_at = None
+        self.version += 1
+
+    def put(self, product: Product) -> None:
+        """Adds or replaces the product written by this process."""
+        if self._products_loaded_at is not None:
+            previous = self._products.get(product.id_product)
+            if previous:
+                self._names.remove(
+                    previous.id_product,
+                    normalize_text(previous.product_name).split(),
+                )
+            self._products[product.id_product] = ProductBase(
+                **product.model_dump(exclude={"stock"})
+            )
+            self._names.insert(product.id_product, self._name_words(product))
+        if self._stock_loaded_at is not None:
+            self._stock[product.id_product] = product.stock
+        self.version += 1
+
+    def set_state(self, id_product: str, active: bool) -> None:
+        """Changes the state of the product toggled by this process."""
+        product = self._products.get(str(id_product))
+        if product is not None:
+            self._products[product.id_product] = product.model_copy(
+                update={"product_state": active}
+            )
+        self.version += 1
+
+    def _name_words(self, product: ProductBase) -> list[str]:
+        normalized_name = normalize_text(product.product_name)
+        self._normalized_names[product.id_product] = normalized_name
+        return normalized_name.split()
+
+    def _is_fresh(self, loaded_at: float | None) -> bool:
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    async def _load_table(self, table: str, key: str) -> list[dict]:
+        """Loads every row of the table, one chunk per request."""
+        rows = []
+        after = None
+        while True:
+            query = (
+                self.supabase.table(table)
+                .select("*")
+                .order(key)
+                .limit(LOAD_CHUNK_SIZE)
+            )
+            if after is not None:
+                query = query.gt(key, after)
+            response = await query.execute()
+            chunk = response.data or []
+            rows.extend(chunk)
+            if len(chunk) < LOAD_CHUNK_SIZE:
+                return rows
+            after = chunk[-1][key]
+
+    async def _load_products(self) -> None:
+        loaded_at = self._products_loaded_at
+        async with self._products_lock:
+            # Another request already reloaded the products while waiting
+            if self._products_loaded_at != loaded_at:
+                return
+            rows = await self._load_table("product", "id_product")
+            self._products = {
+                str(item["id_product"]): ProductBase(**item) for item in rows
+            }
+            names = PrefixTrie()
+            self._normalized_names = {}
+            for product in self._products.values():
+                names.insert(product.id_product, self._name_words(product))
+            self._names = names
+            self._products_loaded_at = time.monotonic()
+            self.version += 1
+
+    async def _load_stock(self) -> None:
+        loaded_at = self._stock_loaded_at
+        async with self._stock_lock:
+            if self._stock_loaded_at != loaded_at:
+                return
+            rows = await self._load_table("branch_stock", "id_branch_stock")
+            stock = defaultdict(list)
+            for item in rows:
+                stock[str(item["id_product"])].append(BranchStock(**item))
+            self._stock = dict(stock)
+            self._stock_loaded_at = time.monotonic()
+            self.version += 1
+
+    async def refresh_stock(self, items: Iterable[tuple[str, str]]) -> None:
+        """
+        Reloads the stock of the `(id_product, id_branch)` pairs changed by
+        this process, the rest of the stock is kept.
+        """
+        pairs = {(str(product), str(branch)) for product, branch in items}
+        if not pairs:
+            return
+        # Waits for a load in progress, it may not include the change
+        async with self._stock_lock:
+            if self._stock_loaded_at is None:
+                return
+            try:
+                response = await (
+                    self.supabase.table("branch_stock")
+                    .select("*")
+                    .in_("id_product", sorted({p for p, _ in pairs}))
+                    .in_("id_branch", sorted({b for _, b in pairs}))
+                    .execute()
+                )
+            except Exception:
+                logger.exception("Error refreshing the stock of the catalog")
+                self._stock_loaded_at = None
+                self.version += 1
+                return
+            rows = {
+                (str(item["id_product"]), str(item["id_branch"])): item
+                for item in response.data or []
+            }
+            for id_product, id_branch in pairs:
+                stock = [
+                    entry
+                    for entry in self._stock.get(id_product, [])
+                    if str(entry.id_branch) != id_branch
+                ]
+                row = rows.get((id_product, id_branch))
+                if row is not None:
+                    stock.append(BranchStock(**row))
+                self._stock[id_product] = stock
+            self.version += 1
+
+    async def _refresh(self) -> None:
+        loads = []
+        if not self._is_fresh(self._products_loaded_at):
+            loads.append(self._load_products())
+        if not self._is_fresh(self._stock_loaded_at):
+            loads.append(self._load_stock())
+        if loads:
+            await asyncio.gather(*loads)
+
+    async def current_version(self) -> int:
+        """Returns the version of the catalog, reloading it when stale."""
+        await self._refresh()
+        return self.version
+
+    def _with_stock(self, product: ProductBase) -> Product:
+        return Product(
+            **product.model_dump(),
+            stock=self._stock.get(product.id_product, []),
+        )
+
+    async def get_by_id(self, id_product: str) -> Product | None:
+        await self._refresh()
+        product = self._products.get(str(id_product))
+        return self._with_stock(product) if product else None
+
+    async def list_all_products(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> list[Product]:
+        await self._refresh()
+        # Same rows as the range used in the database, both ends included
+        products = list(self._products.values())[skip : skip + limit + 1]
+        return [self._with_stock(product) for product in products]
+
+    async def autocomplete(self, query: str, limit: int = 10) -> list[Product]:
+        """
+        Returns the active products with a word of the name starting with
+        every word of the query, without accents nor case.
+
+        The products whose name starts with the query go first, then the
+        rest in alphabetical order.
+        """
+        prefixes = normalize_text(query).split()
+        if not prefixes:
+            return []
+        await self._refresh()
+        normalized_query = " ".join(prefixes)
+        suggestions = []
+        for id_product in self._names.search_all(prefixes):
+            product = self._products.get(id_product)
+            if product is None or not product.product_state:
+                continue
+            name = self._normalized_names[id_product]
+            suggestions.append(
+                (not name.startswith(normalized_query), name, id_product)
+            )
+        return [
+            self._with_stock(self._products[id_product])
+            for _, _, id_product in heapq.nsmallest(limit, suggestions)
+        ]
@@ -0,0 +1,112 @@
+"""Module with the read-through cache of the reference data."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Iterable
+
+from supabase import AsyncClient  # noqa: TC002
+
+from app.core.config import settings
+from app.models.customer import BranchResponse
+from app.persistence.db.connection import get_async_supabase
+
+# Branch with its city and department, loaded once for every branch
+BRANCH_QUERY = """
+    id_branch, branch_name, manager_name, branch_address,
+    city:city(city_name, department:department(department_name))
+    """
+
+# Minimum seconds between reloads caused by unknown branch ids, so invalid
+# ids sent by the clients do not hit the database on every request
+MISS_RELOAD_INTERVAL = 5
+
+
+class ReferenceDataRepository:
+    """
+    Branches, cities and departments kept in memory for `ttl` seconds.
+
+    The instance is shared by every repository, the data is loaded on the
+    first read and reloaded when it expires, when an unknown branch is
+    requested or after `invalidate`.
+    """
+
+    _instance = None
+
+    def __new__(cls) -> ReferenceDataRepository:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.supabase: AsyncClient = get_async_supabase()
+            cls._instance.ttl = settings.reference_data_ttl
+            cls._instance._branches = {}
+            cls._instance._loaded_at = None
+            cls._instance._lock = asyncio.Lock()
+        return cls._instance
+
+    def invalidate(self) -> None:
+        """Forces the reload of the data on the next read."""
+        self._loaded_at = None
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    async def _load(self, loaded_at: float | None) -> None:
+        async with self._lock:
+            # Another request already reloaded the data while waiting
+            if self._loaded_at != loaded_at:
+                return
+            response = await (
+                self.supabase.table("branch").select(BRANCH_QUERY).execute()
+            )
+            branches = {}
+            for branch_data in response.data or []:
+                city_data = branch_data.get("city") or {}
+                department_data = city_data.get("department") or {}
+                branches[str(branch_data["id_branch"])] = BranchResponse(
+                    id_branch=branch_data["id_branch"],
+                    branch_name=branch_data["branch_name"],
+                    manager_name=branch_data["manager_name"],
+                    branch_address=branch_data["branch_address"],
+                    city_name=city_data.get("city_name"),
+                    department_name=department_data.get("department_name"),
+                )
+            self._branches = branches
+            self._loaded_at = time.monotonic()
+
+    async def get_branches(
+        self, ids: Iterable[str] | None = None
+    ) -> dict[str, BranchResponse]:
+        """
+        Returns the branches by id, reloading them when they are stale.
+
+        Args:
+            ids (Iterable[str], optional): The ids that must be present, an
+                unknown id reloads the data once in a while.
+
+        Returns:
+            dict: The branches indexed by their id as string.
+
+        """
+        if not self._is_fresh():
+            await self._load(self._loaded_at)
+        if ids is not None:
+            missing = any(
+                id_branch is not None and str(id_branch) not in self._branches
+                for id_branch in ids
+            )
+            if missing and (
+                time.monotonic() - self._loaded_at >= MISS_RELOAD_INTERVAL
+            ):
+                await self._load(self._loaded_at)
+        return self._branches
+
+    async def get_branch(self, id_branch: str) -> BranchResponse | None:
+        branches = await self.get_branches([id_branch])
+        return branches.get(str(id_branch))
+
+    async def branch_exists(self, id_branch: str) -> bool:
+        return await self.get_branch(id_branch) is not None
@@ -0,0 +1,75 @@
+"""Module with the leases used to elect the worker that runs the jobs."""
+
+import fcntl
+from typing import IO, Optional
+
+from app.persistence.db.connection import get_async_admin_supabase
+
+
+class SchedulerLeaseRepository:
+    """Lease stored in the database, shared by every worker and container."""
+
+    def __init__(self, name: str, owner: str, ttl: int) -> None:
+        # The lease functions are only executable by the service role
+        self.supabase = get_async_admin_supabase()
+        self.name = name
+        self.owner = owner
+        self.ttl = ttl
+
+    async def acquire(self) -> bool:
+        """Acquires or renews the lease, returns True when it is owned."""
+        response = await self.supabase.rpc(
+            "acquire_scheduler_lease",
+            {
+                "p_lease_name": self.name,
+                "p_lease_owner": self.owner,
+                "p_ttl_seconds": self.ttl,
+            },
+        ).execute()
+        return bool(response.data)
+
+    async def release(self) -> None:
+        await self.supabase.rpc(
+            "release_scheduler_lease",
+            {"p_lease_name": self.name, "p_lease_owner": self.owner},
+        ).execute()
+
+
+class FileSchedulerLease:
+    """
+    Lease for single host deployments, the OS releases the lock when the
+    process dies.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file: Optional[IO] = None
+
+    async def acquire(self) -> bool:
+        if self._file is not None:
+            return True
+        lock_file = open(self.path, "a")  # noqa: SIM115, ASYNC230
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    async def release(self) -> None:
+        if self._file is None:
+            return
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+
+class LocalSchedulerLease:
+    """Lease always owned, for deployments with a single worker."""
+
+    async def acquire(self) -> bool:
+        return True
+
+    async def release(self) -> None:
+        return None
@@ -0,0 +1,136 @@
+# File to connect with the SMTP server
+# A session is authenticated once and used to send a batch of messages
+import smtplib
+import time
+from email.message import Message
+
+from app.core.config import settings
+
+# Errors where a new connection may succeed, any other error is permanent
+TRANSIENT_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    smtplib.SMTPHeloError,
+    TimeoutError,
+    ConnectionError,
+)
+
+
+class SMTPTransport:
+    """Authenticated SMTP sessions with timeouts and retries to connect."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        use_tls: bool = True,
+        timeout: float = 10,
+        max_retries: int = 3,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def _open(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        return server
+
+    def _connect(self) -> smtplib.SMTP:
+        # Only the connection is retried, nothing was sent yet
+        attempt = 0
+        while True:
+            try:
+                return self._open()
+            except TRANSIENT_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                # Backoff before opening a new connection
+                time.sleep(min(2**attempt, 10))
+                attempt += 1
+
+    def _close(self, server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def send(self, message: Message) -> None:
+        """
+        Sends the message in a new session.
+
+        Raises:
+            smtplib.SMTPException: If the connection failed after the
+            retries or the server rejected the message.
+
+        """
+        server = self._connect()
+        try:
+            # Not retried, the server may have accepted the DATA already
+            server.send_message(message)
+        except Exception:
+            server.close()
+            raise
+        self._close(server)
+
+    def send_many(
+        self, messages: list[Message]
+    ) -> list[tuple[bool, str]]:
+        """Sends the messages in the same session, one result per message."""
+        results = []
+        server = None
+        try:
+            for message in messages:
+                try:
+                    if server is None:
+                        server = self._connect()
+                    # A failed message is not sent again, only reported
+                    server.send_message(message)
+                    results.append((True, "Email sent successfully"))
+                except TRANSIENT_ERRORS as e:
+                    # The next message opens a new connection
+                    if server is not None:
+                        server.close()
+                        server = None
+                    results.append((False, f"Error sending email: {e!s}"))
+                except Exception as e:
+                    results.append((False, f"Error sending email: {e!s}"))
+        finally:
+            if server is not None:
+                self._close(server)
+        return results
+
+
+class SMTPClient:
+    _instance: SMTPTransport = None
+
+    @classmethod
+    def get_client(cls) -> SMTPTransport:
+        if cls._instance is None:
+            cls._instance = SMTPTransport(
+                settings.email_host,
+                settings.email_port,
+                settings.email_username,
+                settings.email_password,
+                use_tls=settings.email_use_tls,
+                timeout=settings.email_timeout,
+                max_retries=settings.email_max_retries,
+            )
+        return cls._instance
+
+
+def get_smtp() -> SMTPTransport:
+    return SMTPClient.get_client()
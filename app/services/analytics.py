@@ -0,0 +1,31 @@
+"""Module for sales analytics services."""
+
+from datetime import date
+
+from app.models.analytics import SalesAnalyticsResponse, SalesGroupBy
+from app.persistence.repositories.analytics import AnalyticsRepository
+
+
+class AnalyticsService:
+    def __init__(self) -> None:
+        self.repository = AnalyticsRepository()
+
+    async def get_sales(  # noqa: PLR0913
+        self,
+        group_by: SalesGroupBy,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        id_branch: str | None = None,
+        id_product: str | None = None,
+        skip: int = 0,
+        limit: int = 1000,
+    ) -> SalesAnalyticsResponse:
+        return await self.repository.get_sales(
+            group_by,
+            start_date,
+            end_date,
+            id_branch,
+            id_product,
+            skip,
+            limit,
+        )
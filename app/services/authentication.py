@@ -1,19 +1,31 @@
 # This file contiains the main for authentication
+import asyncio
+
+import jwt
 from fastapi import Depends, status
 from fastapi.exceptions import HTTPException
 from fastapi.security import (
     HTTPAuthorizationCredentials,
     HTTPBearer,
 )
+from gotrue import AuthResponse, User
 from pydantic import EmailStr
-from supabase import Client
+from supabase import AsyncClient
 
 from app.core.config import settings
-from app.models.authentication import UserResponse
-from app.persistence.db.connection import get_supabase
+from app.core.request_timing import record_time
+from app.models.authentication import BaseUser, CreateUser, UserResponse
+from app.persistence.db.connection import get_async_supabase
 from app.persistence.repositories.authentication import (
     AuthenticationRepository,
 )
+from app.utils.authentication import (
+    UnknownSigningKeyError,
+    decode_access_token,
+    hash_token,
+    token_cache,
+    user_from_claims,
+)
 
 security = HTTPBearer()
 
@@ -25,21 +37,53 @@ def is_allowed_user(current_user_email: EmailStr) -> bool:
 
 
 async def verify_user(
-    supabase: Client = Depends(get_supabase),
+    supabase: AsyncClient = Depends(get_async_supabase),
     credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> UserResponse:
+    with record_time("auth"):
+        return await _verify_token(supabase, credentials)
+
+
+async def _verify_token(
+    supabase: AsyncClient,
+    credentials: HTTPAuthorizationCredentials,
 ) -> UserResponse:
     # Get the Authorization header
     token = credentials.credentials
+    token_hash = hash_token(token)
+
+    # The token was logged out in this process
+    if token_cache.is_revoked(token_hash):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials - session logged out",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Return the user if the token was verified recently
+    cached_user = token_cache.get(token_hash)
+    if cached_user:
+        return cached_user
 
     try:
-        # Verify the user in supabase
-        user = supabase.auth.get_user(token)
+        try:
+            # Verify the token locally, the JWKS may be fetched on a thread
+            claims = await asyncio.to_thread(decode_access_token, token)
+            user = user_from_claims(claims)
+            token_exp = claims["exp"]
+        except UnknownSigningKeyError:
+            # Verify the user in supabase when the key is unknown
+            user = await supabase.auth.get_user(token)
+            token_exp = jwt.decode(
+                token, options={"verify_signature": False}
+            ).get("exp")
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token user not authenticated",
             )
 
+        token_cache.set(token_hash, user, token_exp)
         return user
     except Exception as e:
         raise HTTPException(
@@ -55,8 +99,34 @@ class AuthenticationService:
     def __init__(self) -> None:
         self.repository = AuthenticationRepository()
 
-    async def list_all_users(self) -> list[UserResponse]:
-        return await self.repository.list_all_users()
+    async def create_user(self, user: CreateUser) -> User:
+        return await self.repository.create_user(user)
+
+    async def login(self, user: BaseUser) -> AuthResponse:
+        return await self.repository.login(user.email, user.password)
+
+    async def delete_user(self, user_id: str) -> None:
+        await self.repository.delete_user(user_id)
+
+    async def list_all_users(
+        self,
+        page: int = 1,
+        per_page: int = 50,
+    ) -> list[UserResponse]:
+        return await self.repository.list_all_users(page, per_page)
 
     async def logout_user(self, token: str) -> None:
-        return await self.repository.logout_user(token=token)
+        """
+        Signs out the session and drops the token from the cache of this
+        process, which rejects it from now on.
+
+        The other workers keep accepting the token while it is in their
+        cache, up to `auth_cache_ttl` seconds, and when they verify it
+        locally with the JWT secret or the JWKS, until the token expires.
+        """
+        result = await self.repository.logout_user(token=token)
+        token_exp = jwt.decode(token, options={"verify_signature": False}).get(
+            "exp"
+        )
+        token_cache.revoke(hash_token(token), token_exp)
+        return result
@@ -1,3 +1,5 @@
+from collections.abc import AsyncIterator
+
 from app.models.customer import (
     ClientUpdate,
     CreateClient,
@@ -31,8 +33,17 @@ class CustomerService:
         skip: int,
         limit: int,
         search: str | None = None,
+        after: str | None = None,
     ) -> list[Customer]:
-        return await self.repository.list_all_customers(skip, limit, search)
+        return await self.repository.list_all_customers(
+            skip, limit, search, after
+        )
+
+    async def export_customers(
+        self, chunk_size: int = 500
+    ) -> AsyncIterator[list[Customer]]:
+        async for customers in self.repository.iter_customers(chunk_size):
+            yield customers
 
     async def update_customer(
         self,
@@ -19,6 +19,9 @@ from app.persistence.repositories.customer import CustomerRepository
 from app.persistence.repositories.customer_service import CustomerServiceRepository
 from app.utils.customer_service import calculate_days_remaining
 
+# Number of purchases shown in the history of the customer service detail
+PURCHASE_HISTORY_LIMIT = 10
+
 class CustomerServiceService:
     def __init__(self) -> None:
         self.repository = CustomerServiceRepository()
@@ -75,22 +78,18 @@ class CustomerServiceService:
         return processed_services_for_table
 
     async def get_customer_service_detail_by_id(self, id_customer_service: UUID4) -> Optional[CustomerServiceDetailResponse]:
-        # 1. Get the customer information
-        customer_info = await self.repository.get_customer_info_for_service_detail(id_customer_service)
-        if not customer_info:
-            print(f"No se encontró información del cliente para el servicio {id_customer_service}")
-            return None 
-
-        # 2. Get the purchase information associated with the customer service
-        purchase_info_from_service = await self.repository.get_purchase_info_for_service_detail(id_customer_service)
-        if not purchase_info_from_service:
-            print(f"No se encontró información de la compra para el servicio {id_customer_service}")
+        # 1. Get the customer and purchase information in a single query
+        service_detail = await self.repository.get_service_detail_by_id(id_customer_service)
+        if not service_detail:
+            print(f"No se encontró información del servicio {id_customer_service}")
             return None
+        customer_info, purchase_info_from_service = service_detail
 
-        # 3. Get the purchase history for the customer associated with the purchase 
+        # 2. Get the last purchases of the customer, the queries of the history run concurrently
         customer_purchases_history: Optional[PurchaseByCustomerDocumentResponse] = \
             await self.customer_repository.get_purchses_by_customer_document(
-                customer_document=customer_info.customer_document
+                customer_document=customer_info.customer_document,
+                limit=PURCHASE_HISTORY_LIMIT
             )
         if not customer_purchases_history:
             print(f"No se encontró historial de compras para el cliente {customer_info.customer_document}")
@@ -11,12 +11,15 @@ from app.persistence.repositories.email_sender import EmailSender
 
 
 class ServiceEmailSender:
-    def __init__(self, callback=None) -> None:
+    def __init__(self, callback=None, error_callback=None) -> None:
         self.scheduler = BackgroundScheduler()
         self.email_sender = EmailSender()
         self.timezone = timezone("America/Bogota")
         self.job_added = False
+        # Called with the result of each run of the job, the errors to set
+        # up the scheduler are reported to the error callback
         self.callback = callback
+        self.error_callback = error_callback
 
     def send_email(self) -> tuple[bool, str]:
         """Envía un email y retorna estado y mensaje."""
@@ -62,14 +65,22 @@ class ServiceEmailSender:
             # Run the scheduler
             if not self.scheduler.running:
                 self.scheduler.start()
-
-            # Start the scheduler
-            if immediate:
-                return self.send_email()
-
-            return True, "Email sent successfully"
         except Exception as e:
             error_msg = f"Error in email scheduler: {e!s}"
-            if self.callback:
-                self.callback(False, error_msg)  # noqa: FBT003
+            if self.error_callback:
+                self.error_callback(error_msg)
             return False, error_msg
+
+        # Run the job now, its result is reported by the job itself
+        if immediate:
+            try:
+                return self.send_email()
+            except ValueError as e:
+                return False, str(e)
+
+        return True, "Email sent successfully"
+
+    def stop(self) -> None:
+        """Stops the scheduler, the jobs are kept to start it again."""
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
@@ -5,7 +5,6 @@ from typing import Optional
 from fastapi import HTTPException, status
 
 from app.models.branch_stock import (
-    BranchStockUpdate,
     CreateBranchStock,
 )
 from app.models.product import (
@@ -15,6 +14,9 @@ from app.models.product import (
 )
 from app.persistence.repositories.branch_stock import BranchStockRepository
 from app.persistence.repositories.product import ProductRepository
+from app.persistence.repositories.product_catalog import (
+    ProductCatalogRepository,
+)
 from app.utils.products import calculate_profit_margin
 
 
@@ -22,6 +24,7 @@ class ProductService:
     def __init__(self) -> None:
         self.repository = ProductRepository()
         self.stock_repository = BranchStockRepository()
+        self.catalog = ProductCatalogRepository()
 
     async def create_product(self, product: CreateProduct) -> Product:
         # Calculate the profit margin
@@ -34,27 +37,39 @@ class ProductService:
             product,
             profit_margin,
         )
-        # Create the stocks
-        product_stock = [
-            await self.stock_repository.create(
-                CreateBranchStock(
-                    id_product=created_product.id_product,
-                    id_branch=stock.id_branch,
-                    quantity=stock.quantity,
-                ),
+        # Create the stocks of every branch in a single request
+        try:
+            product_stock = await self.stock_repository.create_many(
+                [
+                    CreateBranchStock(
+                        id_product=created_product.id_product,
+                        id_branch=stock.id_branch,
+                        quantity=stock.quantity,
+                    )
+                    for stock in product.stock
+                ],
             )
-            for stock in product.stock
-        ]
-        return Product(
+        except Exception:
+            # The bulk insert is atomic, remove the product to not leave
+            # it without stock
+            await self.repository.delete(created_product.id_product)
+            raise
+        new_product = Product(
             **created_product.model_dump(),
             stock=product_stock,
         )
+        self.catalog.put(new_product)
+        return new_product
+
+    async def catalog_version(self) -> int:
+        return await self.catalog.current_version()
 
     async def get_product_by_id(
         self,
         id_product: str,
     ) -> Optional[Product]:
-        return await self.repository.get_by_id(
+        # The reads are served by the catalog in memory
+        return await self.catalog.get_by_id(
             id_product,
         )
 
@@ -63,11 +78,16 @@ class ProductService:
         skip: int = 0,
         limit: int = 100,
     ) -> list[Product]:
-        return await self.repository.list_all_products(
+        return await self.catalog.list_all_products(
             skip,
             limit,
         )
 
+    async def autocomplete_products(
+        self, query: str, limit: int = 10
+    ) -> list[Product]:
+        return await self.catalog.autocomplete(query, limit)
+
     async def update_product(
         self,
         id_product: str,
@@ -81,35 +101,63 @@ class ProductService:
             )
             product.profit_margin = profit_margin
 
+        stock_updated = []
         if product.stock is not None:
-            counter = 0
-            # Update the stock for the product
-            for stock in product.stock:
-                stock_updated = await self.stock_repository.update(
-                    id_product,
-                    BranchStockUpdate(
-                        id_branch=stock.id_branch,
-                        quantity=stock.quantity,
-                    ),
+            # Update the stock of every branch in a single request
+            stock_updated = await self.stock_repository.upsert_many(
+                id_product,
+                product.stock,
+            )
+            if not len(stock_updated) == len(product.stock):
+                await self.catalog.refresh_stock(
+                    (id_product, stock.id_branch) for stock in product.stock
                 )
-                if stock_updated:
-                    counter += 1
-            if not counter == len(product.stock):
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Al menos uno de los stocks no pudieron ser actualizados.",
                 )
 
-        return await self.repository.update(
-            id_product,
-            product,
+        # The catalog keeps the stock of the branches not in the update
+        cached_product = await self.catalog.get_by_id(id_product)
+        if product.model_dump(
+            exclude={"stock"},
+            exclude_unset=True,
+            exclude_defaults=True,
+        ):
+            product_base = await self.repository.update(
+                id_product,
+                product,
+            )
+            if product_base is None:
+                return None
+        elif cached_product is not None:
+            # Only the stock changed, the product is the one of the catalog
+            product_base = cached_product
+        else:
+            # The product is not in the catalog yet, read it from the database
+            return await self.repository.get_by_id(id_product)
+
+        stock = {
+            str(entry.id_branch): entry
+            for entry in (cached_product.stock if cached_product else [])
+        }
+        stock.update((str(entry.id_branch), entry) for entry in stock_updated)
+        updated_product = Product(
+            **product_base.model_dump(exclude={"stock"}),
+            stock=list(stock.values()),
         )
+        # Replace the product in the catalog, without reloading it
+        self.catalog.put(updated_product)
+        return updated_product
 
     async def toggle_status_product(
         self,
         id_product: str,
         activate: bool
     ) -> bool:
-        return await self.repository.toggle_status_product(
+        toggled = await self.repository.toggle_status_product(
             id_product, activate
         )
+        if toggled:
+            self.catalog.set_state(id_product, activate)
+        return toggled
@@ -1,24 +1,55 @@
 """Module for purchase services."""
 
-from app.models.customer_service import CreateCustomerServiceDB
+from collections.abc import AsyncIterator
+from datetime import date
+
 from app.models.purchase import PurchaseResponse, SaleCreate
-from app.persistence.repositories.customer_service import CustomerServiceRepository
+from app.persistence.repositories.product_catalog import (
+    ProductCatalogRepository,
+)
 from app.persistence.repositories.purchase import PurchaseRepository
+from app.persistence.repositories.reference_data import (
+    ReferenceDataRepository,
+)
+from app.utils.purchase import purchase_export_rows
 
 
 class PurchaseService:
     def __init__(self) -> None:
         self.repository: PurchaseRepository = PurchaseRepository()
-        self.customer_service: CustomerServiceRepository = CustomerServiceRepository()
+        self.catalog = ProductCatalogRepository()
+        self.reference_data = ReferenceDataRepository()
 
     async def make_purchase(self, purchase: SaleCreate) -> PurchaseResponse:
-        purchase_response = await self.repository.make_purchase(purchase)
-         # Create customer service record
-        customer_service_data = CreateCustomerServiceDB(
-            id_purchase=purchase_response.id_purchase,
-            service_date=purchase_response.purchase_date,
-            next_contact_date=purchase_response.next_purchase_date
+        # The customer service record is created in the same transaction
+        created_purchase = await self.repository.make_purchase(purchase)
+        # The purchase decrements the stock of its products in the branch,
+        # the prices and the rest of the stock are still valid
+        await self.catalog.refresh_stock(
+            (str(line.id_product), str(purchase.id_branch))
+            for line in purchase.products
         )
-        await self.customer_service.create_customer_service(customer_service_data)
-        
-        return purchase_response
+        return created_purchase
+
+    async def export_purchases(
+        self,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        id_branch: str | None = None,
+    ) -> AsyncIterator[list[list]]:
+        """Yields the rows of the export, one chunk of purchases at a time."""
+        async for purchases in self.repository.iter_purchases(
+            start_date, end_date, id_branch
+        ):
+            branches = await self.reference_data.get_branches(
+                purchase.get("id_branch") for purchase in purchases
+            )
+            rows = []
+            for purchase in purchases:
+                branch = branches.get(str(purchase.get("id_branch")))
+                rows.extend(
+                    purchase_export_rows(
+                        purchase, branch.branch_name if branch else None
+                    )
+                )
+            yield rows
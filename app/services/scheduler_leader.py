@@ -0,0 +1,119 @@
+"""Module to elect the only worker that runs the scheduled jobs."""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from collections.abc import Callable
+from typing import Optional
+
+from app.core.config import settings
+from app.persistence.repositories.scheduler_lease import (
+    FileSchedulerLease,
+    LocalSchedulerLease,
+    SchedulerLeaseRepository,
+)
+
+LEASE_NAME = "scheduler"
+
+logger = logging.getLogger(__name__)
+
+
+def get_scheduler_lease() -> object:
+    """Returns the lease configured with `scheduler_lease_backend`."""
+    backend = settings.scheduler_lease_backend
+    if backend == "supabase":
+        owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        return SchedulerLeaseRepository(
+            LEASE_NAME, owner, settings.scheduler_lease_ttl
+        )
+    if backend == "file":
+        return FileSchedulerLease(settings.scheduler_lease_file)
+    if backend == "none":
+        return LocalSchedulerLease()
+    msg = f"Unknown scheduler lease backend '{backend}'"
+    raise ValueError(msg)
+
+
+class SchedulerLeader:
+    """
+    Keeps trying to own the lease, the owner starts the jobs and the other
+    workers wait in standby to take over when the owner dies.
+    """
+
+    def __init__(
+        self,
+        lease: object,
+        on_elected: Callable[[], None],
+        on_demoted: Callable[[], None],
+        on_standby: Optional[Callable[[str], None]] = None,
+        interval: Optional[float] = None,
+    ) -> None:
+        self.lease = lease
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.on_standby = on_standby
+        # Renew several times before the lease expires
+        self.interval = interval or max(settings.scheduler_lease_ttl / 3, 1)
+        self.is_leader = False
+        self._last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _check(self) -> None:
+        try:
+            acquired = await self.lease.acquire()
+            error = None
+        except Exception as e:
+            # Without the lease the jobs could run twice, step down
+            acquired = False
+            error = f"Error acquiring the scheduler lease: {e!s}"
+            # A missing function or table leaves every worker in standby
+            if error != self._last_error:
+                logger.exception(error)
+        self._last_error = error
+
+        if acquired and not self.is_leader:
+            try:
+                self.on_elected()
+                self.is_leader = True
+            except Exception as e:
+                # Let another worker try to start the jobs
+                acquired = False
+                error = f"Error starting the scheduled jobs: {e!s}"
+                logger.exception(error)
+                await self._release()
+        elif not acquired and self.is_leader:
+            self.is_leader = False
+            self.on_demoted()
+
+        if not acquired and self.on_standby:
+            self.on_standby(
+                error or "Standby, another worker runs the scheduler"
+            )
+
+    async def _release(self) -> None:
+        try:
+            await self.lease.release()
+        except Exception:
+            logger.exception("Error releasing the scheduler lease")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._check()
+
+    async def start(self) -> None:
+        """Runs the first election and keeps renewing in background."""
+        await self._check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the jobs and releases the lease for the other workers."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self.is_leader:
+            self.is_leader = False
+            self.on_demoted()
+            await self._release()
@@ -0,0 +1,198 @@
+"""Module with reusable functions to verify the access tokens locally."""
+
+import hashlib
+import time
+from datetime import UTC, datetime
+from threading import Lock
+from typing import Optional
+
+import jwt
+from gotrue import User
+
+from app.core.config import settings
+from app.models.authentication import UserResponse
+
+# Algorithms accepted for the access tokens issued by Supabase Auth
+SYMMETRIC_ALGORITHMS = ["HS256"]
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+
+
+class UnknownSigningKeyError(Exception):
+    """The token can not be verified locally, use the remote check."""
+
+
+class TokenCache:
+    """
+    TTL cache of verified users keyed by the hash of the token.
+
+    The tokens logged out in this process are kept as revoked until they
+    expire, the local verification can not see the revoked sessions.
+    """
+
+    def __init__(self, ttl: int, max_size: int = 10000) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = Lock()
+        self._items: dict[str, tuple[float, UserResponse]] = {}
+        # Unix time when each revoked token expires
+        self._revoked: dict[str, float] = {}
+
+    def get(self, token_hash: str) -> Optional[UserResponse]:
+        item = self._items.get(token_hash)
+        if item is None:
+            return None
+        expires_at, user = item
+        if expires_at <= time.monotonic():
+            self._items.pop(token_hash, None)
+            return None
+        return user
+
+    def set(
+        self,
+        token_hash: str,
+        user: UserResponse,
+        token_exp: Optional[float] = None,
+    ) -> None:
+        ttl = self.ttl
+        # Never keep a token in cache after it expires
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            if len(self._items) >= self.max_size:
+                self._evict()
+            self._items[token_hash] = (time.monotonic() + ttl, user)
+
+    def delete(self, token_hash: str) -> None:
+        with self._lock:
+            self._items.pop(token_hash, None)
+
+    def revoke(self, token_hash: str, token_exp: Optional[float]) -> None:
+        """Drops the token and rejects it until it expires."""
+        now = time.time()
+        with self._lock:
+            self._items.pop(token_hash, None)
+            self._revoked = {
+                key: exp for key, exp in self._revoked.items() if exp > now
+            }
+            if len(self._revoked) < self.max_size:
+                self._revoked[token_hash] = token_exp or now + self.ttl
+
+    def is_revoked(self, token_hash: str) -> bool:
+        expires_at = self._revoked.get(token_hash)
+        return expires_at is not None and expires_at > time.time()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._revoked.clear()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [k for k, (exp, _) in self._items.items() if exp <= now]
+        for key in expired:
+            del self._items[key]
+        # Drop the oldest half when everything is still valid
+        if len(self._items) >= self.max_size:
+            for key in list(self._items)[: self.max_size // 2]:
+                del self._items[key]
+
+
+token_cache = TokenCache(ttl=settings.auth_cache_ttl)
+
+# The JWKS is fetched once and cached by the client for `lifespan` seconds
+jwks_client = jwt.PyJWKClient(
+    f"{settings.supabase_url}/auth/v1/.well-known/jwks.json",
+    cache_jwk_set=True,
+    lifespan=600,
+)
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_signing_key(token: str) -> tuple[object, list[str]]:
+    """
+    Returns the key and the algorithms to verify the token signature.
+
+    Args:
+        token (str): The access token sent in the Authorization header.
+
+    Returns:
+        tuple: The signing key and the list of allowed algorithms.
+
+    Raises:
+        UnknownSigningKeyError: If the key to verify the token is not known.
+        jwt.InvalidTokenError: If the token header is malformed.
+
+    """
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+
+    if algorithm in SYMMETRIC_ALGORITHMS:
+        if not settings.supabase_jwt_secret:
+            msg = "JWT secret is not configured"
+            raise UnknownSigningKeyError(msg)
+        return settings.supabase_jwt_secret, SYMMETRIC_ALGORITHMS
+
+    if algorithm in ASYMMETRIC_ALGORITHMS and header.get("kid"):
+        try:
+            signing_key = jwks_client.get_signing_key(header["kid"])
+        except jwt.PyJWKClientError as e:
+            raise UnknownSigningKeyError(str(e)) from e
+        return signing_key.key, [algorithm]
+
+    msg = f"Unsupported token algorithm '{algorithm}'"
+    raise UnknownSigningKeyError(msg)
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Verifies the signature, expiration and audience of the token.
+
+    Args:
+        token (str): The access token sent in the Authorization header.
+
+    Returns:
+        dict: The claims of the token.
+
+    Raises:
+        UnknownSigningKeyError: If the key to verify the token is not known.
+        jwt.InvalidTokenError: If the token is invalid or expired.
+
+    """
+    key, algorithms = get_signing_key(token)
+    return jwt.decode(
+        token,
+        key,
+        algorithms=algorithms,
+        audience=settings.jwt_audience,
+        options={"require": ["exp", "sub", "aud"]},
+    )
+
+
+def user_from_claims(claims: dict) -> UserResponse:
+    """
+    Builds the same response of `auth.get_user` using the token claims.
+
+    The token does not carry the creation date of the user, the issued at
+    date is used instead.
+    """
+    issued_at = claims.get("iat", claims["exp"])
+    return UserResponse(
+        user=User(
+            id=claims["sub"],
+            aud=claims["aud"]
+            if isinstance(claims["aud"], str)
+            else claims["aud"][0],
+            email=claims.get("email"),
+            phone=claims.get("phone"),
+            role=claims.get("role"),
+            app_metadata=claims.get("app_metadata", {}),
+            user_metadata=claims.get("user_metadata", {}),
+            is_anonymous=claims.get("is_anonymous", False),
+            created_at=datetime.fromtimestamp(issued_at, UTC),
+        ),
+    )
@@ -1,14 +1,11 @@
 """Modulo with reusable functions for customer."""
 
+import base64
+import json
+
+from app.models.customer import Customer
+
 customer_queries: dict = {
-    "query_customer_branch": """
-        customer_document, document_type, customer_first_name,
-        customer_last_name, phone_number, email, home_address,
-        customer_state, id_branch,
-        branch:branch(id_branch, branch_name, manager_name,
-            branch_address, city:city(id_city, city_name,
-                department:department(id_department, department_name)))
-        """,
     "query_purchase_product": """
         id_purchase, purchase_date, purchase_duration, next_purchase_date,
         purchase_product:purchase_product(
@@ -18,4 +15,56 @@ customer_queries: dict = {
     "query_customer_basic": """
         customer_document, customer_first_name, customer_last_name
         """,
+    # Customer with its purchases summary, it holds the last purchase with
+    # its products. The branch is hydrated from the reference data cache
+    # with `id_branch`
+    "query_customer_summary": """
+        customer_document, document_type, customer_first_name,
+        customer_last_name, phone_number, email, home_address,
+        customer_state, id_branch, last_purchase_date,
+        customer_summary:customer_summary(lifetime_total, purchase_count,
+            last_purchase)
+        """,
 }
+
+
+def encode_customer_cursor(customer: Customer) -> str:
+    """
+    Builds the opaque cursor of the customer list after the given customer.
+
+    Args:
+        customer (Customer): The last customer of the current page.
+
+    Returns:
+        str: The cursor to request the next page with `after`.
+
+    """
+    # The same column the list is ordered by, not the date of the summary
+    last_purchase_date = (
+        customer.last_purchase_date.isoformat()
+        if customer.last_purchase_date
+        else None
+    )
+    payload = json.dumps(
+        [last_purchase_date, customer.customer_document],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_customer_cursor(cursor: str) -> tuple[str | None, str]:
+    """
+    Reads the last purchase date and document stored in the cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        payload = base64.urlsafe_b64decode(cursor + padding)
+        last_purchase_date, customer_document = json.loads(payload)
+    except Exception as e:
+        msg = "Invalid cursor"
+        raise ValueError(msg) from e
+    return last_purchase_date, str(customer_document)
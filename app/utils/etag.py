@@ -0,0 +1,85 @@
+"""Module with reusable functions for the conditional GET requests."""
+
+import hashlib
+import uuid
+from typing import Any
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.request_timing import record_time
+
+# The versions of the caches are counted per process, the id of the
+# process avoids the same ETag for different data in two workers
+PROCESS_ID = uuid.uuid4().hex
+
+
+def build_etag(*parts: Any) -> str:  # noqa: ANN401
+    """
+    Builds a strong ETag from a known version of the data.
+
+    Args:
+        *parts: The version and the parameters that change the response.
+
+    Returns:
+        str: The quoted ETag.
+
+    """
+    key = repr((PROCESS_ID, *parts)).encode()
+    return f'"{hashlib.sha256(key).hexdigest()[:32]}"'
+
+
+def body_etag(body: bytes) -> str:
+    """Builds a strong ETag from the serialized response."""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Checks if the client already has the response with the ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+    )
+
+
+def conditional_response(
+    request: Request,
+    content: Any,  # noqa: ANN401
+    etag: str | None = None,
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """
+    Serializes the content and answers `304 Not Modified` when the client
+    has it already.
+
+    Args:
+        request (Request): The request with the `If-None-Match` header.
+        content (Any): The data of the response.
+        etag (str, optional): The ETag of a known version of the data, when
+            it is not given the ETag is the hash of the serialized content.
+        headers (dict, optional): Extra headers of the response.
+
+    Returns:
+        Response: The JSON response with the ETag or the `304` response.
+
+    """
+    with record_time("serialization"):
+        response = JSONResponse(
+            content=jsonable_encoder(content), headers=headers
+        )
+        etag = etag or body_etag(response.body)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return response
@@ -0,0 +1,90 @@
+"""Module with reusable functions for purchases."""
+
+purchase_queries: dict = {
+    # Purchase with its lines, payment and delivery for the exports
+    "query_purchase_export": """
+        id_purchase, customer_document, id_branch, purchase_date,
+        purchase_duration, next_purchase_date,
+        purchase_product:purchase_product(
+            id_product, unit_quantity, subtotal_without_vat,
+            total_price_with_vat, product:product(product_name)),
+        payment:payment(payment_type, payment_status, remaining_balance),
+        delivery:delivery(delivery_type, delivery_status, delivery_cost,
+            delivery_comment)
+        """,
+}
+
+# Columns of the purchases export, one row per purchase line
+PURCHASE_EXPORT_COLUMNS = [
+    "id_purchase",
+    "purchase_date",
+    "customer_document",
+    "id_branch",
+    "branch_name",
+    "purchase_duration",
+    "next_purchase_date",
+    "id_product",
+    "product_name",
+    "unit_quantity",
+    "subtotal_without_vat",
+    "total_price_with_vat",
+    "payment_type",
+    "payment_status",
+    "remaining_balance",
+    "delivery_type",
+    "delivery_status",
+    "delivery_cost",
+    "delivery_comment",
+]
+
+
+def purchase_export_rows(
+    purchase: dict, branch_name: str | None = None
+) -> list[list]:
+    """
+    Flattens a purchase in the rows of the export.
+
+    Args:
+        purchase (dict): The purchase with its lines, payment and delivery.
+        branch_name (str, optional): The name of the branch of the purchase.
+
+    Returns:
+        list[list]: One row per line, the purchases without lines have a
+        single row with empty product columns.
+
+    """
+    payments = purchase.get("payment") or [{}]
+    deliveries = purchase.get("delivery") or [{}]
+    payment, delivery = payments[0], deliveries[0]
+
+    header = [
+        purchase["id_purchase"],
+        purchase["purchase_date"],
+        purchase["customer_document"],
+        purchase.get("id_branch"),
+        branch_name,
+        purchase["purchase_duration"],
+        purchase.get("next_purchase_date"),
+    ]
+    footer = [
+        payment.get("payment_type"),
+        payment.get("payment_status"),
+        payment.get("remaining_balance"),
+        delivery.get("delivery_type"),
+        delivery.get("delivery_status"),
+        delivery.get("delivery_cost"),
+        delivery.get("delivery_comment"),
+    ]
+    lines = purchase.get("purchase_product") or [{}]
+    return [
+        [
+            *header,
+            line.get("id_product"),
+            (line.get("product") or {}).get("product_name"),
+            line.get("unit_quantity"),
+            line.get("subtotal_without_vat"),
+            line.get("total_price_with_vat"),
+            *footer,
+        ]
+        for line in lines
+    ]
@@ -0,0 +1,28 @@
+"""Module with reusable functions to normalize and index text."""
+
+import unicodedata
+
+
+def normalize_text(value: str | None) -> str:
+    """
+    Normalizes the text to compare it without accents nor case.
+
+    Args:
+        value (str | None): The text to normalize.
+
+    Returns:
+        str: The text in lower case, without accents and single spaced.
+
+    """
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    without_accents = "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+    return " ".join(without_accents.casefold().split())
+
+
+def trigrams(value: str) -> set[str]:
+    """Returns the trigrams of a normalized text."""
+    return {value[i : i + 3] for i in range(len(value) - 2)}
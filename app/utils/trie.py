@@ -0,0 +1,62 @@
+"""Module with a prefix trie to autocomplete the words of a text."""
+
+from __future__ import annotations
+
+
+class TrieNode:
+    __slots__ = ("children", "keys")
+
+    def __init__(self) -> None:
+        self.children: dict[str, TrieNode] = {}
+        # Keys of every word that starts with the prefix of the node
+        self.keys: set[str] = set()
+
+
+class PrefixTrie:
+    """
+    Trie of normalized words, every node keeps the keys of the words that
+    start with its prefix, so a lookup only walks the prefix.
+    """
+
+    def __init__(self) -> None:
+        self.root = TrieNode()
+
+    def insert(self, key: str, words: list[str]) -> None:
+        for word in words:
+            node = self.root
+            for char in word:
+                node = node.children.setdefault(char, TrieNode())
+                node.keys.add(key)
+
+    def remove(self, key: str, words: list[str]) -> None:
+        for word in words:
+            node = self.root
+            for char in word:
+                child = node.children.get(char)
+                if child is None:
+                    break
+                child.keys.discard(key)
+                # Drop the branches that do not lead to any word
+                if not child.keys:
+                    del node.children[char]
+                    break
+                node = child
+
+    def search(self, prefix: str) -> set[str]:
+        """Returns the keys with a word that starts with the prefix."""
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.keys
+
+    def search_all(self, prefixes: list[str]) -> set[str]:
+        """Returns the keys with a word for every prefix."""
+        if not prefixes:
+            return set()
+        results = sorted((self.search(prefix) for prefix in prefixes), key=len)
+        keys = set(results[0])
+        for result in results[1:]:
+            keys &= result
+        return keys
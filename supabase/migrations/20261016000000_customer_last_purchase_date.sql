@@ -0,0 +1,62 @@
+-- Denormalized date of the last purchase of each customer, it is used to
+-- order the customer list in the database with keyset pagination.
+
+alter table public.customer
+    add column if not exists last_purchase_date date;
+
+-- Backfill with the current purchases
+update public.customer c
+set last_purchase_date = p.last_purchase_date
+from (
+    select customer_document, max(purchase_date) as last_purchase_date
+    from public.purchase
+    group by customer_document
+) p
+where p.customer_document = c.customer_document;
+
+-- Order of the customer list: last purchase first, customers without
+-- purchases at the end, the document breaks the ties of the cursor
+create index if not exists customer_last_purchase_date_idx
+    on public.customer (last_purchase_date desc nulls last, customer_document);
+
+-- Last purchase of a customer (embed of the customer list)
+create index if not exists purchase_customer_document_date_idx
+    on public.purchase (customer_document, purchase_date desc);
+
+create or replace function public.refresh_customer_last_purchase_date()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        update public.customer
+        set last_purchase_date = (
+            select max(purchase_date)
+            from public.purchase
+            where customer_document = old.customer_document
+        )
+        where customer_document = old.customer_document;
+    end if;
+
+    if tg_op in ('INSERT', 'UPDATE') then
+        update public.customer
+        set last_purchase_date = (
+            select max(purchase_date)
+            from public.purchase
+            where customer_document = new.customer_document
+        )
+        where customer_document = new.customer_document;
+        return new;
+    end if;
+
+    return old;
+end;
+$$;
+
+drop trigger if exists purchase_refresh_customer_last_purchase_date
+    on public.purchase;
+
+create trigger purchase_refresh_customer_last_purchase_date
+after insert or delete or update of purchase_date, customer_document
+on public.purchase
+for each row execute function public.refresh_customer_last_purchase_date();
@@ -0,0 +1,192 @@
+-- Creates a purchase in a single transaction: validates the customer,
+-- branch, products and stock, inserts the purchase, its lines, payment,
+-- delivery and customer_service follow-up and decrements the stock.
+-- Any error rolls back the whole purchase.
+--
+-- Errors use the SQLSTATE P0002 (no_data_found) when a record does not
+-- exist and P0001 (raise_exception) for any other validation.
+
+create or replace function public.create_purchase(payload jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_customer_document text := payload ->> 'customer_document';
+    v_id_branch uuid := (payload ->> 'id_branch')::uuid;
+    v_customer_state boolean;
+    v_purchase public.purchase%rowtype;
+    v_payment public.payment%rowtype;
+    v_delivery public.delivery%rowtype;
+    v_product record;
+    v_line jsonb;
+    v_quantity integer;
+    v_products jsonb := '[]'::jsonb;
+begin
+    -- 1. Validate the customer data
+    select customer_state into v_customer_state
+    from public.customer
+    where customer_document = v_customer_document;
+
+    if not found then
+        raise exception 'Customer data is invalid for customer with document %',
+            v_customer_document
+            using errcode = 'P0002';
+    end if;
+
+    if not v_customer_state then
+        raise exception 'Customer inactive. Document %', v_customer_document
+            using errcode = 'P0001';
+    end if;
+
+    -- 2. Validate if the branch is valid and exists
+    perform 1 from public.branch where id_branch = v_id_branch;
+    if not found then
+        raise exception 'Branch with id % does not exist', v_id_branch
+            using errcode = 'P0002';
+    end if;
+
+    if (payload ->> 'remaining_balance')::numeric < 0 then
+        raise exception 'Remaining balance cannot be negative'
+            using errcode = 'P0001';
+    end if;
+
+    -- 3. Create the purchase record
+    insert into public.purchase (
+        customer_document,
+        purchase_date,
+        purchase_duration,
+        next_purchase_date
+    )
+    values (
+        v_customer_document,
+        (payload ->> 'purchase_date')::date,
+        (payload ->> 'purchase_duration')::integer,
+        (payload ->> 'purchase_date')::date
+            + (payload ->> 'purchase_duration')::integer
+    )
+    returning * into v_purchase;
+
+    -- 4. Validate each product, decrement its stock and add the line
+    for v_line in select * from jsonb_array_elements(payload -> 'products')
+    loop
+        v_quantity := (v_line ->> 'unit_quantity')::integer;
+
+        select id_product, sale_price, vat, product_state into v_product
+        from public.product
+        where id_product = (v_line ->> 'id_product')::uuid;
+
+        if not found then
+            raise exception 'Product not found %', v_line ->> 'id_product'
+                using errcode = 'P0002';
+        end if;
+
+        if not v_product.product_state then
+            raise exception 'Product is inactive %', v_product.id_product
+                using errcode = 'P0001';
+        end if;
+
+        if v_product.vat <= 0 then
+            raise exception 'Invalid VAT for product %, VAT must be greater than 0',
+                v_product.id_product
+                using errcode = 'P0001';
+        end if;
+
+        -- The condition on the quantity makes the check and the decrement
+        -- atomic, concurrent sales can not leave a negative stock
+        update public.branch_stock
+        set quantity = quantity - v_quantity
+        where id_branch = v_id_branch
+          and id_product = v_product.id_product
+          and quantity >= v_quantity;
+
+        if not found then
+            raise exception 'Product with id % does not have enough stock',
+                v_product.id_product
+                using errcode = 'P0001';
+        end if;
+
+        insert into public.purchase_product (
+            id_purchase,
+            id_product,
+            unit_quantity,
+            subtotal_without_vat,
+            total_price_with_vat
+        )
+        values (
+            v_purchase.id_purchase,
+            v_product.id_product,
+            v_quantity,
+            v_product.sale_price * v_quantity,
+            v_product.sale_price * v_quantity * (1 + (v_product.vat / 100))
+        )
+        returning v_products || jsonb_build_object(
+            'id_product', id_product,
+            'unit_quantity', unit_quantity,
+            'subtotal_without_vat', subtotal_without_vat,
+            'total_price_with_vat', total_price_with_vat
+        ) into v_products;
+    end loop;
+
+    -- 5. Record the payment, the enums are read from the payload
+    insert into public.payment (
+        id_purchase,
+        payment_type,
+        payment_status,
+        remaining_balance
+    )
+    select
+        v_purchase.id_purchase,
+        p.payment_type,
+        p.payment_status,
+        p.remaining_balance
+    from jsonb_populate_record(null::public.payment, payload) p
+    returning * into v_payment;
+
+    -- 6. Record the delivery (if applicable)
+    if payload ->> 'delivery_type' is not null then
+        insert into public.delivery (
+            id_purchase,
+            delivery_type,
+            delivery_status,
+            delivery_cost,
+            delivery_comment
+        )
+        select
+            v_purchase.id_purchase,
+            d.delivery_type,
+            'Sin Preparar',
+            d.delivery_cost,
+            d.delivery_comment
+        from jsonb_populate_record(null::public.delivery, payload) d
+        returning * into v_delivery;
+    end if;
+
+    -- 7. Create the customer service follow-up of the purchase
+    insert into public.customer_service (
+        id_purchase,
+        service_date,
+        next_contact_date,
+        customer_service_status
+    )
+    values (
+        v_purchase.id_purchase,
+        v_purchase.purchase_date,
+        v_purchase.next_purchase_date,
+        true
+    );
+
+    -- 8. Build the response
+    return jsonb_build_object(
+        'id_purchase', v_purchase.id_purchase,
+        'customer_document', v_purchase.customer_document,
+        'purchase_date', v_purchase.purchase_date,
+        'purchase_duration', v_purchase.purchase_duration,
+        'next_purchase_date', v_purchase.next_purchase_date,
+        'products', v_products,
+        'payment', to_jsonb(v_payment),
+        'delivery', case
+            when v_delivery.id_delivery is not null then to_jsonb(v_delivery)
+        end
+    );
+end;
+$$;
@@ -0,0 +1,4 @@
+-- One stock row per product and branch, required by the bulk upsert of
+-- the stock (on_conflict=id_product,id_branch)
+create unique index if not exists branch_stock_id_product_id_branch_key
+    on public.branch_stock (id_product, id_branch);
@@ -0,0 +1,70 @@
+-- Lease used to elect the only worker that runs the scheduled jobs.
+-- A worker owns the lease while it keeps renewing it before it expires,
+-- when the worker dies the lease expires and another worker takes it.
+
+create table if not exists public.scheduler_lease (
+    lease_name text primary key,
+    lease_owner text not null,
+    expires_at timestamptz not null
+);
+
+-- The table is only accessed through the functions below
+alter table public.scheduler_lease enable row level security;
+revoke all on public.scheduler_lease from anon, authenticated;
+
+-- Acquires or renews the lease, returns true when the owner holds it
+create or replace function public.acquire_scheduler_lease(
+    p_lease_name text,
+    p_lease_owner text,
+    p_ttl_seconds integer
+)
+returns boolean
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_owner text;
+begin
+    insert into public.scheduler_lease as l (lease_name, lease_owner, expires_at)
+    values (
+        p_lease_name,
+        p_lease_owner,
+        now() + make_interval(secs => p_ttl_seconds)
+    )
+    on conflict (lease_name) do update
+        set lease_owner = excluded.lease_owner,
+            expires_at = excluded.expires_at
+        where l.lease_owner = excluded.lease_owner
+           or l.expires_at < now()
+    returning l.lease_owner into v_owner;
+
+    return v_owner is not null;
+end;
+$$;
+
+-- Releases the lease when the owner stops, so another worker takes it
+create or replace function public.release_scheduler_lease(
+    p_lease_name text,
+    p_lease_owner text
+)
+returns void
+language sql
+security definer
+set search_path = public
+as $$
+    delete from public.scheduler_lease
+    where lease_name = p_lease_name
+      and lease_owner = p_lease_owner;
+$$;
+
+-- The functions are security definer, only the API with the service role
+-- can take or drop the lease, not the clients with the anon key
+revoke execute on function public.acquire_scheduler_lease(text, text, integer)
+    from public, anon, authenticated;
+revoke execute on function public.release_scheduler_lease(text, text)
+    from public, anon, authenticated;
+grant execute on function public.acquire_scheduler_lease(text, text, integer)
+    to service_role;
+grant execute on function public.release_scheduler_lease(text, text)
+    to service_role;
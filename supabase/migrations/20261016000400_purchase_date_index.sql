@@ -0,0 +1,22 @@
+-- Keyset pagination of the purchases export, ordered by date and id
+create index if not exists purchase_date_id_idx
+    on public.purchase (purchase_date, id_purchase);
+
+-- Branch where the purchase was made, the exports and the analytics of a
+-- branch do not change when its customer moves to another branch.
+-- create_purchase stores it, see 20261016000600_customer_summary.sql
+alter table public.purchase
+    add column if not exists id_branch uuid
+        references public.branch (id_branch) on delete set null;
+
+-- The branch of the past purchases is not known, the current branch of
+-- their customer is the best guess
+update public.purchase p
+set id_branch = c.id_branch
+from public.customer c
+where c.customer_document = p.customer_document
+  and p.id_branch is null;
+
+-- Export of the purchases of a branch, ordered by date and id
+create index if not exists purchase_branch_date_id_idx
+    on public.purchase (id_branch, purchase_date, id_purchase);
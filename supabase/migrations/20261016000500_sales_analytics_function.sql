@@ -0,0 +1,96 @@
+-- Aggregates the purchase lines by branch, product or day in the database,
+-- only the groups are sent to the API. The key of a group can be null (a
+-- purchase without branch or a line without product).
+--
+-- The result is a single jsonb value `{totals, group_count, groups}`, a set
+-- of rows would be cut at the max-rows of PostgREST (1000 on Supabase). The
+-- totals cover every group, the groups are paged with p_skip and p_limit.
+--
+-- The branch is the one where the purchase was made, purchase.id_branch
+-- from 20261016000400_purchase_date_index.sql.
+
+-- The result type changed, the function can not be replaced
+drop function if exists public.sales_analytics(text, date, date, uuid, uuid);
+
+create or replace function public.sales_analytics(
+    p_group_by text,
+    p_start_date date default null,
+    p_end_date date default null,
+    p_id_branch uuid default null,
+    p_id_product uuid default null,
+    p_skip integer default 0,
+    p_limit integer default 1000
+)
+returns jsonb
+language sql
+stable
+as $$
+    with lines as (
+        select
+            case p_group_by
+                when 'branch' then p.id_branch::text
+                when 'product' then pp.id_product::text
+                else p.purchase_date::text
+            end as group_key,
+            case p_group_by
+                when 'branch' then b.branch_name
+                when 'product' then pr.product_name
+                else p.purchase_date::text
+            end as group_label,
+            p.id_purchase,
+            pp.unit_quantity,
+            pp.subtotal_without_vat,
+            pp.total_price_with_vat
+        from public.purchase_product pp
+        join public.purchase p on p.id_purchase = pp.id_purchase
+        left join public.branch b on b.id_branch = p.id_branch
+        left join public.product pr on pr.id_product = pp.id_product
+        where (p_start_date is null or p.purchase_date >= p_start_date)
+          and (p_end_date is null or p.purchase_date <= p_end_date)
+          and (p_id_branch is null or p.id_branch = p_id_branch)
+          and (p_id_product is null or pp.id_product = p_id_product)
+    )
+    groups as (
+        select
+            group_key,
+            group_label,
+            count(distinct id_purchase) as purchase_count,
+            count(*) as line_count,
+            coalesce(sum(unit_quantity), 0) as unit_quantity,
+            coalesce(sum(subtotal_without_vat), 0) as net_total,
+            coalesce(sum(total_price_with_vat - subtotal_without_vat), 0)
+                as vat_total,
+            coalesce(sum(total_price_with_vat), 0) as total
+        from lines
+        group by group_key, group_label
+    ),
+    totals as (
+        select
+            count(distinct id_purchase) as purchase_count,
+            count(*) as line_count,
+            coalesce(sum(unit_quantity), 0) as unit_quantity,
+            coalesce(sum(subtotal_without_vat), 0) as net_total,
+            coalesce(sum(total_price_with_vat - subtotal_without_vat), 0)
+                as vat_total,
+            coalesce(sum(total_price_with_vat), 0) as total
+        from lines
+    ),
+    page as (
+        select *
+        from groups
+        order by group_key nulls last
+        offset p_skip
+        limit p_limit
+    )
+    select jsonb_build_object(
+        'totals', (select to_jsonb(t) from totals t),
+        'group_count', (select count(*) from groups),
+        'groups', coalesce(
+            (
+                select jsonb_agg(to_jsonb(g) order by g.group_key nulls last)
+                from page g
+            ),
+            '[]'::jsonb
+        )
+    );
+$$;
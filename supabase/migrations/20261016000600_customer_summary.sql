@@ -0,0 +1,393 @@
+-- Summary of the purchases of each customer: lifetime total, number of
+-- purchases and the last purchase with its products. create_purchase
+-- updates it in the same transaction, the customer reads use it instead
+-- of loading and summing the purchases.
+--
+-- The purchases changed outside create_purchase are not applied, run
+-- rebuild_customer_summary (python -m app.commands.rebuild_customer_summary)
+-- to recompute it from the purchases.
+
+create table if not exists public.customer_summary (
+    customer_document text primary key
+        references public.customer (customer_document) on delete cascade,
+    lifetime_total numeric not null default 0,
+    purchase_count integer not null default 0,
+    last_purchase_id uuid
+        references public.purchase (id_purchase) on delete set null,
+    last_purchase_total numeric,
+    -- Last purchase with the shape of PurchaseResponse. The date used to
+    -- order the customers is customer.last_purchase_date, kept by trigger
+    last_purchase jsonb,
+    updated_at timestamptz not null default now()
+);
+
+-- Purchase with its products and total, as it is shown to the customer
+create or replace function public.purchase_summary_json(p_id_purchase uuid)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'id_purchase', p.id_purchase,
+        'purchase_date', p.purchase_date,
+        'purchase_duration', p.purchase_duration,
+        'next_purchase_date', p.next_purchase_date,
+        'total_purchase', coalesce(sum(pp.total_price_with_vat), 0),
+        'products', coalesce(
+            jsonb_agg(
+                jsonb_build_object(
+                    'id_product', pp.id_product,
+                    'product_name', pr.product_name,
+                    'unit_quantity', pp.unit_quantity,
+                    'subtotal_without_vat', pp.subtotal_without_vat,
+                    'total_price_with_vat', pp.total_price_with_vat
+                )
+            ) filter (where pp.id_product is not null),
+            '[]'::jsonb
+        )
+    )
+    from public.purchase p
+    left join public.purchase_product pp on pp.id_purchase = p.id_purchase
+    left join public.product pr on pr.id_product = pp.id_product
+    where p.id_purchase = p_id_purchase
+    group by p.id_purchase;
+$$;
+
+-- Adds a new purchase to the summary of its customer. The last purchase
+-- is the one with the greatest (purchase_date, id_purchase), like in
+-- rebuild_customer_summary
+create or replace function public.apply_purchase_to_customer_summary(
+    p_id_purchase uuid
+)
+returns void
+language plpgsql
+as $$
+declare
+    v_purchase jsonb := public.purchase_summary_json(p_id_purchase);
+    v_total numeric := (v_purchase ->> 'total_purchase')::numeric;
+    v_date date := (v_purchase ->> 'purchase_date')::date;
+begin
+    insert into public.customer_summary as s (
+        customer_document,
+        lifetime_total,
+        purchase_count,
+        last_purchase_id,
+        last_purchase_total,
+        last_purchase
+    )
+    select p.customer_document, v_total, 1, p_id_purchase, v_total,
+        v_purchase
+    from public.purchase p
+    where p.id_purchase = p_id_purchase
+    on conflict (customer_document) do update
+    set lifetime_total = s.lifetime_total + excluded.lifetime_total,
+        purchase_count = s.purchase_count + 1,
+        last_purchase_id = case
+            when s.last_purchase_id is null
+                or (v_date, p_id_purchase) > (
+                    (s.last_purchase ->> 'purchase_date')::date,
+                    s.last_purchase_id
+                )
+            then excluded.last_purchase_id else s.last_purchase_id end,
+        last_purchase_total = case
+            when s.last_purchase_id is null
+                or (v_date, p_id_purchase) > (
+                    (s.last_purchase ->> 'purchase_date')::date,
+                    s.last_purchase_id
+                )
+            then excluded.last_purchase_total else s.last_purchase_total end,
+        last_purchase = case
+            when s.last_purchase_id is null
+                or (v_date, p_id_purchase) > (
+                    (s.last_purchase ->> 'purchase_date')::date,
+                    s.last_purchase_id
+                )
+            then excluded.last_purchase else s.last_purchase end,
+        updated_at = now();
+end;
+$$;
+
+-- Recomputes the summary from the purchases, of one customer or of all
+-- of them when the document is null. Returns the number of summaries.
+create or replace function public.rebuild_customer_summary(
+    p_customer_document text default null
+)
+returns integer
+language plpgsql
+as $$
+declare
+    v_count integer;
+begin
+    -- The customers left without purchases have no summary
+    delete from public.customer_summary s
+    where (p_customer_document is null
+           or s.customer_document = p_customer_document)
+      and not exists (
+          select 1
+          from public.purchase p
+          where p.customer_document = s.customer_document
+      );
+
+    -- The summaries are replaced in place, two rebuilds of the same
+    -- customer wait on its row instead of failing on the primary key
+    insert into public.customer_summary (
+        customer_document,
+        lifetime_total,
+        purchase_count,
+        last_purchase_id,
+        last_purchase_total,
+        last_purchase
+    )
+    select
+        totals.customer_document,
+        totals.lifetime_total,
+        totals.purchase_count,
+        last.id_purchase,
+        (last.summary ->> 'total_purchase')::numeric,
+        last.summary
+    from (
+        select
+            p.customer_document,
+            coalesce(sum(pp.total_price_with_vat), 0) as lifetime_total,
+            count(distinct p.id_purchase) as purchase_count
+        from public.purchase p
+        left join public.purchase_product pp on pp.id_purchase = p.id_purchase
+        where p_customer_document is null
+           or p.customer_document = p_customer_document
+        group by p.customer_document
+    ) totals
+    cross join lateral (
+        select
+            p.id_purchase,
+            p.purchase_date,
+            public.purchase_summary_json(p.id_purchase) as summary
+        from public.purchase p
+        where p.customer_document = totals.customer_document
+        order by p.purchase_date desc, p.id_purchase desc
+        limit 1
+    ) last
+    on conflict (customer_document) do update
+    set lifetime_total = excluded.lifetime_total,
+        purchase_count = excluded.purchase_count,
+        last_purchase_id = excluded.last_purchase_id,
+        last_purchase_total = excluded.last_purchase_total,
+        last_purchase = excluded.last_purchase,
+        updated_at = now();
+
+    get diagnostics v_count = row_count;
+    return v_count;
+end;
+$$;
+
+-- The summary functions are only called by the API with the service
+-- role, not by the clients with the anon key
+revoke execute on function public.apply_purchase_to_customer_summary(uuid)
+    from public, anon, authenticated;
+revoke execute on function public.rebuild_customer_summary(text)
+    from public, anon, authenticated;
+grant execute on function public.apply_purchase_to_customer_summary(uuid)
+    to service_role;
+grant execute on function public.rebuild_customer_summary(text)
+    to service_role;
+
+-- Backfill with the current purchases
+select public.rebuild_customer_summary();
+
+-- create_purchase with the update of the summary, see
+-- 20261016000100_create_purchase_function.sql
+create or replace function public.create_purchase(payload jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_customer_document text := payload ->> 'customer_document';
+    v_id_branch uuid := (payload ->> 'id_branch')::uuid;
+    v_customer_state boolean;
+    v_purchase public.purchase%rowtype;
+    v_payment public.payment%rowtype;
+    v_delivery public.delivery%rowtype;
+    v_product record;
+    v_line jsonb;
+    v_quantity integer;
+    v_products jsonb := '[]'::jsonb;
+begin
+    -- 1. Validate the customer data
+    select customer_state into v_customer_state
+    from public.customer
+    where customer_document = v_customer_document;
+
+    if not found then
+        raise exception 'Customer data is invalid for customer with document %',
+            v_customer_document
+            using errcode = 'P0002';
+    end if;
+
+    if not v_customer_state then
+        raise exception 'Customer inactive. Document %', v_customer_document
+            using errcode = 'P0001';
+    end if;
+
+    -- 2. Validate if the branch is valid and exists
+    perform 1 from public.branch where id_branch = v_id_branch;
+    if not found then
+        raise exception 'Branch with id % does not exist', v_id_branch
+            using errcode = 'P0002';
+    end if;
+
+    if (payload ->> 'remaining_balance')::numeric < 0 then
+        raise exception 'Remaining balance cannot be negative'
+            using errcode = 'P0001';
+    end if;
+
+    -- 3. Create the purchase record
+    insert into public.purchase (
+        customer_document,
+        id_branch,
+        purchase_date,
+        purchase_duration,
+        next_purchase_date
+    )
+    values (
+        v_customer_document,
+        v_id_branch,
+        (payload ->> 'purchase_date')::date,
+        (payload ->> 'purchase_duration')::integer,
+        (payload ->> 'purchase_date')::date
+            + (payload ->> 'purchase_duration')::integer
+    )
+    returning * into v_purchase;
+
+    -- 4. Validate each product, decrement its stock and add the line
+    for v_line in select * from jsonb_array_elements(payload -> 'products')
+    loop
+        v_quantity := (v_line ->> 'unit_quantity')::integer;
+
+        select id_product, sale_price, vat, product_state into v_product
+        from public.product
+        where id_product = (v_line ->> 'id_product')::uuid;
+
+        if not found then
+            raise exception 'Product not found %', v_line ->> 'id_product'
+                using errcode = 'P0002';
+        end if;
+
+        if not v_product.product_state then
+            raise exception 'Product is inactive %', v_product.id_product
+                using errcode = 'P0001';
+        end if;
+
+        if v_product.vat <= 0 then
+            raise exception 'Invalid VAT for product %, VAT must be greater than 0',
+                v_product.id_product
+                using errcode = 'P0001';
+        end if;
+
+        -- The condition on the quantity makes the check and the decrement
+        -- atomic, concurrent sales can not leave a negative stock
+        update public.branch_stock
+        set quantity = quantity - v_quantity
+        where id_branch = v_id_branch
+          and id_product = v_product.id_product
+          and quantity >= v_quantity;
+
+        if not found then
+            raise exception 'Product with id % does not have enough stock',
+                v_product.id_product
+                using errcode = 'P0001';
+        end if;
+
+        insert into public.purchase_product (
+            id_purchase,
+            id_product,
+            unit_quantity,
+            subtotal_without_vat,
+            total_price_with_vat
+        )
+        values (
+            v_purchase.id_purchase,
+            v_product.id_product,
+            v_quantity,
+            v_product.sale_price * v_quantity,
+            v_product.sale_price * v_quantity * (1 + (v_product.vat / 100))
+        )
+        returning v_products || jsonb_build_object(
+            'id_product', id_product,
+            'unit_quantity', unit_quantity,
+            'subtotal_without_vat', subtotal_without_vat,
+            'total_price_with_vat', total_price_with_vat
+        ) into v_products;
+    end loop;
+
+    -- 5. Record the payment, the enums are read from the payload
+    insert into public.payment (
+        id_purchase,
+        payment_type,
+        payment_status,
+        remaining_balance
+    )
+    select
+        v_purchase.id_purchase,
+        p.payment_type,
+        p.payment_status,
+        p.remaining_balance
+    from jsonb_populate_record(null::public.payment, payload) p
+    returning * into v_payment;
+
+    -- 6. Record the delivery (if applicable)
+    if payload ->> 'delivery_type' is not null then
+        insert into public.delivery (
+            id_purchase,
+            delivery_type,
+            delivery_status,
+            delivery_cost,
+            delivery_comment
+        )
+        select
+            v_purchase.id_purchase,
+            d.delivery_type,
+            'Sin Preparar',
+            d.delivery_cost,
+            d.delivery_comment
+        from jsonb_populate_record(null::public.delivery, payload) d
+        returning * into v_delivery;
+    end if;
+
+    -- 7. Create the customer service follow-up of the purchase
+    insert into public.customer_service (
+        id_purchase,
+        service_date,
+        next_contact_date,
+        customer_service_status
+    )
+    values (
+        v_purchase.id_purchase,
+        v_purchase.purchase_date,
+        v_purchase.next_purchase_date,
+        true
+    );
+
+    -- 8. Add the purchase to the summary of the customer
+    perform public.apply_purchase_to_customer_summary(v_purchase.id_purchase);
+
+    -- 9. Build the response
+    return jsonb_build_object(
+        'id_purchase', v_purchase.id_purchase,
+        'customer_document', v_purchase.customer_document,
+        'id_branch', v_purchase.id_branch,
+        'purchase_date', v_purchase.purchase_date,
+        'purchase_duration', v_purchase.purchase_duration,
+        'next_purchase_date', v_purchase.next_purchase_date,
+        'products', v_products,
+        'payment', to_jsonb(v_payment),
+        'delivery', case
+            when v_delivery.id_delivery is not null then to_jsonb(v_delivery)
+        end
+    );
+end;
+$$;
+
+-- The purchases are only created by the API with the service role, after
+-- it verifies the user, not by the clients with the anon key
+revoke execute on function public.create_purchase(jsonb)
+    from public, anon, authenticated;
+grant execute on function public.create_purchase(jsonb) to service_role;
@@ -0,0 +1,60 @@
+-- Search of the customers with trigrams, it is used when the search index
+-- of the API is not loaded yet. A single column with every searchable
+-- field is indexed, so each word of the search is one indexed ilike. The
+-- accents are removed, the API removes them from the words too.
+
+create extension if not exists pg_trgm;
+create extension if not exists unaccent;
+
+-- unaccent is only stable because the dictionary can change, the
+-- generated column needs an immutable function with a fixed dictionary
+create or replace function public.immutable_unaccent(value text)
+returns text
+language sql
+immutable
+parallel safe
+strict
+as $$
+    select public.unaccent('public.unaccent'::regdictionary, value);
+$$;
+
+alter table public.customer
+    add column if not exists search_text text
+    generated always as (
+        public.immutable_unaccent(lower(
+            coalesce(customer_document, '') || ' ' ||
+            coalesce(customer_first_name, '') || ' ' ||
+            coalesce(customer_last_name, '') || ' ' ||
+            coalesce(email, '') || ' ' ||
+            coalesce(phone_number, '') || ' ' ||
+            coalesce(home_address, '')
+        ))
+    ) stored;
+
+create index if not exists customer_search_text_trgm_idx
+    on public.customer using gin (search_text gin_trgm_ops);
+
+-- Last change of each customer, the search index of the API only reads
+-- the customers changed since its last refresh. The trigger of the
+-- purchases changes `last_purchase_date`, so a purchase changes it too
+alter table public.customer
+    add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists customer_updated_at_idx
+    on public.customer (updated_at);
+
+create or replace function public.set_customer_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists customer_set_updated_at on public.customer;
+
+create trigger customer_set_updated_at
+before update on public.customer
+for each row execute function public.set_customer_updated_at();
@@ -0,0 +1,54 @@
+import os
+
+# The settings are read when the app modules are imported, the tests run
+# without the .env of the project and without network
+for name, value in {
+    "SUPABASE_URL": "http://localhost",
+    "SUPABASE_KEY": "local.database",
+    "SUPABASE_ROLE_KEY": "local.database",
+    "ALLOWED_CORS": '["*"]',
+    "EMAIL_ADMIN": "admin@example.com",
+    "EMAIL_USERNAME": "",
+    "EMAIL_PASSWORD": "",
+    "EMAIL_TO": "team@example.com",
+    "SUPABASE_BACKEND": "local",
+    "REQUEST_TIMING_LOG": "false",
+}.items():
+    os.environ.setdefault(name, value)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.persistence.db.connection import use_local_database  # noqa: E402
+from app.persistence.db.local import seed  # noqa: E402
+from app.persistence.db.local.database import LocalDatabase  # noqa: E402
+
+# The repositories keep the client they got, the local database is set
+# before the tests import the app
+DATABASE = use_local_database()
+
+from app.api.authentication import verify_user  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def database() -> LocalDatabase:
+    """
+    Project database shared by the tests. The branch stock and the
+    customers are over the 1000 rows of a PostgREST page.
+    """
+    seed.seed(
+        DATABASE,
+        branches=5,
+        products=250,
+        customers=1200,
+        purchases_per_customer=1,
+    )
+    return DATABASE
+
+
+@pytest.fixture(scope="session")
+def client(database: LocalDatabase) -> TestClient:  # noqa: ARG001
+    """Client of the API without authentication, the startup is not run."""
+    app.dependency_overrides[verify_user] = lambda: None
+    return TestClient(app)
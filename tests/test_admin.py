@@ -0,0 +1,33 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.api.admin import verify_admin
+from app.persistence.db.local.database import LocalDatabase
+from app.persistence.repositories.reference_data import (
+    ReferenceDataRepository,
+)
+
+
+def test_invalidate_reference_data(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    client.app.dependency_overrides[verify_admin] = lambda: None
+    reference_data = ReferenceDataRepository()
+    branch = next(iter(database.table("branch").rows.values()))
+    asyncio.run(reference_data.get_branch(branch["id_branch"]))
+    database.update("branch", branch, {"branch_name": "Sede renombrada"})
+
+    try:
+        response = client.delete("/v1/admin/reference-data/cache")
+
+        assert response.status_code == 204
+        cached = asyncio.run(reference_data.get_branch(branch["id_branch"]))
+        assert cached.branch_name == "Sede renombrada"
+    finally:
+        del client.app.dependency_overrides[verify_admin]
+        database.update(
+            "branch",
+            database.table("branch").get(branch["id_branch"]),
+            {"branch_name": branch["branch_name"]},
+        )
@@ -0,0 +1,154 @@
+from collections.abc import Iterator
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.persistence.db.local.database import LocalDatabase
+from app.persistence.repositories.analytics import (
+    AnalyticsRepository,
+    WindowCache,
+)
+
+# Window of the seeded purchases, the purchases of the other tests are
+# made today
+WINDOW = {"start_date": "2024-01-01", "end_date": "2025-12-31"}
+
+
+@pytest.fixture
+def purchase_without_branch(database: LocalDatabase) -> Iterator[dict]:
+    """A purchase without branch, its group key is null."""
+    purchase = next(
+        row
+        for row in database.table("purchase").rows.values()
+        if row["purchase_date"] <= WINDOW["end_date"]
+    )
+    yield database.update("purchase", purchase, {"id_branch": None})
+    # The update replaces the row, the current one is restored
+    database.update(
+        "purchase",
+        database.table("purchase").get(purchase["id_purchase"]),
+        {"id_branch": purchase["id_branch"]},
+    )
+
+
+def test_sales_by_branch_with_a_null_key(
+    client: TestClient,
+    database: LocalDatabase,
+    purchase_without_branch: dict,  # noqa: ARG001
+) -> None:
+    response = client.get(
+        "/v1/analytics/sales", params={"group_by": "branch", **WINDOW}
+    )
+
+    assert response.status_code == 200
+    sales = response.json()
+    keys = [group["key"] for group in sales["groups"]]
+    assert None in keys
+    assert len(keys) == len(database.table("branch").rows) + 1
+    lines = [
+        line
+        for line in database.table("purchase_product").rows.values()
+        if database.table("purchase").get(line["id_purchase"])[
+            "purchase_date"
+        ]
+        <= WINDOW["end_date"]
+    ]
+    assert sales["totals"]["line_count"] == len(lines)
+    assert sales["totals"]["total"] == pytest.approx(
+        sum(line["total_price_with_vat"] for line in lines)
+    )
+    assert sales["totals"]["total"] == pytest.approx(
+        sum(group["total"] for group in sales["groups"])
+    )
+
+
+def test_sales_by_branch_ignore_the_customer_branch(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    params = {"group_by": "branch", **WINDOW}
+    # The closed windows are cached, the sales are read again every time
+    AnalyticsRepository._cache.clear()  # noqa: SLF001
+    before = client.get("/v1/analytics/sales", params=params).json()
+    purchase = next(
+        row
+        for row in database.table("purchase").rows.values()
+        if row["purchase_date"] <= WINDOW["end_date"]
+    )
+    customer = database.table("customer").get(purchase["customer_document"])
+    other_branch = next(
+        row["id_branch"]
+        for row in database.table("branch").rows.values()
+        if row["id_branch"] != customer["id_branch"]
+    )
+    # The customer moves to another branch, its past sales stay in place
+    database.update("customer", customer, {"id_branch": other_branch})
+    try:
+        AnalyticsRepository._cache.clear()  # noqa: SLF001
+        after = client.get("/v1/analytics/sales", params=params).json()
+    finally:
+        database.update(
+            "customer",
+            database.table("customer").get(customer["customer_document"]),
+            {"id_branch": customer["id_branch"]},
+        )
+
+    assert after["groups"] == before["groups"]
+
+
+def test_sales_by_day_over_max_rows(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    max_rows = database.max_rows
+    # More days with sales than rows in a PostgREST response
+    database.max_rows = 50
+    AnalyticsRepository._cache.clear()  # noqa: SLF001
+    try:
+        sales = client.get(
+            "/v1/analytics/sales", params={"group_by": "day"}
+        ).json()
+        page = client.get(
+            "/v1/analytics/sales",
+            params={"group_by": "day", "skip": 100, "limit": 20},
+        ).json()
+    finally:
+        database.max_rows = max_rows
+
+    lines = database.table("purchase_product").rows.values()
+    days = {
+        database.table("purchase").get(line["id_purchase"])["purchase_date"]
+        for line in lines
+    }
+    assert sales["group_count"] == len(days) > 50  # noqa: PLR2004
+    assert len(sales["groups"]) == len(days)
+    assert sales["totals"]["line_count"] == len(lines)
+    assert sales["totals"]["total"] == pytest.approx(
+        sum(line["total_price_with_vat"] for line in lines)
+    )
+    assert page["group_count"] == len(days)
+    assert page["groups"] == sales["groups"][100:120]
+    assert page["totals"] == sales["totals"]
+
+
+def test_sales_rejects_an_inverted_window(client: TestClient) -> None:
+    response = client.get(
+        "/v1/analytics/sales",
+        params={"start_date": "2025-01-02", "end_date": "2025-01-01"},
+    )
+
+    assert response.status_code == 400
+
+
+def test_window_cache_is_bounded() -> None:
+    cache = WindowCache(ttl=60, closed_ttl=0, max_size=2)
+
+    cache.set(("closed",), "closed window", date(2024, 1, 31))
+    # The closed window expires too
+    assert cache.get(("closed",)) is None
+
+    for key in ("a", "b", "c"):
+        cache.set((key,), key, None)
+
+    # The least recently used is evicted
+    assert cache.get(("a",)) is None
+    assert [cache.get(("b",)), cache.get(("c",))] == ["b", "c"]
@@ -0,0 +1,258 @@
+import asyncio
+import base64
+import json
+import time
+from collections.abc import Iterator
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from gotrue import User
+from gotrue.errors import AuthApiError
+
+from app.api import authentication as authentication_api
+from app.core.config import settings
+from app.models.authentication import UserResponse
+from app.persistence.repositories.authentication import (
+    AuthenticationRepository,
+)
+from app.services.authentication import (
+    AuthenticationService,
+    _verify_token,
+    verify_user,
+)
+from app.utils import authentication
+from app.utils.authentication import TokenCache, hash_token, token_cache
+
+SECRET = "local-jwt-secret-of-the-tests-32b"
+
+
+class RemoteAuth:
+    """Auth of the client, counts the tokens verified remotely."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def get_user(self, token: str) -> UserResponse:
+        self.calls += 1
+        claims = jwt.decode(token, options={"verify_signature": False})
+        return UserResponse(
+            user=User(
+                id=claims["sub"],
+                aud=claims["aud"],
+                app_metadata={},
+                user_metadata={},
+                created_at="2025-01-01T00:00:00Z",
+            )
+        )
+
+
+class RemoteClient:
+    def __init__(self) -> None:
+        self.auth = RemoteAuth()
+
+
+class AdminAuth:
+    """Admin API of the auth client, records the calls it gets."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, dict]] = []
+
+    async def create_user(self, attributes: dict) -> None:
+        self.calls.append(("create_user", attributes))
+        msg = "A user with this email address has already been registered"
+        raise AuthApiError(msg, 422, "email_exists")
+
+    async def list_users(self, **params: object) -> list[User]:
+        self.calls.append(("list_users", params))
+        return []
+
+
+class AdminClient:
+    def __init__(self) -> None:
+        self.auth = SimpleNamespace(admin=AdminAuth())
+
+
+@pytest.fixture(autouse=True)
+def jwt_secret(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    monkeypatch.setattr(settings, "supabase_jwt_secret", SECRET)
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+@pytest.fixture
+def admin_auth(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[AdminAuth]:
+    """Admin API of the auth client, the request is made by the admin."""
+    admin_client = AdminClient()
+    monkeypatch.setattr(
+        authentication_api.service.repository, "admin_supabase", admin_client
+    )
+    admin = UserResponse(
+        user=User(
+            id=claims()["sub"],
+            aud="authenticated",
+            email=settings.email_admin,
+            app_metadata={},
+            user_metadata={},
+            created_at="2025-01-01T00:00:00Z",
+        )
+    )
+    overrides = client.app.dependency_overrides
+    anonymous = overrides[verify_user]
+    overrides[verify_user] = lambda: admin
+    yield admin_client.auth.admin
+    overrides[verify_user] = anonymous
+
+
+def claims(**changes: object) -> dict:
+    return {
+        "sub": "c0a80121-7ac0-4e1c-8f6a-000000000001",
+        "aud": "authenticated",
+        "email": "user@example.com",
+        "role": "authenticated",
+        "iat": int(time.time()),
+        "exp": int(time.time()) + 3600,
+        **changes,
+    }
+
+
+def token(key: str = SECRET, **changes: object) -> str:
+    return jwt.encode(claims(**changes), key, algorithm="HS256")
+
+
+def unsigned_token(header: dict, payload: dict) -> str:
+    """Token with any header, the signature is never checked locally."""
+
+    def encode(value: dict) -> str:
+        data = json.dumps(value).encode()
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+    return f"{encode(header)}.{encode(payload)}.c2lnbmF0dXJl"
+
+
+def verify(access_token: str, client: RemoteClient | None = None) -> User:
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=access_token
+    )
+    response = asyncio.run(_verify_token(client or RemoteClient(), credentials))
+    return response.user
+
+
+def test_valid_token_is_verified_locally() -> None:
+    client = RemoteClient()
+
+    user = verify(token(), client)
+
+    assert user.email == "user@example.com"
+    assert client.auth.calls == 0
+    assert token_cache.get(hash_token(token())) is not None
+
+
+@pytest.mark.parametrize(
+    "access_token",
+    [
+        pytest.param(token(exp=int(time.time()) - 10), id="expired"),
+        pytest.param(token(aud="anon"), id="wrong audience"),
+        pytest.param(
+            token(key="another-secret-of-the-tests-32b"), id="bad signature"
+        ),
+    ],
+)
+def test_invalid_token_is_rejected(access_token: str) -> None:
+    client = RemoteClient()
+
+    with pytest.raises(HTTPException) as error:
+        verify(access_token, client)
+
+    assert error.value.status_code == 401
+    assert client.auth.calls == 0
+    assert token_cache.get(hash_token(access_token)) is None
+
+
+def test_unknown_kid_is_verified_remotely(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def get_signing_key(kid: str) -> None:
+        msg = f'Unable to find a signing key that matches: "{kid}"'
+        raise jwt.PyJWKClientError(msg)
+
+    monkeypatch.setattr(
+        authentication.jwks_client, "get_signing_key", get_signing_key
+    )
+    client = RemoteClient()
+    access_token = unsigned_token({"alg": "RS256", "kid": "unknown"}, claims())
+
+    user = verify(access_token, client)
+
+    assert user.id == claims()["sub"]
+    assert client.auth.calls == 1
+    # The user verified remotely is cached too
+    verify(access_token, client)
+    assert client.auth.calls == 1
+
+
+def test_cache_ttl_is_bounded_by_the_token_exp() -> None:
+    cache = TokenCache(ttl=300)
+    user = UserResponse(user=verify(token()))
+
+    cache.set("expiring", user, time.time() + 5)
+    cache.set("expired", user, time.time() - 1)
+
+    expires_at, _ = cache._items["expiring"]  # noqa: SLF001
+    assert expires_at - time.monotonic() <= 5  # noqa: PLR2004
+    assert cache.get("expired") is None
+
+
+def test_logged_out_token_is_rejected(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def logout_user(*_: object, **__: object) -> bool:
+        return True
+
+    monkeypatch.setattr(AuthenticationRepository, "logout_user", logout_user)
+    access_token = token()
+    verify(access_token)
+
+    asyncio.run(AuthenticationService().logout_user(access_token))
+
+    with pytest.raises(HTTPException) as error:
+        verify(access_token)
+    assert error.value.status_code == 401
+    assert "logged out" in error.value.detail
+
+
+def test_registered_email_is_a_conflict(
+    client: TestClient, admin_auth: AdminAuth
+) -> None:
+    response = client.post(
+        "/v1/auth/create-user",
+        json={
+            "email": "user@example.com",
+            "password": "A-strong-password-1",
+            "role": "usuario-cali",
+        },
+    )
+
+    assert response.status_code == 409  # noqa: PLR2004
+    assert "user@example.com" in response.json()["detail"]
+    # The user is created directly, the existing users are not listed
+    assert [name for name, _ in admin_auth.calls] == ["create_user"]
+
+
+def test_users_are_listed_by_page(
+    client: TestClient, admin_auth: AdminAuth
+) -> None:
+    default = client.get("/v1/auth/users")
+    paged = client.get("/v1/auth/users", params={"page": 3, "per_page": 20})
+
+    assert default.status_code == paged.status_code == 200  # noqa: PLR2004
+    assert admin_auth.calls == [
+        ("list_users", {"page": 1, "per_page": 50}),
+        ("list_users", {"page": 3, "per_page": 20}),
+    ]
@@ -0,0 +1,196 @@
+import asyncio
+import gzip
+import zlib
+
+import brotli
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware, select_encoding
+from app.utils.etag import conditional_response
+
+BIG_BODY = {"rows": [{"name": f"Producto {n}"} for n in range(200)]}
+NDJSON_LINES = [f'{{"row": {n}, "name": "Producto {n}"}}\n' for n in range(3)]
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+    app.state.version = 1
+
+    @app.get("/big")
+    def big(request: Request) -> Response:
+        return conditional_response(request, BIG_BODY, '"big"')
+
+    @app.get("/small")
+    def small(request: Request) -> Response:
+        return conditional_response(request, {"ok": True})
+
+    @app.get("/versioned")
+    def versioned() -> Response:
+        # The handler reuses the ETag for another body
+        return JSONResponse(
+            {**BIG_BODY, "version": app.state.version},
+            headers={"ETag": '"versioned"'},
+        )
+
+    @app.get("/stream")
+    def stream() -> StreamingResponse:
+        return StreamingResponse(
+            iter(NDJSON_LINES), media_type="application/x-ndjson"
+        )
+
+    return app
+
+
+@pytest.fixture
+def app() -> FastAPI:
+    return build_app()
+
+
+@pytest.fixture
+def client(app: FastAPI) -> TestClient:
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        ("gzip", "gzip"),
+        ("br", "br"),
+        ("gzip, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("br;q=0, gzip;q=0.1", "gzip"),
+        ("*", "br"),
+        ("identity", None),
+        ("gzip;q=0, br;q=0", None),
+        ("", None),
+    ],
+)
+def test_select_encoding(accept_encoding: str, expected: str | None) -> None:
+    assert select_encoding(accept_encoding) == expected
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_big_body_is_compressed(client: TestClient, encoding: str) -> None:
+    response = client.get("/big", headers={"Accept-Encoding": encoding})
+
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"big"'
+    assert response.json() == BIG_BODY
+
+
+def test_identity_and_small_bodies_are_not_compressed(
+    client: TestClient,
+) -> None:
+    identity = client.get("/big", headers={"Accept-Encoding": "identity"})
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    for response in (identity, small):
+        assert "content-encoding" not in response.headers
+    assert identity.headers["etag"] == '"big"'
+    assert identity.json() == BIG_BODY
+
+
+@pytest.mark.parametrize(
+    ("encoding", "etag"), [("gzip", 'W/"big"'), ("identity", '"big"')]
+)
+def test_not_modified_varies_on_the_encoding(
+    client: TestClient, encoding: str, etag: str
+) -> None:
+    response = client.get(
+        "/big",
+        headers={"Accept-Encoding": encoding, "If-None-Match": 'W/"big"'},
+    )
+
+    assert response.status_code == 304
+    assert response.headers["vary"] == "Accept-Encoding"
+    # The same ETag of the 200 for this encoding
+    assert response.headers["etag"] == etag
+
+
+def test_cache_is_keyed_by_the_body(
+    app: FastAPI, client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    compressed = []
+    compress = gzip.compress
+
+    def counted_compress(body: bytes, **kwargs: object) -> bytes:
+        compressed.append(body)
+        return compress(body, **kwargs)
+
+    monkeypatch.setattr(compression.gzip, "compress", counted_compress)
+    headers = {"Accept-Encoding": "gzip"}
+
+    first = client.get("/versioned", headers=headers)
+    again = client.get("/versioned", headers=headers)
+    app.state.version = 2
+    changed = client.get("/versioned", headers=headers)
+
+    assert first.json()["version"] == again.json()["version"] == 1
+    # The same ETag with another body is not served from the cache
+    assert changed.json()["version"] == 2  # noqa: PLR2004
+    assert len(compressed) == 2  # noqa: PLR2004
+
+
+def stream_messages(app: FastAPI, encoding: str) -> list[dict]:
+    """Messages sent by the app, the streamed chunks are not joined."""
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive() -> dict:
+        if requests:
+            return requests.pop()
+        # The client stays connected until the response ends
+        await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/stream",
+        "raw_path": b"/stream",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"accept-encoding", encoding.encode())],
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_streamed_chunks_are_flushed(app: FastAPI, encoding: str) -> None:
+    start, *bodies = stream_messages(app, encoding)
+    headers = dict(start["headers"])
+
+    assert headers[b"content-encoding"] == encoding.encode()
+    assert b"content-length" not in headers
+    decompressor = (
+        brotli.Decompressor()
+        if encoding == "br"
+        else zlib.decompressobj(zlib.MAX_WBITS | 16)
+    )
+    decompress = (
+        decompressor.process
+        if encoding == "br"
+        else decompressor.decompress
+    )
+    # Every line can be read by the client as soon as its chunk arrives
+    received = [decompress(message["body"]) for message in bodies]
+    assert received[: len(NDJSON_LINES)] == [
+        line.encode() for line in NDJSON_LINES
+    ]
+    assert b"".join(received) == "".join(NDJSON_LINES).encode()
+    assert bodies[-1]["more_body"] is False
@@ -0,0 +1,88 @@
+import json
+from collections.abc import AsyncIterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models.customer import Customer
+from app.persistence.db.local.database import LocalDatabase
+from app.persistence.repositories.customer import CustomerRepository
+
+
+def expected_order(database: LocalDatabase) -> list[str]:
+    """Documents by last purchase date, most recent first, nulls last."""
+    customers = sorted(
+        database.table("customer").rows.values(),
+        key=lambda row: row["customer_document"],
+    )
+    # The sort is stable, the documents stay ascending within a date
+    customers.sort(
+        key=lambda row: row.get("last_purchase_date") or "", reverse=True
+    )
+    return [row["customer_document"] for row in customers]
+
+
+def test_cursor_pages_follow_the_order(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    documents, after = [], None
+    while True:
+        params = {"limit": 500} | ({"after": after} if after else {})
+        response = client.get("/v1/customer/customers", params=params)
+        assert response.status_code == 200
+        documents += [row["customer_document"] for row in response.json()]
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+
+    assert documents == expected_order(database)
+
+
+def test_skip_page_matches_the_cursor_page(client: TestClient) -> None:
+    first = client.get("/v1/customer/customers", params={"limit": 300})
+    second = client.get(
+        "/v1/customer/customers",
+        params={"limit": 300, "after": first.headers["X-Next-Cursor"]},
+    )
+    skipped = client.get(
+        "/v1/customer/customers", params={"limit": 300, "skip": 300}
+    )
+
+    assert second.json() == skipped.json()
+
+
+def test_export_streams_every_customer_once(
+    client: TestClient,
+    database: LocalDatabase,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    chunks = []
+    iter_customers = CustomerRepository.iter_customers
+
+    async def counted_iter_customers(
+        repository: CustomerRepository, chunk_size: int = 500
+    ) -> AsyncIterator[list[Customer]]:
+        async for customers in iter_customers(repository, chunk_size):
+            chunks.append(len(customers))
+            yield customers
+
+    monkeypatch.setattr(
+        CustomerRepository, "iter_customers", counted_iter_customers
+    )
+
+    with client.stream("GET", "/v1/customer/export") as response:
+        assert response.status_code == 200  # noqa: PLR2004
+        assert response.headers["content-type"] == "application/x-ndjson"
+        documents = [
+            json.loads(line)["customer_document"]
+            for line in response.iter_lines()
+            if line
+        ]
+
+    # Every chunk continues after the last document of the previous one
+    assert len(chunks) > 1
+    assert sum(chunks) == len(documents)
+    assert documents == sorted(
+        row["customer_document"]
+        for row in database.table("customer").rows.values()
+    )
@@ -0,0 +1,149 @@
+import asyncio
+from collections.abc import Iterator
+from datetime import timedelta
+
+import pytest
+
+from app.persistence.db.local.database import LocalDatabase
+from app.persistence.repositories import customer_search
+from app.persistence.repositories.customer import CustomerRepository
+from app.persistence.repositories.customer_search import (
+    CustomerSearchIndex,
+    TrigramIndex,
+    date_key,
+)
+
+
+def customer(
+    document: str, first_name: str, last_name: str, **row: object
+) -> dict:
+    return {
+        "customer_document": document,
+        "customer_first_name": first_name,
+        "customer_last_name": last_name,
+        "phone_number": None,
+        "email": None,
+        "home_address": None,
+        "last_purchase_date": None,
+        **row,
+    }
+
+
+@pytest.fixture
+def index() -> TrigramIndex:
+    index = TrigramIndex()
+    for row in (
+        customer("1", "Mariana", "Ruiz", last_purchase_date="2026-01-01"),
+        customer("2", "Anabel", "Torres"),
+        customer("3", "Ana", "Gómez"),
+        customer("4", "Juliana", "Ospina", last_purchase_date="2026-03-01"),
+        customer("5", "Pedro", "Díaz"),
+    ):
+        index.upsert(row)
+    return index
+
+
+def test_exact_word_ranks_before_prefix_and_substring(
+    index: TrigramIndex,
+) -> None:
+    # Exact name, then the prefix, then the most recent purchase first
+    assert index.search("ana", 10) == ["3", "2", "4", "1"]
+    assert index.search("ana", 2) == ["3", "2"]
+
+
+def test_search_ignores_accents_and_case(index: TrigramIndex) -> None:
+    assert index.search("GOMEZ", 10) == ["3"]
+    assert index.search("díaz pedro", 10) == ["5"]
+    assert index.search("ana diaz", 10) == []
+
+
+def test_short_tokens_only_match_the_start_of_the_words(
+    index: TrigramIndex,
+) -> None:
+    # Both names start with the token, the document breaks the tie
+    assert index.search("an", 10) == ["2", "3"]
+    assert index.search("a", 10) == ["2", "3"]
+    assert index.search("ru", 10) == ["1"]
+
+
+def test_upsert_replaces_the_customer(index: TrigramIndex) -> None:
+    index.upsert(customer("3", "Lucía", "Gómez"))
+
+    assert index.search("ana", 10) == ["2", "4", "1"]
+    assert index.search("lucia", 10) == ["3"]
+    assert len(index) == 5  # noqa: PLR2004
+
+
+def test_purchase_moves_the_customer_first(index: TrigramIndex) -> None:
+    index.set_last_purchase_date("1", "2026-06-01")
+    # An older purchase does not move the customer back
+    index.set_last_purchase_date("1", "2025-01-01")
+
+    assert index.search("iana", 10) == ["1", "4"]
+    assert index._entries[0][2] == date_key("2026-06-01")  # noqa: SLF001
+
+
+@pytest.fixture
+def accented_customer(database: LocalDatabase) -> Iterator[dict]:
+    id_branch = next(iter(database.table("branch").rows))[0]
+    row = database.insert(
+        "customer",
+        customer(
+            "search-0001",
+            "Zoë",
+            "Ibáñez Quintána",
+            phone_number="3000000000",
+            email="zoe@example.com",
+            document_type="CC",
+            customer_state=True,
+            id_branch=id_branch,
+        ),
+    )
+    yield row
+    database.delete("customer", row)
+
+
+def test_cold_search_ignores_accents(
+    accented_customer: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    search_index = CustomerSearchIndex()
+    monkeypatch.setattr(search_index, "_index", None)
+    monkeypatch.setattr(search_index, "warm_up", lambda: None)
+    repository = CustomerRepository()
+
+    for term in ("ibanez zoe", "IBÁÑEZ", "quintana"):
+        customers = asyncio.run(repository.list_all_customers(search=term))
+        assert [c.customer_document for c in customers] == [
+            accented_customer["customer_document"]
+        ]
+
+
+def test_refresh_reads_only_the_changed_customers(
+    database: LocalDatabase, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    search_index = CustomerSearchIndex()
+    asyncio.run(search_index._build())  # noqa: SLF001
+    monkeypatch.setattr(customer_search, "REFRESH_OVERLAP", timedelta(0))
+    # Another worker renames a customer
+    row = next(iter(database.table("customer").rows.values()))
+    database.update("customer", row, {"customer_first_name": "Eustaquia"})
+    upserts = []
+    upsert = TrigramIndex.upsert
+
+    def counted_upsert(index: TrigramIndex, row: dict) -> None:
+        upserts.append(row["customer_document"])
+        upsert(index, row)
+
+    monkeypatch.setattr(TrigramIndex, "upsert", counted_upsert)
+
+    asyncio.run(search_index._refresh())  # noqa: SLF001
+
+    # The customers changed at the time of the build are read again
+    assert row["customer_document"] in upserts
+    assert len(upserts) < 10  # noqa: PLR2004
+    assert search_index.search("eustaquia", 10) == [row["customer_document"]]
+    database.update(
+        "customer",
+        database.table("customer").get(row["customer_document"]),
+        {"customer_first_name": row["customer_first_name"]},
+    )
@@ -0,0 +1,64 @@
+import re
+
+from fastapi.testclient import TestClient
+
+from app.persistence.db.local.database import LocalDatabase
+from app.services.customer_service import PURCHASE_HISTORY_LIMIT
+
+
+def db_calls(response: object) -> int:
+    """Queries of the request, from its `Server-Timing` header."""
+    return int(
+        re.search(r'desc="(\d+) calls"', response.headers["server-timing"])[1]
+    )
+
+
+def test_detail_reads_the_service_once_and_bounds_the_history(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    service = next(iter(database.table("customer_service").rows.values()))
+    purchase = database.table("purchase").get(service["id_purchase"])
+    document = purchase["customer_document"]
+    stock = next(
+        row
+        for row in database.table("branch_stock").rows.values()
+        if row["quantity"] >= PURCHASE_HISTORY_LIMIT
+    )
+    # More purchases than the history of the detail shows
+    for _ in range(PURCHASE_HISTORY_LIMIT):
+        response = client.post(
+            "/v1/purchase/create",
+            json={
+                "customer_document": document,
+                "id_branch": stock["id_branch"],
+                "purchase_duration": 30,
+                "products": [
+                    {"id_product": stock["id_product"], "unit_quantity": 1}
+                ],
+                "payment_type": "Efectivo",
+            },
+        )
+        assert response.status_code == 201  # noqa: PLR2004
+    url = f"/v1/customer-service/get-by-id/{service['id_customer_service']}"
+    # The first request loads the branches of the reference data
+    client.get(url)
+
+    response = client.get(url)
+
+    assert response.status_code == 200  # noqa: PLR2004
+    detail = response.json()
+    assert detail["customer"]["customer_document"] == document
+    assert detail["purchase"]["id_purchase"] == service["id_purchase"]
+    purchases = detail["last_purchases"]["purchases"]
+    assert len(purchases) == PURCHASE_HISTORY_LIMIT
+    dates = [purchase["purchase_date"] for purchase in purchases]
+    assert dates == sorted(dates, reverse=True)
+    # The total includes the purchases that are not in the history
+    summary = database.table("customer_summary").get(document)
+    assert summary["purchase_count"] > PURCHASE_HISTORY_LIMIT
+    assert detail["last_purchases"]["historical_purchases"] == (
+        summary["lifetime_total"]
+    )
+    # The service with its purchase and customer, then the history and the
+    # summary of the customer
+    assert db_calls(response) == 3  # noqa: PLR2004
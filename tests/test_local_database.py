@@ -0,0 +1,30 @@
+from supabase import Client
+
+from app.persistence.db.connection import get_supabase
+from app.persistence.db.local.database import LocalDatabase
+
+
+def test_supabase_connection(database: LocalDatabase) -> None:
+    """The clients of the app answer from the local database."""
+    supabase_client: Client = get_supabase()
+
+    response = supabase_client.table("city").select("*").limit(1).execute()
+
+    assert isinstance(response.data, list)
+    assert database.table("city").get(response.data[0]["id_city"])
+
+
+def test_reads_are_limited_to_max_rows(database: LocalDatabase) -> None:
+    status, headers, body = database.handle(
+        "GET",
+        "customer",
+        [("select", "customer_document")],
+        {"prefer": "count=exact"},
+        None,
+    )
+
+    assert status == 200
+    assert len(body) == database.max_rows
+    assert headers["Content-Range"] == (
+        f"0-{database.max_rows - 1}/{len(database.table('customer').rows)}"
+    )
@@ -0,0 +1,95 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    http_request_duration_seconds,
+)
+from app.persistence.db.local.database import LocalDatabase
+
+TOKEN = "metrics-token-of-the-tests"
+
+
+def test_registry_renders_the_text_format() -> None:
+    registry = MetricsRegistry()
+    errors = registry.register(
+        Counter("errors_total", "Errors.", ("table", "code"))
+    )
+    in_flight = registry.register(Gauge("in_flight", "In flight."))
+    latency = registry.register(
+        Histogram("latency_seconds", "Latency.", ("route",), (0.1, 1.0))
+    )
+    errors.inc("customer", "PGRST116")
+    errors.inc("customer", "PGRST116", amount=2)
+    errors.inc('say "hi"\\', "line\nbreak")
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, "/by-id/{id}")
+
+    assert registry.render() == (
+        "# HELP errors_total Errors.\n"
+        "# TYPE errors_total counter\n"
+        'errors_total{table="customer",code="PGRST116"} 3\n'
+        'errors_total{table="say \\"hi\\"\\\\",code="line\\nbreak"} 1\n'
+        "# HELP in_flight In flight.\n"
+        "# TYPE in_flight gauge\n"
+        "in_flight 1\n"
+        "# HELP latency_seconds Latency.\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{route="/by-id/{id}",le="0.1"} 2\n'
+        'latency_seconds_bucket{route="/by-id/{id}",le="1.0"} 3\n'
+        'latency_seconds_bucket{route="/by-id/{id}",le="+Inf"} 4\n'
+        'latency_seconds_sum{route="/by-id/{id}"} 3.65\n'
+        'latency_seconds_count{route="/by-id/{id}"} 4\n'
+    )
+
+
+def test_route_label_is_the_template(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    ids = list(database.table("product").rows)[:3]
+    for (id_product,) in ids:
+        client.get(f"/v1/product/by-id/{id_product}")
+    for number in range(3):
+        client.get(f"/v1/unknown/{number}")
+
+    routes = {
+        route
+        for _, route, _ in http_request_duration_seconds._values  # noqa: SLF001
+    }
+    # One label per route, not per id nor per unknown path
+    assert "/v1/product/by-id/{id_product}" in routes
+    assert "unmatched" in routes
+    assert not any(
+        id_product in route for (id_product,) in ids for route in routes
+    )
+    assert not any(route.startswith("/v1/unknown") for route in routes)
+
+
+def test_metrics_are_disabled_without_token(client: TestClient) -> None:
+    response = client.get("/metrics")
+
+    assert response.status_code == 403  # noqa: PLR2004
+
+
+def test_metrics_require_the_token(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "metrics_token", TOKEN)
+
+    missing = client.get("/metrics")
+    wrong = client.get("/metrics", headers={"Authorization": "Bearer wrong"})
+    allowed = client.get(
+        "/metrics", headers={"Authorization": f"Bearer {TOKEN}"}
+    )
+
+    assert missing.status_code == wrong.status_code == 401  # noqa: PLR2004
+    assert allowed.status_code == 200  # noqa: PLR2004
+    assert allowed.headers["content-type"].startswith("text/plain")
+    assert "# TYPE http_request_duration_seconds histogram" in allowed.text
@@ -0,0 +1,114 @@
+import uuid
+from collections.abc import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.persistence.db.local.database import LocalDatabase
+
+
+def test_update_product_returns_its_stock(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    id_product = next(iter(database.table("product").rows.values()))[
+        "id_product"
+    ]
+
+    response = client.put(
+        f"/v1/product/update-product/{id_product}",
+        json={"product_name": "Producto actualizado"},
+    )
+
+    assert response.status_code == 200
+    product = response.json()
+    assert product["product_name"] == "Producto actualizado"
+    assert len(product["stock"]) == len(
+        database.table("branch_stock").find("id_product", id_product)
+    )
+    cached = client.get(f"/v1/product/by-id/{id_product}").json()
+    assert cached["product_name"] == "Producto actualizado"
+
+
+def test_update_product_price_and_stock_in_two_calls(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    id_product = list(database.table("product").rows.values())[1]["id_product"]
+    stock = database.table("branch_stock").find("id_product", id_product)
+    id_branch = stock[0]["id_branch"]
+    # Loads the catalog before the update
+    client.get(f"/v1/product/by-id/{id_product}")
+
+    response = client.put(
+        f"/v1/product/update-product/{id_product}",
+        json={
+            "purchase_price": 1000,
+            "sale_price": 1500,
+            "stock": [{"id_branch": id_branch, "quantity": 77}],
+        },
+    )
+
+    assert response.status_code == 200
+    assert '"2 calls"' in response.headers["Server-Timing"]
+    product = response.json()
+    assert product["sale_price"] == 1500
+    assert len(product["stock"]) == len(stock)
+    quantities = {
+        entry["id_branch"]: entry["quantity"] for entry in product["stock"]
+    }
+    assert quantities[id_branch] == 77
+
+
+def test_update_product_stock_only_in_one_call(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    id_product = list(database.table("product").rows.values())[2]["id_product"]
+    stock = database.table("branch_stock").find("id_product", id_product)
+    client.get(f"/v1/product/by-id/{id_product}")
+
+    response = client.put(
+        f"/v1/product/update-product/{id_product}",
+        json={"stock": [{"id_branch": stock[0]["id_branch"], "quantity": 5}]},
+    )
+
+    assert response.status_code == 200
+    assert '"1 calls"' in response.headers["Server-Timing"]
+    assert len(response.json()["stock"]) == len(stock)
+
+
+@pytest.mark.parametrize(
+    "other_branch",
+    [
+        pytest.param(lambda _: str(uuid.uuid4()), id="unknown branch"),
+        pytest.param(lambda id_branch: id_branch, id="repeated branch"),
+    ],
+)
+def test_failed_stock_insert_leaves_no_product(
+    client: TestClient,
+    database: LocalDatabase,
+    other_branch: Callable[[str], str],
+) -> None:
+    (id_branch,) = next(iter(database.table("branch").rows))
+    products = len(database.table("product").rows)
+    stock = len(database.table("branch_stock").rows)
+
+    response = client.post(
+        "/v1/product/create-product",
+        json={
+            "id_supplier": str(uuid.uuid4()),
+            "product_name": "Producto sin stock",
+            "product_description": "El stock de una sede falla",
+            "purchase_price": 1000,
+            "sale_price": 1300,
+            "stock": [
+                {"id_branch": id_branch, "quantity": 5},
+                {"id_branch": other_branch(id_branch), "quantity": 5},
+            ],
+        },
+    )
+
+    assert response.status_code == 400
+    assert len(database.table("product").rows) == products
+    assert len(database.table("branch_stock").rows) == stock
+    assert not database.table("product").find(
+        "product_name", "Producto sin stock"
+    )
@@ -0,0 +1,93 @@
+from fastapi.testclient import TestClient
+
+from app.persistence.db.local.database import LocalDatabase
+
+
+def test_catalog_loads_every_page(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    # The branch stock is over the 1000 rows of a page
+    assert len(database.table("branch_stock").rows) > database.max_rows
+
+    response = client.get("/v1/product/products", params={"limit": 1000})
+
+    assert response.status_code == 200
+    products = response.json()
+    assert len(products) == len(database.table("product").rows)
+    assert sum(len(product["stock"]) for product in products) == len(
+        database.table("branch_stock").rows
+    )
+
+
+def test_catalog_answers_the_known_version(client: TestClient) -> None:
+    first = client.get("/v1/product/products")
+    second = client.get(
+        "/v1/product/products",
+        headers={"If-None-Match": first.headers["ETag"]},
+    )
+
+    assert second.status_code == 304
+
+
+def autocomplete(client: TestClient, q: str, limit: int = 10) -> list[str]:
+    response = client.get(
+        "/v1/product/autocomplete", params={"q": q, "limit": limit}
+    )
+    assert response.status_code == 200
+    return [product["product_name"] for product in response.json()]
+
+
+def test_autocomplete_matches_the_start_of_the_words(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    # The seeded products are named "Producto N", no word starts with "a",
+    # only the products renamed by other tests are suggested
+    names = sorted(
+        row["product_name"].lower()
+        for row in database.table("product").rows.values()
+        if row["product_state"]
+        and any(
+            word.startswith("a") for word in row["product_name"].lower().split()
+        )
+    )
+    assert [name.lower() for name in autocomplete(client, "a")] == sorted(
+        names, key=lambda name: not name.startswith("a")
+    )[:10]
+    assert autocomplete(client, "ucto") == []
+    # Names starting with the query first, then in alphabetical order
+    assert autocomplete(client, "PRODUCTO 12") == [
+        "Producto 12",
+        *(f"Producto {number}" for number in range(120, 129)),
+    ]
+    assert autocomplete(client, "24 prod", limit=20) == [
+        "Producto 24",
+        *(f"Producto {number}" for number in range(240, 250)),
+    ]
+
+
+def test_autocomplete_follows_a_rename(
+    client: TestClient, database: LocalDatabase
+) -> None:
+    product = next(
+        row
+        for row in database.table("product").rows.values()
+        if row["product_name"] == "Producto 7"
+    )
+    id_product = product["id_product"]
+
+    def rename(name: str) -> None:
+        response = client.put(
+            f"/v1/product/update-product/{id_product}",
+            json={"product_name": name},
+        )
+        assert response.status_code == 200
+
+    rename("Aceite de coco")
+    try:
+        assert autocomplete(client, "acei co") == ["Aceite de coco"]
+        # The words of the old name do not suggest the product
+        assert "Aceite de coco" not in autocomplete(client, "producto 7", 20)
+    finally:
+        rename("Producto 7")
+    assert autocomplete(client, "acei") == []
+    assert autocomplete(client, "producto 7")[0] == "Producto 7"
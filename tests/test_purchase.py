@@ -0,0 +1,187 @@
+import asyncio
+import csv
+import io
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.persistence.db.local.database import LocalDatabase
+from app.persistence.repositories.customer_search import (
+    CustomerSearchIndex,
+    date_key,
+)
+from app.persistence.repositories.customer_summary import (
+    CustomerSummaryRepository,
+)
+
+
+@pytest.fixture
+def sale(database: LocalDatabase) -> dict:
+    """Sale of 2 units of a product with stock in the branch."""
+    stock = next(
+        row
+        for row in database.table("branch_stock").rows.values()
+        if row["quantity"] >= 2  # noqa: PLR2004
+    )
+    customer = next(
+        row
+        for row in database.table("customer").rows.values()
+        if row["customer_state"]
+    )
+    return {
+        "customer_document": customer["customer_document"],
+        "id_branch": stock["id_branch"],
+        "purchase_duration": 30,
+        "products": [{"id_product": stock["id_product"], "unit_quantity": 2}],
+        "payment_type": "Efectivo",
+    }
+
+
+def branch_quantity(product: dict, id_branch: str) -> int:
+    return next(
+        stock["quantity"]
+        for stock in product["stock"]
+        if stock["id_branch"] == id_branch
+    )
+
+
+def test_create_purchase(
+    client: TestClient, database: LocalDatabase, sale: dict
+) -> None:
+    id_product = sale["products"][0]["id_product"]
+    document = sale["customer_document"]
+    # Load the catalog, the purchase refreshes the stock it sold
+    product = client.get(f"/v1/product/by-id/{id_product}").json()
+    quantity = branch_quantity(product, sale["id_branch"])
+
+    response = client.post("/v1/purchase/create", json=sale)
+
+    assert response.status_code == 201
+    purchase = response.json()
+    assert purchase["purchase_date"] == date.today().isoformat()  # noqa: DTZ011
+    assert purchase["products"][0]["unit_quantity"] == 2
+    product = client.get(f"/v1/product/by-id/{id_product}").json()
+    assert branch_quantity(product, sale["id_branch"]) == quantity - 2
+    customer = database.table("customer").get(document)
+    assert customer["last_purchase_date"] == purchase["purchase_date"]
+
+
+def test_purchase_without_stock_writes_nothing(
+    client: TestClient, database: LocalDatabase, sale: dict
+) -> None:
+    purchases = len(database.table("purchase").rows)
+    sale["products"][0]["unit_quantity"] = 10**6
+
+    response = client.post("/v1/purchase/create", json=sale)
+
+    assert response.status_code == 400
+    assert "does not have enough stock" in response.json()["detail"]
+    assert len(database.table("purchase").rows) == purchases
+
+
+def test_purchase_updates_the_customer_summary(
+    client: TestClient, database: LocalDatabase, sale: dict
+) -> None:
+    document = sale["customer_document"]
+    summary = database.table("customer_summary").get(document) or {}
+
+    response = client.post("/v1/purchase/create", json=sale)
+
+    assert response.status_code == 201
+    purchase = response.json()
+    new_summary = database.table("customer_summary").get(document)
+    assert new_summary["purchase_count"] == summary.get("purchase_count", 0) + 1
+    assert new_summary["last_purchase_id"] == purchase["id_purchase"]
+    assert new_summary["lifetime_total"] == pytest.approx(
+        summary.get("lifetime_total", 0)
+        + purchase["products"][0]["total_price_with_vat"]
+    )
+
+
+def test_rebuild_replaces_the_customer_summary(
+    database: LocalDatabase,
+) -> None:
+    purchase = next(iter(database.table("purchase").rows.values()))
+    document = purchase["customer_document"]
+    summary = database.table("customer_summary").get(document)
+    repository = CustomerSummaryRepository()
+
+    # The summary exists, it is replaced instead of failing on its key
+    assert asyncio.run(repository.rebuild(document)) == 1
+    assert asyncio.run(repository.rebuild(document)) == 1
+    rebuilt = database.table("customer_summary").get(document)
+    assert rebuilt["purchase_count"] == summary["purchase_count"]
+    assert rebuilt["lifetime_total"] == pytest.approx(summary["lifetime_total"])
+
+
+def test_export_keeps_the_branch_of_the_purchase(
+    client: TestClient, database: LocalDatabase, sale: dict
+) -> None:
+    purchase = client.post("/v1/purchase/create", json=sale).json()
+    customer = database.table("customer").get(sale["customer_document"])
+    other_branch = next(
+        row["id_branch"]
+        for row in database.table("branch").rows.values()
+        if row["id_branch"] != sale["id_branch"]
+    )
+    # The customer moves to another branch after the purchase
+    database.update("customer", customer, {"id_branch": other_branch})
+
+    try:
+        response = client.get(
+            "/v1/purchase/export",
+            params={
+                "id_branch": sale["id_branch"],
+                "start_date": purchase["purchase_date"],
+            },
+        )
+    finally:
+        database.update(
+            "customer",
+            database.table("customer").get(sale["customer_document"]),
+            {"id_branch": customer["id_branch"]},
+        )
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert purchase["id_purchase"] in {row["id_purchase"] for row in rows}
+    assert {row["id_branch"] for row in rows} == {sale["id_branch"]}
+
+
+def test_same_day_purchases_keep_the_same_last_purchase(
+    client: TestClient, database: LocalDatabase, sale: dict
+) -> None:
+    sale["products"][0]["unit_quantity"] = 1
+    ids = [
+        client.post("/v1/purchase/create", json=sale).json()["id_purchase"]
+        for _ in range(2)
+    ]
+    document = sale["customer_document"]
+    applied = database.table("customer_summary").get(document)
+
+    asyncio.run(CustomerSummaryRepository().rebuild(document))
+
+    rebuilt = database.table("customer_summary").get(document)
+    assert applied["last_purchase_id"] == max(ids)
+    assert rebuilt["last_purchase_id"] == applied["last_purchase_id"]
+
+
+def test_purchase_moves_the_customer_in_the_search_index(
+    client: TestClient, database: LocalDatabase, sale: dict
+) -> None:
+    document = sale["customer_document"]
+    search_index = CustomerSearchIndex()
+    asyncio.run(search_index._build())  # noqa: SLF001
+    # The customer bought before today
+    search_index._index.upsert(  # noqa: SLF001
+        database.table("customer").get(document)
+        | {"last_purchase_date": "2020-01-01"}
+    )
+
+    response = client.post("/v1/purchase/create", json=sale)
+
+    assert response.status_code == 201
+    entry_id = search_index._index._ids[document]  # noqa: SLF001
+    _, _, purchase_key = search_index._index._entries[entry_id]  # noqa: SLF001
+    assert purchase_key == date_key(date.today())  # noqa: DTZ011
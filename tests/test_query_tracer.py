@@ -0,0 +1,153 @@
+from collections import deque
+from collections.abc import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.admin import verify_admin
+from app.core.config import settings
+from app.models.query_trace import QueryTrace
+from app.persistence.db.local.database import LocalDatabase
+from app.persistence.db.query_tracer import (
+    OTLP_SPAN_KIND_CLIENT,
+    OTLP_STATUS_ERROR,
+    OTLP_STATUS_OK,
+    QueryTracer,
+    to_otlp,
+)
+
+
+def build_trace(
+    table: str, duration_ms: float, **changes: object
+) -> QueryTrace:
+    return QueryTrace(
+        trace_id="0" * 32,
+        span_id=f"{len(table):016x}",
+        start_time=1_700_000_000_000_000_000,
+        duration_ms=duration_ms,
+        method="GET",
+        table=table,
+        **changes,
+    )
+
+
+@pytest.fixture
+def tracer(
+    client: TestClient,
+    database: LocalDatabase,  # noqa: ARG001
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[QueryTracer]:
+    """Tracer with room for 3 traces, enabled through the admin API."""
+    client.app.dependency_overrides[verify_admin] = lambda: None
+    tracer = QueryTracer()
+    monkeypatch.setattr(tracer, "_traces", deque(maxlen=3))
+    response = client.put(
+        "/v1/admin/query-traces/enabled", params={"enabled": True}
+    )
+    assert response.json() == {"enabled": True, "size": 3, "recorded": 0}
+    yield tracer
+    client.put("/v1/admin/query-traces/enabled", params={"enabled": False})
+    del client.app.dependency_overrides[verify_admin]
+
+
+def test_ring_buffer_keeps_the_last_queries(
+    client: TestClient, database: LocalDatabase, tracer: QueryTracer
+) -> None:
+    documents = list(database.table("customer").rows)[:5]
+    for (document,) in documents:
+        client.get("/v1/customer/purchases", params={"document": document})
+
+    traces = client.get("/v1/admin/query-traces").json()
+
+    assert tracer.status().recorded == 3  # noqa: PLR2004
+    assert len(traces) == 3  # noqa: PLR2004
+    # The most recent first, the 2 queries of the last request share its
+    # trace id
+    last, previous = documents[-1][0], documents[-2][0]
+    assert {trace["table"] for trace in traces[:2]} == {"customer", "purchase"}
+    assert traces[0]["trace_id"] == traces[1]["trace_id"]
+    assert traces[2]["trace_id"] != traces[0]["trace_id"]
+    for trace, document in zip(traces, [last, last, previous], strict=True):
+        assert trace["filters"] == [f"customer_document=eq.{document}"]
+    response = client.delete("/v1/admin/query-traces")
+    assert response.status_code == 204  # noqa: PLR2004
+    assert tracer.status().recorded == 0
+
+
+def test_disabled_tracer_records_nothing(
+    client: TestClient, database: LocalDatabase, tracer: QueryTracer
+) -> None:
+    tracer.disable()
+    (document,) = next(iter(database.table("customer").rows))
+
+    client.get("/v1/customer/purchases", params={"document": document})
+
+    assert tracer.status().recorded == 0
+
+
+def test_traces_are_filtered_by_table_and_duration(
+    client: TestClient, tracer: QueryTracer
+) -> None:
+    tracer.disable()
+    for trace in (
+        build_trace("customer", 5),
+        build_trace("purchase", 80),
+        build_trace("customer", 120),
+    ):
+        tracer._traces.append(trace)  # noqa: SLF001
+
+    def tables(**params: object) -> list[tuple[str, float]]:
+        response = client.get("/v1/admin/query-traces", params=params)
+        return [(t["table"], t["duration_ms"]) for t in response.json()]
+
+    assert tables(table="customer") == [("customer", 120), ("customer", 5)]
+    assert tables(min_duration_ms=50) == [("customer", 120), ("purchase", 80)]
+    assert tables(table="customer", min_duration_ms=50, limit=1) == [
+        ("customer", 120)
+    ]
+
+
+def test_otlp_export() -> None:
+    ok = build_trace(
+        "customer",
+        12.5,
+        select="*, branch(*)",
+        filters=["customer_document=eq.1", "customer_state=eq.true"],
+        limit=10,
+        row_count=1,
+        response_bytes=512,
+    )
+    failed = build_trace("rpc/create_purchase", 3, error="Missing stock")
+
+    export = to_otlp([ok, failed])
+
+    resource = export["resourceSpans"][0]
+    assert resource["resource"]["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": settings.app_name}}
+    ]
+    first, second = resource["scopeSpans"][0]["spans"]
+    assert first["name"] == "GET customer"
+    assert first["kind"] == OTLP_SPAN_KIND_CLIENT
+    assert first["startTimeUnixNano"] == "1700000000000000000"
+    assert first["endTimeUnixNano"] == "1700000000012500000"
+    assert first["status"] == {"code": OTLP_STATUS_OK}
+    attributes = {
+        attribute["key"]: attribute["value"]
+        for attribute in first["attributes"]
+    }
+    assert attributes == {
+        "db.system": {"stringValue": "postgresql"},
+        "db.operation": {"stringValue": "GET"},
+        "db.sql.table": {"stringValue": "customer"},
+        "db.postgrest.select": {"stringValue": "*, branch(*)"},
+        "db.postgrest.filters": {
+            "stringValue": "customer_document=eq.1&customer_state=eq.true"
+        },
+        "db.postgrest.limit": {"intValue": "10"},
+        "db.response.rows": {"intValue": "1"},
+        "http.response.body.size": {"intValue": "512"},
+    }
+    assert second["status"] == {
+        "code": OTLP_STATUS_ERROR,
+        "message": "Missing stock",
+    }
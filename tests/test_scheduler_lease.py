@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.persistence.db.local.database import LocalDatabase
+from app.persistence.repositories.scheduler_lease import (
+    SchedulerLeaseRepository,
+)
+from app.services.scheduler_leader import SchedulerLeader
+
+
+def test_only_one_worker_holds_the_lease(database: LocalDatabase) -> None:
+    first = SchedulerLeaseRepository("test-single", "worker-1", 60)
+    second = SchedulerLeaseRepository("test-single", "worker-2", 60)
+
+    async def run() -> list[bool]:
+        return [
+            await first.acquire(),
+            await second.acquire(),
+            # The owner renews its lease
+            await first.acquire(),
+        ]
+
+    assert asyncio.run(run()) == [True, False, True]
+    lease = database.table("scheduler_lease").get("test-single")
+    assert lease["lease_owner"] == "worker-1"
+
+    async def release() -> bool:
+        await first.release()
+        return await second.acquire()
+
+    assert asyncio.run(release()) is True
+
+
+def test_expired_lease_is_taken(database: LocalDatabase) -> None:
+    first = SchedulerLeaseRepository("test-expired", "worker-1", 60)
+    second = SchedulerLeaseRepository("test-expired", "worker-2", 60)
+    asyncio.run(first.acquire())
+    # The first worker died without releasing the lease
+    lease = database.table("scheduler_lease").get("test-expired")
+    database.update(
+        "scheduler_lease",
+        lease,
+        {"expires_at": (datetime.now(UTC) - timedelta(seconds=1)).isoformat()},
+    )
+
+    assert asyncio.run(second.acquire()) is True
+    assert asyncio.run(first.acquire()) is False
+
+
+def test_leader_starts_and_stops_the_jobs(
+    database: LocalDatabase,  # noqa: ARG001
+) -> None:
+    events = []
+
+    async def run() -> None:
+        leaders = [
+            SchedulerLeader(
+                lease=SchedulerLeaseRepository("test-leader", owner, 60),
+                on_elected=lambda owner=owner: events.append(("elected", owner)),
+                on_demoted=lambda owner=owner: events.append(("demoted", owner)),
+                on_standby=lambda _, owner=owner: events.append(
+                    ("standby", owner)
+                ),
+                interval=60,
+            )
+            for owner in ("worker-1", "worker-2")
+        ]
+        for leader in leaders:
+            await leader.start()
+        for leader in leaders:
+            await leader.stop()
+
+    asyncio.run(run())
+
+    assert events == [
+        ("elected", "worker-1"),
+        ("standby", "worker-2"),
+        ("demoted", "worker-1"),
+    ]
+
+
+class BrokenLease:
+    """Lease of a database without the lease functions."""
+
+    async def acquire(self) -> bool:
+        msg = "function acquire_scheduler_lease does not exist"
+        raise RuntimeError(msg)
+
+    async def release(self) -> None:
+        return None
+
+
+def test_lease_error_is_logged(caplog: pytest.LogCaptureFixture) -> None:
+    standby = []
+    leader = SchedulerLeader(
+        lease=BrokenLease(),
+        on_elected=lambda: None,
+        on_demoted=lambda: None,
+        on_standby=standby.append,
+        interval=60,
+    )
+
+    async def run() -> None:
+        await leader._check()  # noqa: SLF001
+        await leader._check()  # noqa: SLF001
+
+    asyncio.run(run())
+
+    assert leader.is_leader is False
+    assert len(standby) == 2  # noqa: PLR2004
+    # The same error is logged once, not on every renewal
+    errors = [r for r in caplog.records if r.levelno == logging.ERROR]
+    assert len(errors) == 1
+    assert "acquire_scheduler_lease does not exist" in errors[0].message
+
+
+def test_failed_start_releases_the_lease(
+    database: LocalDatabase,  # noqa: ARG001
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    def on_elected() -> None:
+        msg = "Error in email scheduler"
+        raise RuntimeError(msg)
+
+    leader = SchedulerLeader(
+        lease=SchedulerLeaseRepository("test-failed-start", "worker-1", 60),
+        on_elected=on_elected,
+        on_demoted=lambda: None,
+        interval=60,
+    )
+    other = SchedulerLeaseRepository("test-failed-start", "worker-2", 60)
+
+    async def run() -> bool:
+        await leader.start()
+        await leader.stop()
+        return await other.acquire()
+
+    assert asyncio.run(run()) is True
+    assert leader.is_leader is False
+    assert "Error starting the scheduled jobs" in caplog.text
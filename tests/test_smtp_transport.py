@@ -0,0 +1,133 @@
+import smtplib
+import socketserver
+import threading
+import time
+from collections.abc import Iterator
+from email.message import EmailMessage
+
+import pytest
+
+from app.persistence.smtp.connection import SMTPTransport
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Local SMTP server that counts the connections and the messages."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.connections = 0
+        self.messages: list[bytes] = []
+        # Connections refused with 421 before one is accepted
+        self.refused = 0
+        # Close the connection once the DATA is received, without a reply
+        self.drop_after_data = False
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        if self.server.refused:
+            self.server.refused -= 1
+            self.reply("421 Too many connections")
+            return
+        self.reply("220 localhost")
+        for line in self.rfile:
+            command = line.decode().strip().upper()
+            if command.startswith("DATA"):
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = b""
+                for data_line in self.rfile:
+                    if data_line == b".\r\n":
+                        break
+                    data += data_line
+                self.server.messages.append(data)
+                if self.server.drop_after_data:
+                    return
+                self.reply("250 OK")
+            elif command.startswith("QUIT"):
+                self.reply("221 Bye")
+                return
+            else:
+                # EHLO, MAIL, RCPT, NOOP and RSET
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def smtp_server() -> Iterator[SMTPStandIn]:
+    server = SMTPStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def build_message(number: int) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = f"Gestión diaria {number}"
+    message["From"] = "sender@example.com"
+    message["To"] = "team@example.com"
+    message.set_content("Clientes a contactar")
+    return message
+
+
+def transport(server: SMTPStandIn) -> SMTPTransport:
+    return SMTPTransport(
+        "127.0.0.1", server.server_address[1], "", "", use_tls=False
+    )
+
+
+def test_send_many_uses_one_connection(smtp_server: SMTPStandIn) -> None:
+    results = transport(smtp_server).send_many(
+        [build_message(n) for n in range(5)]
+    )
+
+    assert results == [(True, "Email sent successfully")] * 5
+    assert len(smtp_server.messages) == 5
+    assert smtp_server.connections == 1
+
+
+def test_refused_connection_is_retried(
+    smtp_server: SMTPStandIn, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(time, "sleep", lambda _: None)
+    smtp_server.refused = 2
+
+    transport(smtp_server).send(build_message(1))
+
+    assert len(smtp_server.messages) == 1
+    assert smtp_server.connections == 3
+
+
+def test_message_is_not_sent_again_after_data(
+    smtp_server: SMTPStandIn, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(time, "sleep", lambda _: None)
+    smtp_server.drop_after_data = True
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        transport(smtp_server).send(build_message(1))
+
+    assert len(smtp_server.messages) == 1
+    assert smtp_server.connections == 1
+
+
+def test_send_many_reconnects_for_the_next_message(
+    smtp_server: SMTPStandIn,
+) -> None:
+    smtp_server.drop_after_data = True
+
+    results = transport(smtp_server).send_many(
+        [build_message(n) for n in range(2)]
+    )
+
+    # Each message reached the server once, none was sent again
+    assert [success for success, _ in results] == [False, False]
+    assert len(smtp_server.messages) == 2
+    assert smtp_server.connections == 2
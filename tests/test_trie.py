@@ -0,0 +1,43 @@
+from app.utils.trie import PrefixTrie
+
+
+def test_search_returns_the_keys_of_every_word_with_the_prefix() -> None:
+    trie = PrefixTrie()
+    trie.insert("1", ["crema", "hidratante"])
+    trie.insert("2", ["crema", "corporal"])
+    trie.insert("3", ["jabon"])
+
+    assert trie.search("cr") == {"1", "2"}
+    assert trie.search("c") == {"1", "2"}
+    assert trie.search("hid") == {"1"}
+    assert trie.search("cremas") == set()
+    assert trie.search_all(["crem", "hi"]) == {"1"}
+    assert trie.search_all(["crem", "ja"]) == set()
+    assert trie.search_all([]) == set()
+
+
+def test_remove_drops_the_branches_without_words() -> None:
+    trie = PrefixTrie()
+    trie.insert("1", ["crema"])
+    trie.insert("2", ["cremoso"])
+
+    trie.remove("2", ["cremoso"])
+
+    assert trie.search("crem") == {"1"}
+    assert trie.search("cremo") == set()
+    assert "o" not in trie.root.children["c"].children["r"].children[
+        "e"
+    ].children["m"].children
+
+
+def test_rename_removes_the_old_prefixes() -> None:
+    trie = PrefixTrie()
+    trie.insert("1", ["crema", "facial"])
+
+    trie.remove("1", ["crema", "facial"])
+    trie.insert("1", ["gel", "facial"])
+
+    assert trie.search("cre") == set()
+    assert trie.search("gel") == {"1"}
+    assert trie.search_all(["fac", "ge"]) == {"1"}
+    assert trie.root.children.keys() == {"g", "f"}